@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app_search_project.settings')
+# Route search, suggestions and app detail to search_app.async_views
+os.environ.setdefault('SEARCH_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -85,6 +86,30 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The "search" cache holds ranked result pages; locmem evicts least recently
+# used entries past MAX_ENTRIES. Swap in FileBasedCache to share it between
+# worker processes.
+
+# LocMemCache is private to each process: invalidate_search_cache() from a
+# management command (load_data) only reaches web workers through a shared
+# backend such as Redis or the database cache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'search-results',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -133,3 +158,105 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap4"
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
+
+# Search index
+# Startup warm-up run when the app registry is ready (search_app/warmup.py), e.g. in
+# the master process of "gunicorn --preload" so forked workers share what it loads.
+# Steps, in order: 'index' (load or build the search index), 'semantic' (fit the LSA
+# embeddings), 'sentiment' (load TextBlob). Empty loads everything on first use.
+SEARCH_WARMUP = tuple(step for step in os.environ.get('SEARCH_WARMUP', '').split(',') if step)
+# Older switch for the 'index' step alone
+SEARCH_INDEX_PRELOAD = False
+
+# Index file written by "manage.py build_search_index"; when set, workers memory-map
+# it read-only on first use instead of each building a private copy, and switch to
+# a newly written file within SEARCH_INDEX_RELOAD_INTERVAL seconds. Only the numeric
+# arrays are shared through the page cache: the vocabularies, autocomplete keys and
+# spelling variants in the file's JSON header are still loaded into every worker.
+SEARCH_INDEX_PATH = None
+SEARCH_INDEX_RELOAD_INTERVAL = 5
+
+# After the catalog changes, build the next index snapshot in a background thread
+# and keep serving the previous one until it is published. The test runner
+# (TEST_RUNNER below) turns it off so every test searches the data it just created.
+SEARCH_INDEX_BACKGROUND_REBUILD = True
+TEST_RUNNER = 'search_app.test_runner.SearchTestRunner'
+
+# Semantic search (?mode=semantic): LSA embeddings of the TF-IDF matrix. Catalogs
+# larger than SEARCH_SEMANTIC_EXACT_MAX_APPS use an approximate IVF index that
+# scans SEARCH_SEMANTIC_PROBES clusters per query instead of every app.
+SEARCH_SEMANTIC_ENABLED = True
+SEARCH_SEMANTIC_COMPONENTS = 100
+SEARCH_SEMANTIC_EXACT_MAX_APPS = 20000
+SEARCH_SEMANTIC_PROBES = 8
+SEARCH_SEMANTIC_MAX_RESULTS = 200
+
+# Split keyword scoring across SEARCH_SHARDS worker processes, each scoring a
+# contiguous slice of the catalog and returning its local top results. 1 scores
+# in the web process. SEARCH_SHARD_WORKERS defaults to one worker per shard.
+SEARCH_SHARDS = 1
+SEARCH_SHARD_WORKERS = None
+
+# Hybrid ranking: score = (1 - SEARCH_POPULARITY_WEIGHT) * text relevance (BM25
+# scaled into [0, 1]) + SEARCH_POPULARITY_WEIGHT * popularity prior. The prior mixes
+# rating, log review and install counts and approved-review sentiment with
+# SEARCH_PRIOR_WEIGHTS; it is computed with the index and refreshed offline with
+# "manage.py refresh_popularity_prior".
+SEARCH_POPULARITY_WEIGHT = 0.2
+SEARCH_PRIOR_WEIGHTS = {'rating': 0.3, 'reviews': 0.3, 'installs': 0.3, 'sentiment': 0.1}
+
+# Autocomplete keeps the candidate apps of recent prefixes so the next keystroke
+# ("inst" -> "insta") filters them instead of rescanning. The LRU holds at most
+# SEARCH_SUGGEST_CACHE_CANDIDATES app ranks in total (4 bytes each) across at
+# most SEARCH_SUGGEST_CACHE_ENTRIES prefixes; 0 turns it off.
+SEARCH_SUGGEST_CACHE_CANDIDATES = 250000
+SEARCH_SUGGEST_CACHE_ENTRIES = 10000
+
+# POST /search/batch/ scores up to SEARCH_BATCH_MAX_QUERIES queries in one request,
+# returning at most SEARCH_BATCH_MAX_LIMIT results per query
+SEARCH_BATCH_MAX_QUERIES = 1000
+SEARCH_BATCH_MAX_LIMIT = 100
+
+# Serve search, suggestions and app detail with the native async views in
+# search_app/async_views.py. asgi.py turns this on; WSGI keeps the sync views.
+# Index lookups and scoring run in a pool of SEARCH_ASYNC_WORKERS threads.
+SEARCH_ASYNC_VIEWS = os.environ.get('SEARCH_ASYNC_VIEWS') == '1'
+SEARCH_ASYNC_WORKERS = 4
+
+# /search/export/ and "manage.py export_apps" read apps from the database
+# SEARCH_EXPORT_CHUNK_SIZE rows at a time
+SEARCH_EXPORT_CHUNK_SIZE = 2000
+
+# "Similar apps" on the detail page: "manage.py build_similar_apps" stores the
+# SEARCH_SIMILAR_APPS nearest neighbours of every app, multiplying
+# SEARCH_SIMILAR_BLOCK_SIZE rows of the TF-IDF matrix at a time; the page shows
+# the first SEARCH_SIMILAR_APPS_SHOWN
+SEARCH_SIMILAR_APPS = 10
+SEARCH_SIMILAR_APPS_SHOWN = 6
+SEARCH_SIMILAR_BLOCK_SIZE = 512
+
+# Sentiment analysis of submitted reviews runs on a database queue (search_app/
+# sentiment_queue.py) processed by "manage.py process_sentiment_jobs": jobs are
+# claimed SENTIMENT_JOB_BATCH_SIZE at a time, a claim expires after
+# SENTIMENT_JOB_LEASE seconds, and a failed job is retried after
+# SENTIMENT_JOB_RETRY_DELAY seconds, doubling each time, up to
+# SENTIMENT_JOB_MAX_ATTEMPTS attempts
+SENTIMENT_JOB_BATCH_SIZE = 100
+SENTIMENT_JOB_LEASE = 300
+SENTIMENT_JOB_RETRY_DELAY = 30
+SENTIMENT_JOB_MAX_ATTEMPTS = 5
+
+# Text sentiment is cached by a hash of the whitespace-normalized review text
+# (search_app/sentiment_cache.py): SENTIMENT_CACHE_ENTRIES results per process
+# in an LRU (0 turns it off) in front of the sentiment_cache table
+# (SENTIMENT_CACHE_PERSIST). Bump SENTIMENT_ANALYZER_REVISION after changing
+# how texts are scored so cached scores of the old analyzer stop matching
+SENTIMENT_CACHE_ENTRIES = 20000
+SENTIMENT_CACHE_PERSIST = True
+SENTIMENT_ANALYZER_REVISION = 1
+
+# Analyzer behind review text sentiment: 'textblob' scores one review at a
+# time; 'lexicon' (search_app/sentiment_lexicon.py) applies TextBlob's lexicon
+# and rules to a whole batch with NumPy, agreeing with it within a small
+# tolerance. Switching backends also switches the sentiment cache key
+SENTIMENT_BACKEND = 'textblob'
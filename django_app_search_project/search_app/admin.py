@@ -2,7 +2,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import App, AppReview, UserReview, UserProfile
+from django.utils import timezone
+from .models import App, AppReview, UserReview, UserProfile, SentimentJob
+from .review_search import match_condition
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -52,17 +54,31 @@ class AppAdmin(admin.ModelAdmin):
 class AppReviewAdmin(admin.ModelAdmin):
     list_display = ['app', 'sentiment', 'sentiment_polarity', 'sentiment_subjectivity']
     list_filter = ['sentiment']
-    search_fields = ['app__name', 'translated_review']
+    # Review text is searched through the full-text index, see get_search_results
+    search_fields = ['app__name']
     list_per_page = 25
 
+    def get_search_results(self, request, queryset, search_term):
+        matched, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.strip():
+            matched = matched | queryset.filter(match_condition('csv', search_term))
+        return matched, may_have_duplicates
+
 @admin.register(UserReview)
 class UserReviewAdmin(admin.ModelAdmin):
     list_display = ['app', 'user', 'get_user_supervisor', 'rating', 'status', 'created_at', 'approved_by']
     list_filter = ['status', 'rating', 'created_at']
-    search_fields = ['app__name', 'user__username', 'review_text']
+    # Review text is searched through the full-text index, see get_search_results
+    search_fields = ['app__name', 'user__username']
     list_per_page = 25
     readonly_fields = ['created_at']
 
+    def get_search_results(self, request, queryset, search_term):
+        matched, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.strip():
+            matched = matched | queryset.filter(match_condition('user', search_term))
+        return matched, may_have_duplicates
+
     def get_user_supervisor(self, obj):
         try:
             return obj.user.userprofile.supervisor
@@ -73,6 +89,19 @@ class UserReviewAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('app', 'user', 'approved_by')
 
+@admin.register(SentimentJob)
+class SentimentJobAdmin(admin.ModelAdmin):
+    list_display = ['review', 'status', 'attempts', 'available_at', 'claimed_at', 'last_error']
+    list_filter = ['status']
+    raw_id_fields = ['review']
+    list_per_page = 25
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected jobs now')
+    def retry_jobs(self, request, queryset):
+        retried = queryset.update(status='queued', attempts=0, available_at=timezone.now())
+        self.message_user(request, f'{retried} job(s) queued again.')
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'is_supervisor', 'supervisor', 'get_supervised_count']
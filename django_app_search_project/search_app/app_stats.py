@@ -0,0 +1,183 @@
+"""
+Per-app review aggregates (the app_stats table)
+
+Each review contributes fixed amounts to its app's AppStats row: one review,
+one review of its sentiment label, its polarity and, for an approved user
+review, its star rating and whether text and rating contradict each other.
+Signals (signals.py) remember a review's contribution when it is loaded and
+apply the difference when it is saved or deleted, as one UPDATE of F()
+expressions, so loading, approving or rejecting a review never rereads the
+app's other reviews. Paths that bypass signals (bulk_update in the sentiment
+worker and rescore_sentiment) call record_review_change or
+rebuild_app_stats themselves.
+
+rebuild_app_stats recomputes every row from one grouped aggregate query per
+review table ("manage.py rebuild_app_stats"), which also repairs any drift
+of the floating-point sums.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+SENTIMENT_LABELS = {'Positive': 'positive', 'Neutral': 'neutral', 'Negative': 'negative'}
+# Fields a review's contribution depends on, read when it is loaded
+CONTRIBUTION_FIELDS = {
+    'AppReview': ('app_id', 'sentiment', 'sentiment_polarity'),
+    'UserReview': ('app_id', 'status', 'sentiment', 'sentiment_polarity', 'rating', 'has_contradiction'),
+}
+
+
+def contribution(review):
+    """
+    What one review adds to its app's AppStats row
+
+    Returns:
+        dict: AppStats field -> amount; empty for reviews that do not count
+            (user reviews that are not approved)
+    """
+    if review._meta.object_name == 'UserReview':
+        if review.status != 'approved':
+            return {}
+        prefix = 'user'
+    else:
+        prefix = 'csv'
+    amounts = {f'{prefix}_reviews': 1}
+    label = SENTIMENT_LABELS.get(review.sentiment)
+    if label:
+        amounts[f'{prefix}_{label}'] = 1
+    if review.sentiment_polarity is not None:
+        amounts[f'{prefix}_polarity_sum'] = review.sentiment_polarity
+        amounts[f'{prefix}_polarity_count'] = 1
+    if prefix == 'user':
+        amounts['user_rating_sum'] = review.rating or 0
+        if review.has_contradiction:
+            amounts['user_contradictions'] = 1
+    return amounts
+
+
+def remember_contribution(review):
+    """Note what a review contributes now, to diff against when it changes"""
+    fields = CONTRIBUTION_FIELDS[review._meta.object_name]
+    if review.get_deferred_fields().intersection(fields):
+        # Reading deferred fields would cost a query per loaded review
+        review._stats_contribution = None
+    else:
+        review._stats_contribution = (review.app_id, contribution(review))
+
+
+def _apply(app_id, amounts, create=True):
+    """Add amounts to an app's row with F() expressions, creating the row if needed"""
+    from .models import AppStats
+
+    amounts = {field: amount for field, amount in amounts.items() if amount}
+    if not amounts or app_id is None:
+        return
+    updates = {field: F(field) + amount for field, amount in amounts.items()}
+    if AppStats.objects.filter(app_id=app_id).update(**updates) or not create:
+        return
+    try:
+        with transaction.atomic():
+            AppStats.objects.create(app_id=app_id, **amounts)
+    except IntegrityError:
+        # Created by a concurrent request in the meantime
+        AppStats.objects.filter(app_id=app_id).update(**updates)
+
+
+def record_review_change(review, created=False):
+    """Apply the difference between a review's remembered and current contribution"""
+    before = None if created else getattr(review, '_stats_contribution', None)
+    if before is None and not created:
+        # Loaded without the fields its contribution depends on
+        rebuild_app_stats([review.app_id])
+    else:
+        old_app_id, old_amounts = before or (review.app_id, {})
+        new_amounts = contribution(review)
+        if old_app_id == review.app_id:
+            fields = set(old_amounts) | set(new_amounts)
+            _apply(review.app_id, {f: new_amounts.get(f, 0) - old_amounts.get(f, 0) for f in fields})
+        else:
+            _apply(old_app_id, {f: -amount for f, amount in old_amounts.items()}, create=False)
+            _apply(review.app_id, new_amounts)
+    remember_contribution(review)
+
+
+def forget_review(review):
+    """Remove a deleted review's contribution"""
+    # Never creates a row: the app itself may be being deleted
+    _apply(review.app_id, {f: -amount for f, amount in contribution(review).items()}, create=False)
+
+
+def aggregate_rows(app_review_model, user_review_model, app_ids=None):
+    """
+    Recompute AppStats field values with one grouped query per review table
+
+    Returns:
+        dict: App id -> AppStats field values, for apps with any counted review
+    """
+    def labelled(label):
+        return Count('id', filter=Q(sentiment=label))
+
+    rows = {}
+    csv = app_review_model.objects.all()
+    user = user_review_model.objects.filter(status='approved')
+    if app_ids is not None:
+        csv = csv.filter(app_id__in=app_ids)
+        user = user.filter(app_id__in=app_ids)
+    for row in csv.values('app_id').annotate(
+        csv_reviews=Count('id'),
+        csv_positive=labelled('Positive'),
+        csv_neutral=labelled('Neutral'),
+        csv_negative=labelled('Negative'),
+        csv_polarity_sum=Sum('sentiment_polarity'),
+        csv_polarity_count=Count('sentiment_polarity'),
+    ):
+        rows[row.pop('app_id')] = row
+    for row in user.values('app_id').annotate(
+        user_reviews=Count('id'),
+        user_positive=labelled('Positive'),
+        user_neutral=labelled('Neutral'),
+        user_negative=labelled('Negative'),
+        user_polarity_sum=Sum('sentiment_polarity'),
+        user_polarity_count=Count('sentiment_polarity'),
+        user_rating_sum=Sum('rating'),
+        user_contradictions=Count('id', filter=Q(has_contradiction=True)),
+    ):
+        rows.setdefault(row.pop('app_id'), {}).update(row)
+    for row in rows.values():
+        for field in ('csv_polarity_sum', 'user_polarity_sum', 'user_rating_sum'):
+            if row.get(field) is None:
+                row.pop(field, None)
+    return rows
+
+
+def rebuild_app_stats(app_ids=None):
+    """
+    Replace the AppStats rows of some apps (default: all) with fresh aggregates
+
+    Args:
+        app_ids (list): Apps to rebuild, or None for every app
+
+    Returns:
+        int: Number of rows written
+    """
+    from .models import AppReview, AppStats, UserReview
+
+    rows = aggregate_rows(AppReview, UserReview, app_ids)
+    with transaction.atomic():
+        stale = AppStats.objects.all()
+        if app_ids is not None:
+            stale = stale.filter(app_id__in=app_ids)
+        stale.delete()
+        AppStats.objects.bulk_create(
+            [AppStats(app_id=app_id, **values) for app_id, values in rows.items()], batch_size=500
+        )
+    return len(rows)
+
+
+def stats_for(app):
+    """An app's AppStats, or an unsaved all-zero one when it has no counted reviews"""
+    from .models import AppStats
+
+    try:
+        return app.stats
+    except AppStats.DoesNotExist:
+        return AppStats(app=app)
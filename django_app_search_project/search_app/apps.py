@@ -1,9 +1,27 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
 
 class SearchAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'search_app'
     
     def ready(self):
-        # Import signals if you have any
-        pass
+        from . import signals  # noqa: F401
+
+        # Optionally load the search index, embeddings or sentiment lexicon at
+        # startup (e.g. before a preforking server forks) instead of on first use
+        steps = list(getattr(settings, 'SEARCH_WARMUP', ()))
+        if getattr(settings, 'SEARCH_INDEX_PRELOAD', False) and 'index' not in steps:
+            steps.insert(0, 'index')
+        if steps:
+            from .warmup import warm_up
+            try:
+                warm_up(steps)
+            except DatabaseError:
+                # Tables may not exist yet (e.g. before the first migrate)
+                logger.warning('Search warm-up skipped: database not ready')
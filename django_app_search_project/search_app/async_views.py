@@ -0,0 +1,147 @@
+"""
+Native async versions of the search, suggestion and app detail views
+
+Served instead of their views.py counterparts when SEARCH_ASYNC_VIEWS is on,
+which asgi.py turns on. Database reads use the async ORM; index lookups
+and scoring are CPU-bound, so they run in a bounded thread pool
+(SEARCH_ASYNC_WORKERS threads) instead of on the event loop. A slow search
+therefore holds a pool thread, never the loop, and autocomplete requests
+keep being answered while it runs.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import close_old_connections
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+
+from . import views
+from .models import App, AppReview, UserReview
+from .forms import UserReviewForm
+from .app_stats import stats_for
+from .export import search_request
+from .search_cache import cache_page
+from .search_index import get_search_index
+from .similar import neighbours_of
+
+_search_pool = None
+
+
+def _get_search_pool():
+    global _search_pool
+    if _search_pool is None:
+        _search_pool = ThreadPoolExecutor(
+            max_workers=settings.SEARCH_ASYNC_WORKERS, thread_name_prefix='search'
+        )
+    return _search_pool
+
+
+def _call_and_close_connections(func, *args):
+    # Pool threads outlive requests, so close their connections the way
+    # Django does at the end of a request
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_in_search_pool(func, *args):
+    """Run a blocking, CPU-bound call in the search thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_search_pool(), functools.partial(_call_and_close_connections, func, *args)
+    )
+
+
+class RankedIds:
+    """Paginator adapter over ranked results that yields app ids, not App rows"""
+
+    def __init__(self, results):
+        self.results = results
+
+    def count(self):
+        return self.results.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(len(self))
+        return self.results.app_ids(start, max(start, stop))
+
+
+async def load_apps(app_ids):
+    """App rows for ranked ids, in ranking order, read with the async ORM"""
+    apps_by_id = {app.id: app async for app in App.objects.select_related('stats').filter(id__in=app_ids).aiterator()}
+    return [apps_by_id[app_id] for app_id in app_ids if app_id in apps_by_id]
+
+
+def _ranked_page(search):
+    """Rank a search and pick the ids of the requested page (runs in the pool)"""
+    results, cached, did_you_mean, facet_counts = views._rank(search)
+    paginator = Paginator(results if isinstance(results, list) else RankedIds(results), 20)
+    return paginator.get_page(search['page_number']), cached, did_you_mean, facet_counts
+
+
+async def search_suggestions(request):
+    query = request.GET.get('q', '').strip()
+    if len(query) >= 3:
+        suggestions = await run_in_search_pool(lambda: get_search_index().suggest(query))
+        return JsonResponse(suggestions, safe=False)
+    return JsonResponse([], safe=False)
+
+
+async def search_results(request):
+    search = search_request(request.GET)
+    page_obj, cached, did_you_mean, facet_counts = await run_in_search_pool(_ranked_page, search)
+    page_obj.object_list = await load_apps(list(page_obj.object_list))
+
+    if (search['query'] or search['browsing']) and cached is None:
+        await run_in_search_pool(
+            cache_page, search['query'], search['page_number'], page_obj, did_you_mean,
+            search['options'], facet_counts
+        )
+
+    context = views._search_context(search, page_obj, did_you_mean, facet_counts)
+    # Rendering may touch the session and user, which are synchronous
+    return await sync_to_async(render)(request, 'search_app/search_results.html', context)
+
+
+async def app_detail(request, app_id):
+    if request.method == 'POST':
+        # Review submission saves and queues analysis synchronously; keep one code path
+        return await sync_to_async(views.app_detail)(request, app_id)
+
+    try:
+        app = await App.objects.select_related('stats').aget(id=app_id)
+    except App.DoesNotExist:
+        raise Http404('No App matches the given query.')
+
+    stats = stats_for(app)
+    csv_reviews = AppReview.objects.filter(app=app)
+    user_reviews = [
+        review async for review in UserReview.objects.filter(app=app, status='approved')
+        .select_related('user').order_by('-created_at').aiterator()
+    ]
+    user_has_supervisor, user_supervisor, supervisor_display_name = await sync_to_async(
+        views._supervisor_status
+    )(request.user)
+
+    return await sync_to_async(render)(request, 'search_app/app_detail.html', {
+        'app': app,
+        'stats': stats,
+        'csv_reviews': [review async for review in csv_reviews[:10].aiterator()],
+        'csv_review_count': stats.csv_reviews,
+        'user_reviews': user_reviews,
+        'similar_apps': [
+            row.similar async for row in neighbours_of(app.id, settings.SEARCH_SIMILAR_APPS_SHOWN).aiterator()
+        ],
+        'form': UserReviewForm(),
+        'user_has_supervisor': user_has_supervisor,
+        'user_supervisor': user_supervisor,
+        'supervisor_display_name': supervisor_display_name,
+    })
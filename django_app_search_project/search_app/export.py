@@ -0,0 +1,240 @@
+"""
+Streaming NDJSON and CSV export of search results and catalog slices
+
+Rows are read as values() dicts with QuerySet.iterator(chunk_size=...), so
+neither the App instances nor the encoded output of a large export are held
+in memory: each chunk is fetched, encoded and handed to the response (or
+file) before the next one is read.
+
+The parsing of search parameters and the unpaged ranking live here too, so
+the views and the export_apps command share them.
+"""
+import csv
+import json
+import math
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .facets import FACET_FIELDS
+from .models import App
+from .search_index import SORT_ORDERS, get_search_index
+
+# Columns of an exported app, in CSV column order
+EXPORT_FIELDS = (
+    'id', 'name', 'category', 'rating', 'reviews_count', 'size', 'installs', 'type', 'price',
+    'content_rating', 'genres', 'last_updated', 'current_version', 'android_version',
+    'installs_count', 'size_bytes', 'price_value', 'last_updated_date',
+)
+
+
+def catalog_rows(conditions=None, order_by=(), chunk_size=2000):
+    """
+    Apps matching SQL lookups, in one streamed query
+
+    Args:
+        conditions (dict): Field lookups such as {'installs_count__gte': 1000000}
+        order_by (tuple): order_by() expressions, e.g. SORT_ORDERS['installs']
+        chunk_size (int): Rows fetched from the database at a time
+
+    Yields:
+        dict: One app per row, with the EXPORT_FIELDS keys
+    """
+    queryset = App.objects.filter(**(conditions or {})).order_by(*(order_by or ('id',)))
+    yield from queryset.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def ranked_rows(app_ids, chunk_size=2000):
+    """
+    Apps in the order of ranked ids, fetched chunk_size ids per query
+
+    Yields:
+        dict: One app per row, with the EXPORT_FIELDS keys; ids of apps
+        deleted since they were ranked are skipped
+    """
+    for start in range(0, len(app_ids), chunk_size):
+        chunk = app_ids[start:start + chunk_size]
+        rows = App.objects.filter(id__in=chunk).values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+        rows_by_id = {row['id']: row for row in rows}
+        for app_id in chunk:
+            if app_id in rows_by_id:
+                yield rows_by_id[app_id]
+
+
+def ndjson_lines(rows):
+    """One JSON object per line; decimals are written as strings and dates in ISO format"""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class _LineBuffer:
+    """File-like object for csv.writer that hands back each written line"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """A header line, then one CSV line per row"""
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+# format -> (content type, encoder of row dicts into lines)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', ndjson_lines),
+    'csv': ('text/csv', csv_lines),
+}
+
+
+# Bounds of the BigIntegerField and DecimalField(max_digits=8, decimal_places=2) columns
+BIGINT_RANGE = (-2 ** 63, 2 ** 63 - 1)
+PRICE_RANGE = (Decimal('-999999.99'), Decimal('999999.99'))
+
+
+def _clamp(value, bounds):
+    return min(max(value, bounds[0]), bounds[1])
+
+
+def _parse_count(value):
+    return _clamp(int(value), BIGINT_RANGE)
+
+
+def _parse_size_mb(value):
+    megabytes = float(value)
+    if not math.isfinite(megabytes):
+        raise ValueError(f'Not a finite size: {value}')
+    return _clamp(int(megabytes * 1024 ** 2), BIGINT_RANGE)
+
+
+def _parse_price(value):
+    price = Decimal(value)
+    if not price.is_finite():
+        raise ValueError(f'Not a finite price: {value}')
+    return _clamp(price, PRICE_RANGE).quantize(Decimal('0.01'))
+
+
+# Range parameters on the typed App columns: name -> (field lookup, parser)
+RANGE_FILTERS = {
+    'min_installs': ('installs_count__gte', _parse_count),
+    'max_installs': ('installs_count__lte', _parse_count),
+    'max_size_mb': ('size_bytes__lte', _parse_size_mb),
+    'min_price': ('price_value__gte', _parse_price),
+    'max_price': ('price_value__lte', _parse_price),
+    'updated_after': ('last_updated_date__gte', date.fromisoformat),
+    'updated_before': ('last_updated_date__lte', date.fromisoformat),
+}
+
+
+def _range_conditions(params):
+    """
+    SQL lookups for the range parameters of a query string; malformed values are ignored
+
+    Returns:
+        tuple: (lookup -> value for QuerySet.filter, parameter -> raw value kept)
+    """
+    conditions = {}
+    kept = {}
+    for name, (lookup, parse) in RANGE_FILTERS.items():
+        raw = params.get(name, '').strip()
+        if not raw:
+            continue
+        try:
+            conditions[lookup] = parse(raw)
+        except (ValueError, InvalidOperation, OverflowError):
+            continue
+        kept[name] = raw
+    return conditions, kept
+
+
+def _facet_filters(params):
+    """Selected facet values of a query string, e.g. ?category=GAME&type=Free"""
+    filters = {}
+    for field in FACET_FIELDS:
+        values = sorted(set(value for value in params.getlist(field) if value))
+        if values:
+            filters[field] = values
+    return filters
+
+
+def search_request(params):
+    """
+    Search parameters of a query string (request.GET), shared by the sync and
+    async views, the export view and the export_apps command
+    """
+    query = params.get('q', '').strip()
+    semantic_enabled = settings.SEARCH_SEMANTIC_ENABLED
+    mode = 'semantic' if semantic_enabled and params.get('mode') == 'semantic' else 'keyword'
+    filters = _facet_filters(params)
+    sort = params.get('sort') if params.get('sort') in SORT_ORDERS else 'relevance'
+    conditions, range_params = _range_conditions(params)
+    options = {'mode': mode, 'sort': sort}
+    options.update({field: ','.join(values) for field, values in filters.items()})
+    options.update(range_params)
+    return {
+        'query': query,
+        'page_number': params.get('page'),
+        'semantic_enabled': semantic_enabled,
+        'mode': mode,
+        'filters': filters,
+        'sort': sort,
+        'conditions': conditions,
+        'range_params': range_params,
+        'browsing': bool(not query and (filters or conditions or sort != 'relevance')),
+        'options': options,
+    }
+
+
+def ranked_results(search, suggest=True):
+    """
+    Every result of a search, ranked or sorted, bypassing the page cache
+
+    Returns:
+        tuple: (RankedResults, did_you_mean)
+    """
+    query = search['query']
+    sort = search['sort']
+    did_you_mean = None
+    if search['browsing']:
+        # No query: the catalog filtered and sorted in SQL on indexed columns
+        results = get_search_index().sql_order(
+            None, SORT_ORDERS.get(sort), search['conditions'], search['filters']
+        )
+    elif search['mode'] == 'semantic':
+        # Nearest neighbours of the query in LSA embedding space
+        results = get_search_index().semantic_rank(query, search['filters'])
+    else:
+        # BM25 over the in-memory inverted index: only apps sharing a term
+        # with the query are scored, so there is no LIKE scan of the table.
+        # Facet bitsets filter the matches before ranking, and Paginator
+        # slices the ranking, which loads just the current page.
+        index = get_search_index()
+        results = index.rank(query, search['filters'])
+        if suggest:
+            did_you_mean = index.did_you_mean(query)
+    if query and (search['conditions'] or sort != 'relevance'):
+        # Sorting and range filters on the typed columns run in SQL
+        results = get_search_index().sql_order(results, SORT_ORDERS.get(sort), search['conditions'])
+    return results, did_you_mean
+
+
+def export_rows(search, chunk_size=None):
+    """
+    Every app of a search or catalog slice as export rows, without paging
+
+    Returns:
+        iterator: Row dicts, read from the database chunk_size at a time
+    """
+    chunk_size = chunk_size or settings.SEARCH_EXPORT_CHUNK_SIZE
+    if not search['query'] and not search['filters']:
+        # The whole catalog, or a range-filtered or sorted slice of it: one
+        # query streamed straight from the database cursor
+        return catalog_rows(search['conditions'], SORT_ORDERS.get(search['sort']), chunk_size)
+    # Ranking and facet filtering happen in the index; only the ordered ids
+    # are kept, and the rows are read a chunk at a time
+    results, _ = ranked_results(search)
+    return ranked_rows(results.app_ids(0, results.count()), chunk_size)
@@ -0,0 +1,208 @@
+"""
+Facet bitsets for filtering and counting search results
+
+Every value of every facet (category "GAME", type "Free", genre "Puzzle",
+...) owns one row of a boolean matrix over index positions. Filtering is a
+vectorized OR of the selected rows within a facet and an AND across facets,
+applied to the matches before they are ranked; counting the facet values
+of a result set is one column gather and a row sum, with no database query.
+"""
+import numpy as np
+
+from .utils import parse_price
+
+# (App field, label) in the order the facets are shown
+FACETS = (
+    ('category', 'Category'),
+    ('type', 'Type'),
+    ('content_rating', 'Content rating'),
+    ('genres', 'Genre'),
+    ('price', 'Price'),
+)
+
+FACET_FIELDS = tuple(field for field, _ in FACETS)
+
+# Price facet values: (label, upper bound exclusive)
+PRICE_BANDS = (
+    ('Free', 0.005),
+    ('Under $5', 5.0),
+    ('$5 to $20', 20.0),
+    ('$20 and up', float('inf')),
+)
+
+
+def price_band(price):
+    """Label of the PRICE_BANDS entry a price falls into"""
+    for label, upper in PRICE_BANDS:
+        if price < upper:
+            return label
+    return PRICE_BANDS[-1][0]
+
+
+def facet_values(field, value):
+    """
+    The facet values of one App field
+
+    Returns:
+        list: Genres split on ";", the band of a price, otherwise the value
+        itself; missing values (None, "", "nan") have no facet value
+    """
+    if field == 'price':
+        price = parse_price(value)
+        return [] if price is None else [price_band(price)]
+    parts = (value or '').split(';') if field == 'genres' else [value or '']
+    return [part.strip() for part in parts if part.strip() and part.strip().lower() != 'nan']
+
+
+class FacetIndex:
+    """
+    Boolean matrix of facet value rows x index positions
+
+    Rows of one facet are consecutive: facet i owns rows
+    bounds[i]:bounds[i + 1], and values[row] is the value a row stands for.
+    """
+
+    def __init__(self, fields, values, bounds, bitsets):
+        self.fields = fields
+        self.values = values
+        self.bounds = bounds
+        self.bitsets = bitsets
+        self.rows = {
+            (field, values[row]): row
+            for field, start, stop in zip(fields, bounds, bounds[1:])
+            for row in range(start, stop)
+        }
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Args:
+            rows (list): Dicts holding every field of FACET_FIELDS, in index order
+
+        Returns:
+            FacetIndex: The built index
+        """
+        values = []
+        bounds = [0]
+        members = []
+        for field in FACET_FIELDS:
+            positions_by_value = {}
+            for position, row in enumerate(rows):
+                for value in facet_values(field, row[field]):
+                    positions_by_value.setdefault(value, []).append(position)
+            if field == 'price':
+                ordered = [label for label, _ in PRICE_BANDS if label in positions_by_value]
+            else:
+                ordered = sorted(positions_by_value)
+            values.extend(ordered)
+            members.extend(positions_by_value[value] for value in ordered)
+            bounds.append(len(values))
+
+        bitsets = np.zeros((len(values), len(rows)), dtype=bool)
+        for row, positions in enumerate(members):
+            bitsets[row, positions] = True
+        return cls(list(FACET_FIELDS), values, bounds, bitsets)
+
+    def slice(self, start, stop):
+        """The same facets restricted to index positions start..stop"""
+        return FacetIndex(self.fields, self.values, self.bounds, self.bitsets[:, start:stop])
+
+    def selection(self, filters):
+        """
+        Resolve requested facet values to bitset rows
+
+        Args:
+            filters (dict): Field -> list of selected values
+
+        Returns:
+            dict: Field -> list of rows, for each filtered facet. A facet
+            whose values are all unknown gets an empty list, which matches
+            nothing.
+        """
+        selection = {}
+        for field in self.fields:
+            selected = (filters or {}).get(field)
+            if selected:
+                selection[field] = [
+                    self.rows[field, value] for value in selected if (field, value) in self.rows
+                ]
+        return selection
+
+    def mask(self, selection):
+        """
+        Positions passing a selection: any value within a facet, every facet
+
+        Returns:
+            numpy.ndarray: Boolean mask over positions, or None for no filters
+        """
+        if not selection:
+            return None
+        mask = np.ones(self.bitsets.shape[1], dtype=bool)
+        for rows in selection.values():
+            mask &= self.bitsets[rows].any(axis=0)
+        return mask
+
+    def counts(self, positions):
+        """Number of the given positions having each facet value, per row"""
+        return np.count_nonzero(self.bitsets[:, positions], axis=1)
+
+    def disjunctive_counts(self, positions, selection, scores=None, limit=None, within=None):
+        """
+        Per-row counts of the matches passing a selection, with disjunctive faceting
+
+        Unselected facets are counted over the matches passing the whole
+        selection; a selected facet is counted over the matches passing the
+        other facets' selections only, so picking one category keeps its
+        sibling categories, and their counts, available to add. Every count
+        comes from the matches' bitset columns; nothing is ranked again.
+
+        Args:
+            positions (numpy.ndarray): Matches before facet filtering
+            selection (dict): Field -> rows, from selection()
+            scores (numpy.ndarray): Scores of the matches, needed with a limit
+            limit (int): Only the best `limit` matches passing the filters
+                are results, as in a capped semantic ranking
+            within (numpy.ndarray): Optional boolean mask over positions that
+                results must also pass, applied after the limit
+
+        Returns:
+            numpy.ndarray: Counts per row, as from counts()
+        """
+        passes = {field: self.bitsets[rows][:, positions].any(axis=0) for field, rows in selection.items()}
+        inside = None if within is None else within[positions]
+
+        def counted(rows, excluded=None):
+            keep = np.ones(len(positions), dtype=bool)
+            for field, passed in passes.items():
+                if field != excluded:
+                    keep &= passed
+            kept = np.flatnonzero(keep)
+            if limit is not None and len(kept) > limit:
+                kept = kept[np.argpartition(-scores[kept], limit - 1)[:limit]]
+            if inside is not None:
+                kept = kept[inside[kept]]
+            return np.count_nonzero(self.bitsets[rows][:, positions[kept]], axis=1)
+
+        counts = counted(slice(None))
+        for field, start, stop in zip(self.fields, self.bounds, self.bounds[1:]):
+            if field in passes:
+                counts[start:stop] = counted(slice(start, stop), field)
+        return counts
+
+    def counts_by_facet(self, counts):
+        """
+        Group per-row counts by facet
+
+        Returns:
+            dict: Field -> list of (value, count) pairs with a non-zero count,
+            most frequent first (price bands keep their order)
+        """
+        grouped = {}
+        for field, start, stop in zip(self.fields, self.bounds, self.bounds[1:]):
+            pairs = [
+                (self.values[row], int(counts[row])) for row in range(start, stop) if counts[row]
+            ]
+            if field != 'price':
+                pairs.sort(key=lambda pair: (-pair[1], pair[0]))
+            grouped[field] = pairs
+        return grouped
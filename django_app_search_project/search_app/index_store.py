@@ -0,0 +1,233 @@
+"""
+On-disk format for SearchIndex, opened read-only with numpy.memmap
+
+Layout of an index file:
+
+    8 bytes   magic b'SSRCHIDX'
+    4 bytes   format version (little-endian uint32)
+    8 bytes   header length in bytes (little-endian uint64)
+    header    UTF-8 JSON: vocabularies, id maps and the dtype, shape and
+              offset of every array
+    arrays    raw little-endian arrays, each aligned to ARRAY_ALIGNMENT bytes
+
+The sparse matrices are stored as their CSR data/indices/indptr arrays,
+facet bitsets as one boolean matrix, popularity priors as one float32 array, and semantic embeddings, when fitted,
+as one contiguous float32 array.
+Every worker that opens the same file maps the same pages, so the
+operating system page cache holds one copy of the arrays no matter how many
+processes serve searches. The JSON header (TF-IDF and BM25 vocabularies,
+autocomplete prefix keys and names, spelling variants) is parsed into
+Python objects in every process and is not shared.
+"""
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+from scipy import sparse
+
+from .facets import FacetIndex
+from .search_index import BM25Index, SearchIndex
+from .semantic import IVFIndex, SemanticIndex
+from .suggest import FuzzyIndex, PrefixIndex
+from .utils import TextSimilarityEngine
+
+MAGIC = b'SSRCHIDX'
+FORMAT_VERSION = 3
+PREAMBLE = struct.Struct('<8sIQ')
+ARRAY_ALIGNMENT = 64
+
+
+class IndexFormatError(ValueError):
+    """The file is not a search index this code can read"""
+
+
+def _index_arrays(index):
+    arrays = {
+        'app_ids': index.app_ids,
+        'ratings': index.ratings,
+        'prior': index.prior,
+        'prefix_entry_ranks': index.prefix.entry_ranks,
+        'fuzzy_indptr': index.fuzzy.variant_indptr,
+        'fuzzy_word_ids': index.fuzzy.variant_words,
+        'fuzzy_frequencies': np.asarray(index.fuzzy.frequencies, dtype=np.int64),
+        'facet_bitsets': index.facets.bitsets,
+    }
+    for name, matrix in (('bm25', index.bm25.term_weights), ('tfidf', index.engine.document_matrix)):
+        if matrix is not None:
+            arrays[f'{name}_data'] = matrix.data
+            arrays[f'{name}_indices'] = matrix.indices
+            arrays[f'{name}_indptr'] = matrix.indptr
+    if index.engine.document_matrix is not None:
+        arrays['tfidf_idf'] = index.engine.vectorizer.idf_
+    # Semantic embeddings are only stored once something has fitted them
+    semantic = index._semantic
+    if semantic is not None:
+        arrays['semantic_term_vectors'] = semantic.term_vectors
+        arrays['semantic_embeddings'] = semantic.embeddings
+        if semantic.ann is not None:
+            arrays['ivf_centroids'] = semantic.ann.centroids
+            arrays['ivf_indptr'] = semantic.ann.list_indptr
+            arrays['ivf_members'] = semantic.ann.list_members
+    return arrays
+
+
+def write_index(index, path):
+    """
+    Write a SearchIndex to path
+
+    The file is written next to its destination and renamed into place, so
+    a reader never opens a half-written index.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in _index_arrays(index).items()}
+
+    header = {
+        'built_at': index.built_at,
+        'version': index.version,
+        'build_seconds': index.build_seconds,
+        'bm25_shape': list(index.bm25.term_weights.shape),
+        'bm25_terms': index.bm25.terms,
+        'tfidf_shape': None,
+        'tfidf_terms': None,
+        'prefix_keys': index.prefix.keys,
+        'prefix_names': index.prefix.names_by_rank,
+        'fuzzy_words': index.fuzzy.words,
+        'fuzzy_variants': index.fuzzy.variants,
+        'fuzzy_max_distance': index.fuzzy.max_distance,
+        'facet_fields': index.facets.fields,
+        'facet_values': index.facets.values,
+        'facet_bounds': index.facets.bounds,
+        'ivf_probes': None,
+        'arrays': {},
+    }
+    if index.engine.document_matrix is not None:
+        header['tfidf_shape'] = list(index.engine.document_matrix.shape)
+        header['tfidf_terms'] = list(index.engine.vectorizer.get_feature_names_out())
+    if index._semantic is not None and index._semantic.ann is not None:
+        header['ivf_probes'] = index._semantic.ann.probes
+
+    # Offsets are relative to the first aligned byte after the header
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {
+            'dtype': array.dtype.newbyteorder('<').str,
+            'shape': list(array.shape),
+            'offset': offset,
+        }
+        offset += -(-array.nbytes // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(PREAMBLE.size + len(header_bytes)) // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.search-index-')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            handle.write(header_bytes)
+            for name, array in arrays.items():
+                handle.seek(data_start + header['arrays'][name]['offset'])
+                handle.write(array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes())
+            handle.truncate(data_start + offset)
+        # mkstemp creates the file owner-only; workers may run as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_header(path):
+    """
+    Parse and validate the preamble and JSON header of an index file
+
+    Returns:
+        tuple: (header dict, byte offset where the arrays start)
+
+    Raises:
+        IndexFormatError: Wrong magic bytes or an unsupported format version
+    """
+    with open(path, 'rb') as handle:
+        preamble = handle.read(PREAMBLE.size)
+        if len(preamble) != PREAMBLE.size:
+            raise IndexFormatError(f'{path} is too short to be a search index')
+        magic, version, header_length = PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise IndexFormatError(f'{path} is not a search index file')
+        if version != FORMAT_VERSION:
+            raise IndexFormatError(
+                f'{path} uses index format version {version}, expected {FORMAT_VERSION}; '
+                'rebuild it with manage.py build_search_index'
+            )
+        header = json.loads(handle.read(header_length).decode('utf-8'))
+    data_start = -(-(PREAMBLE.size + header_length) // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+    return header, data_start
+
+
+def load_index(path):
+    """
+    Open an index file read-only; arrays are memory-mapped, not copied
+
+    Returns:
+        SearchIndex: An index backed by the file's pages
+    """
+    header, data_start = read_header(path)
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        shape = tuple(spec['shape'])
+        if not np.prod(shape):
+            # numpy cannot map zero bytes
+            arrays[name] = np.empty(shape, dtype=spec['dtype'])
+            continue
+        arrays[name] = np.memmap(
+            path, dtype=spec['dtype'], mode='r', offset=data_start + spec['offset'], shape=shape
+        )
+
+    def csr(name, shape):
+        return sparse.csr_matrix(
+            (arrays[f'{name}_data'], arrays[f'{name}_indices'], arrays[f'{name}_indptr']),
+            shape=tuple(shape),
+            copy=False,
+        )
+
+    engine = TextSimilarityEngine(max_features=None)
+    if header['tfidf_terms'] is not None:
+        engine = TextSimilarityEngine.restore(
+            header['tfidf_terms'], np.asarray(arrays['tfidf_idf']), csr('tfidf', header['tfidf_shape'])
+        )
+
+    semantic = None
+    if 'semantic_embeddings' in arrays:
+        ann = None
+        if 'ivf_centroids' in arrays:
+            ann = IVFIndex(
+                arrays['ivf_centroids'], arrays['ivf_indptr'], arrays['ivf_members'], header['ivf_probes']
+            )
+        semantic = SemanticIndex(arrays['semantic_term_vectors'], arrays['semantic_embeddings'], ann)
+
+    index = SearchIndex(
+        arrays['app_ids'],
+        engine,
+        BM25Index(header['bm25_terms'], csr('bm25', header['bm25_shape'])),
+        arrays['ratings'],
+        PrefixIndex(header['prefix_keys'], arrays['prefix_entry_ranks'], header['prefix_names']),
+        FuzzyIndex(
+            header['fuzzy_words'],
+            arrays['fuzzy_frequencies'].tolist(),
+            header['fuzzy_variants'],
+            arrays['fuzzy_indptr'],
+            arrays['fuzzy_word_ids'],
+            header['fuzzy_max_distance'],
+        ),
+        FacetIndex(header['facet_fields'], header['facet_values'], header['facet_bounds'], arrays['facet_bitsets']),
+        semantic,
+        arrays['prior'],
+    )
+    index.built_at = header['built_at']
+    index.version = header['version']
+    index.build_seconds = header.get('build_seconds')
+    index.loaded_from = path
+    return index
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from search_app.search_index import get_search_index
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent throughput of the sync views behind a threaded WSGI handler '
+        'with the async views behind the ASGI handler, and autocomplete latency while slow searches run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Autocomplete requests (default: 400)')
+        parser.add_argument('--slow-requests', type=int, default=40,
+                            help='Slow sorted searches running alongside (default: 40)')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight (default: 32)')
+        parser.add_argument('--threads', type=int, default=4, help='WSGI worker threads (default: 4)')
+        # Internal: measure one mode in a child process
+        parser.add_argument('--run', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['run']:
+            # Child process: the URLconf was imported with this mode's views.
+            # The test clients send Host: testserver.
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                self.stdout.write(json.dumps(self.run_mode(options)))
+            return
+
+        reports = {}
+        for mode in ('wsgi', 'asgi'):
+            env = dict(os.environ, SEARCH_ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+            command = [
+                sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_async_views', '--run', mode,
+                '--requests', str(options['requests']), '--slow-requests', str(options['slow_requests']),
+                '--concurrency', str(options['concurrency']), '--threads', str(options['threads']),
+            ]
+            output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+            reports[mode] = json.loads(output.strip().splitlines()[-1])
+
+        self.stdout.write(
+            f'{options["requests"]} autocomplete + {options["slow_requests"]} sorted searches, '
+            f'{options["concurrency"]} in flight'
+        )
+        for mode, report in reports.items():
+            self.stdout.write(
+                f'  {mode.upper()}: {report["requests_per_second"]:8.0f} req/s   '
+                f'autocomplete p50 {report["p50_ms"]:7.1f} ms   p95 {report["p95_ms"]:7.1f} ms'
+            )
+
+    def workload(self, options):
+        names = get_search_index().prefix.names_by_rank
+        if not names:
+            raise SystemExit('The catalog is empty; run load_data first')
+        rng = random.Random(0)
+        requests = [
+            ('suggest', '/search/suggestions/', {'q': rng.choice(names)[:4]})
+            for _ in range(options['requests'])
+        ]
+        # Sorting a broad query by size goes through SQL over every match
+        requests += [
+            ('slow', '/search/', {'q': rng.choice(names).split()[0], 'sort': 'size', 'page': rng.randint(1, 3)})
+            for _ in range(options['slow_requests'])
+        ]
+        rng.shuffle(requests)
+        return requests
+
+    def run_mode(self, options):
+        requests = self.workload(options)
+        mode = options['run']
+        assert settings.SEARCH_ASYNC_VIEWS == (mode == 'asgi')
+
+        started = time.perf_counter()
+        if mode == 'wsgi':
+            latencies = self.run_wsgi(requests, options)
+        else:
+            latencies = asyncio.run(self.run_asgi(requests, options))
+        elapsed = time.perf_counter() - started
+
+        suggest = sorted(latency for kind, latency in latencies if kind == 'suggest')
+        return {
+            'requests_per_second': len(latencies) / elapsed,
+            'p50_ms': statistics.median(suggest) * 1000,
+            'p95_ms': suggest[int(len(suggest) * 0.95) - 1] * 1000,
+        }
+
+    def run_wsgi(self, requests, options):
+        # --concurrency clients against a threaded WSGI server that handles
+        # at most --threads requests at once; the rest wait for a thread
+        server_threads = threading.BoundedSemaphore(options['threads'])
+
+        def timed(request):
+            kind, path, params = request
+            started = time.perf_counter()
+            with server_threads:
+                response = Client().get(path, params)
+            assert response.status_code == 200, (path, params, response.status_code)
+            return kind, time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as clients:
+            return list(clients.map(timed, requests))
+
+    async def run_asgi(self, requests, options):
+        # --concurrency clients against one event loop; the async views hand
+        # scoring to the SEARCH_ASYNC_WORKERS pool
+        in_flight = asyncio.Semaphore(options['concurrency'])
+
+        async def timed(kind, path, params):
+            async with in_flight:
+                started = time.perf_counter()
+                response = await AsyncClient().get(path, params)
+                assert response.status_code == 200, (path, params, response.status_code)
+                return kind, time.perf_counter() - started
+
+        return await asyncio.gather(*(timed(*request) for request in requests))
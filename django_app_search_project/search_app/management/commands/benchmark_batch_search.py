@@ -0,0 +1,41 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from search_app.search_index import get_search_index
+
+class Command(BaseCommand):
+    help = 'Compare queries per second of one-by-one search and batch_search on the current catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=2000, help='Number of queries to run (default: 2000)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Queries per batch (default: 500)')
+        parser.add_argument('--limit', type=int, default=20, help='Results per query (default: 20)')
+
+    def handle(self, *args, **options):
+        index = get_search_index()
+        names = index.prefix.names_by_rank
+        if not names:
+            self.stdout.write(self.style.WARNING('The catalog is empty; run load_data first'))
+            return
+
+        # Query-log stand-in: the first two words of randomly chosen app names
+        rng = random.Random(0)
+        queries = [' '.join(rng.choice(names).split()[:2]) for _ in range(options['queries'])]
+        limit = options['limit']
+        batch_size = max(1, options['batch_size'])
+
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query, limit)
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for start in range(0, len(queries), batch_size):
+            index.batch_search(queries[start:start + batch_size], limit)
+        batched = time.perf_counter() - started
+
+        self.stdout.write(f'{len(queries)} queries over {len(index)} apps, top {limit}')
+        self.stdout.write(f'  one by one:           {len(queries) / single:10.0f} queries/s')
+        self.stdout.write(f'  batches of {batch_size:<6}     {len(queries) / batched:10.0f} queries/s')
+        self.stdout.write(self.style.SUCCESS(f'Batch speed-up: {single / batched:.1f}x'))
@@ -0,0 +1,73 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from search_app.models import AppReview, UserReview
+from search_app.sentiment import lexicon_sentiments, polarity_label, textblob_sentiments
+
+# Filler words of the synthetic corpus, used when the database has no reviews
+FILLER = (
+    "the a is it app this i my to and but so of for phone update game very really not no never don't it's , . ! ? :)"
+).split()
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of the textblob and lexicon sentiment backends on stored reviews '
+        '(or a synthetic corpus) and how closely their scores agree'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=5000, help='Reviews to score (default: 5000)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Reviews per lexicon batch (default: 500)')
+        parser.add_argument('--tolerance', type=float, default=0.05, help='Agreement tolerance (default: 0.05)')
+
+    def handle(self, *args, **options):
+        texts = self.corpus(options['reviews'])
+        self.stdout.write(f'Scoring {len(texts)} reviews...')
+
+        started = time.perf_counter()
+        reference = np.array(textblob_sentiments(texts)).reshape(-1, 2)
+        textblob_seconds = time.perf_counter() - started
+
+        # The first batch pays for loading the lexicon; time the steady state like TextBlob's
+        lexicon_sentiments(texts[:1])
+        started = time.perf_counter()
+        scores = []
+        for start in range(0, len(texts), max(options['batch_size'], 1)):
+            scores.extend(lexicon_sentiments(texts[start:start + options['batch_size']]))
+        lexicon_seconds = time.perf_counter() - started
+        scores = np.array(scores).reshape(-1, 2)
+
+        for name, seconds in (('textblob', textblob_seconds), ('lexicon', lexicon_seconds)):
+            self.stdout.write(f'  {name:10s} {len(texts) / max(seconds, 1e-9):10.0f} reviews/s  ({seconds:.2f}s)')
+        self.stdout.write(f'  speed-up   {textblob_seconds / max(lexicon_seconds, 1e-9):10.1f}x')
+
+        difference = np.abs(scores - reference)
+        labels = [polarity_label(p) == polarity_label(q) for p, q in zip(scores[:, 0], reference[:, 0])]
+        within = (difference <= options['tolerance']).all(axis=1)
+        self.stdout.write(
+            f'Agreement with TextBlob: mean |difference| polarity {difference[:, 0].mean():.4f}, '
+            f'subjectivity {difference[:, 1].mean():.4f}; {within.mean():.1%} of reviews within '
+            f'{options["tolerance"]}, {np.mean(labels):.1%} same label'
+        )
+
+    def corpus(self, size):
+        texts = list(AppReview.objects.values_list('translated_review', flat=True)[:size])
+        texts += list(UserReview.objects.values_list('review_text', flat=True)[:size - len(texts)])
+        if texts:
+            return texts
+        self.stdout.write('No reviews stored; using a synthetic corpus')
+        from textblob.en import sentiment
+
+        if not dict.__len__(sentiment):
+            sentiment.load()
+        words = list(dict.keys(sentiment))
+        generator = random.Random(0)
+        return [
+            ' '.join(
+                generator.choice(words) if generator.random() < 0.3 else generator.choice(FILLER)
+                for _ in range(generator.randint(1, 30))
+            )
+            for _ in range(size)
+        ]
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+# Dependencies whose import cost startup should not pay
+HEAVY_MODULES = ('sklearn', 'pandas', 'textblob', 'nltk', 'scipy', 'numpy')
+
+class Command(BaseCommand):
+    help = (
+        'Measure process startup (interpreter + django.setup() + warm-up) and time to the first '
+        'search response in fresh processes, with and without a warm-up'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh processes per scenario (default: 5)')
+        parser.add_argument('--query', default='photo editor', help='Search of the first request (default: "photo editor")')
+        parser.add_argument(
+            '--warmup', default='index,sentiment',
+            help='SEARCH_WARMUP steps of the warm-up scenario (default: index,sentiment)'
+        )
+        # Internal: measure one fresh process, started at the given time.time()
+        parser.add_argument('--run', type=float, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['run']:
+            self.stdout.write(json.dumps(self.run_once(options)))
+            return
+
+        scenarios = {'lazy': '', f'warm-up ({options["warmup"]})': options['warmup']}
+        for label, steps in scenarios.items():
+            env = dict(os.environ, SEARCH_WARMUP=steps)
+            reports = []
+            for _ in range(options['runs']):
+                started = time.time()
+                command = [
+                    sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_startup',
+                    '--run', repr(started), '--query', options['query'],
+                ]
+                output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+                reports.append(json.loads(output.strip().splitlines()[-1]))
+
+            self.stdout.write(f'{label}: median of {len(reports)} fresh processes')
+            for key, name in (('startup', 'startup'), ('first_response', 'first response'),
+                              ('ready_to_response', 'time to first response'), ('second_response', 'next response')):
+                self.stdout.write(f'  {name:24s} {statistics.median(report[key] for report in reports) * 1000:8.0f} ms')
+            self.stdout.write(f'  loaded at startup: {", ".join(reports[0]["loaded"]) or "none of " + ", ".join(HEAVY_MODULES)}')
+
+    def run_once(self, options):
+        # django.setup() and SearchAppConfig.ready() ran before this command started
+        ready = time.time()
+        loaded = [module for module in HEAVY_MODULES if module in sys.modules]
+
+        client = Client()
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            client.get('/search/', {'q': options['query']})
+            first = time.time()
+            client.get('/search/', {'q': options['query'], 'page': 2})
+            second = time.time()
+        return {
+            'startup': ready - options['run'],
+            'first_response': first - ready,
+            'ready_to_response': first - options['run'],
+            'second_response': second - first,
+            'loaded': loaded,
+        }
@@ -0,0 +1,62 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from search_app.search_index import get_search_index
+from search_app.suggest import CandidateCache
+
+class Command(BaseCommand):
+    help = 'Measure per-keystroke autocomplete latency with and without the prefix candidate cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=500, help='Names typed one keystroke at a time (default: 500)')
+        parser.add_argument('--typo-rate', type=float, default=0.2,
+                            help='Share of sessions with a dropped letter, which go through spelling correction (default: 0.2)')
+
+    def handle(self, *args, **options):
+        index = get_search_index()
+        names = index.prefix.names_by_rank
+        if not names:
+            self.stdout.write(self.style.WARNING('The catalog is empty; run load_data first'))
+            return
+
+        # Popular apps are typed more often
+        rng = random.Random(0)
+        sessions = []
+        for _ in range(options['sessions']):
+            name = names[min(int(rng.expovariate(1 / 200)), len(names) - 1)][:20]
+            if rng.random() < options['typo_rate'] and len(name) > 5:
+                drop = rng.randrange(3, len(name))
+                name = name[:drop] + name[drop + 1:]
+            sessions.append(name)
+        keystrokes = [name[:end] for name in sessions for end in range(3, len(name) + 1)]
+
+        cached = CandidateCache(settings.SEARCH_SUGGEST_CACHE_CANDIDATES, settings.SEARCH_SUGGEST_CACHE_ENTRIES)
+        results = {}
+        for label, cache in (('rescan', None), ('prefix cache', cached)):
+            latencies = []
+            for query in keystrokes:
+                started = time.perf_counter()
+                index.prefix.suggest(query, fuzzy=index.fuzzy, cache=cache)
+                latencies.append(time.perf_counter() - started)
+            results[label] = sorted(latencies)
+
+        self.stdout.write(f'{len(sessions)} typing sessions, {len(keystrokes)} keystrokes over {len(index)} apps')
+        for label, latencies in results.items():
+            self.stdout.write(
+                f'  {label:<13} mean {statistics.fmean(latencies) * 1e6:8.1f} us   '
+                f'p50 {latencies[len(latencies) // 2] * 1e6:8.1f} us   '
+                f'p95 {latencies[int(len(latencies) * 0.95)] * 1e6:8.1f} us   '
+                f'p99 {latencies[int(len(latencies) * 0.99)] * 1e6:8.1f} us'
+            )
+        stats = cached.stats()
+        self.stdout.write(
+            f'  cache: {stats["hits"]} hits, {stats["refinements"]} refinements, {stats["misses"]} misses; '
+            f'{stats["prefixes"]} prefixes holding {stats["candidates"]} candidates, '
+            f'{stats["corrections"]} word corrections'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Mean speed-up: {statistics.fmean(results["rescan"]) / statistics.fmean(results["prefix cache"]):.1f}x'
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from search_app.index_store import write_index
+from search_app.search_index import rebuild_search_index
+
+class Command(BaseCommand):
+    help = 'Fit the catalog search index, report its size and optionally write it to disk'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=getattr(settings, 'SEARCH_INDEX_PATH', None),
+            help='Index file to write for memory-mapped loading (default: SEARCH_INDEX_PATH)'
+        )
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Building search index...')
+        started = time.perf_counter()
+        index = rebuild_search_index()
+        elapsed = time.perf_counter() - started
+        
+        vocabulary_size = 0
+        if index.engine.document_matrix is not None:
+            vocabulary_size = len(index.engine.vectorizer.vocabulary_)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Indexed {len(index)} apps ({vocabulary_size} terms) in {elapsed:.2f}s, version {index.version}'
+            )
+        )
+        
+        if options['output']:
+            if settings.SEARCH_SEMANTIC_ENABLED and index.engine.document_matrix is not None:
+                # Fit the LSA embeddings now so workers map them instead of refitting
+                self.stdout.write('Fitting semantic embeddings...')
+                index.semantic
+            write_index(index, options['output'])
+            self.stdout.write(self.style.SUCCESS(f'Wrote search index to {options["output"]}'))
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from search_app.search_index import get_search_index
+from search_app.similar import build_similar_apps
+
+class Command(BaseCommand):
+    help = 'Precompute the nearest neighbours of every app for the "similar apps" panel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=settings.SEARCH_SIMILAR_APPS,
+            help='Neighbours stored per app (default: SEARCH_SIMILAR_APPS)'
+        )
+        parser.add_argument(
+            '--block-size', type=int, default=settings.SEARCH_SIMILAR_BLOCK_SIZE,
+            help='Apps compared against the catalog per sparse product (default: SEARCH_SIMILAR_BLOCK_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        index = get_search_index()
+        self.stdout.write(f'Comparing {len(index)} apps in blocks of {options["block_size"]}...')
+        started = time.perf_counter()
+        written = build_similar_apps(index, options['top'], max(options['block_size'], 1))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} neighbours in {elapsed:.2f}s'))
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from search_app.export import EXPORT_FORMATS, export_rows, search_request
+
+class Command(BaseCommand):
+    help = 'Stream search results or a catalog slice to a file as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'params', nargs='?', default='',
+            help='Search parameters as in a /search/ URL, e.g. "q=finance" or "category=FAMILY&sort=installs" '
+                 '(default: the whole catalog)'
+        )
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='ndjson', help='Output format (default: ndjson)')
+        parser.add_argument('--output', help='File to write (default: standard output)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.SEARCH_EXPORT_CHUNK_SIZE,
+            help='Rows read from the database at a time (default: SEARCH_EXPORT_CHUNK_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        search = search_request(QueryDict(options['params']))
+        _, encode = EXPORT_FORMATS[options['format']]
+        rows = export_rows(search, options['chunk_size'])
+
+        counted = [0]
+
+        def counting(rows):
+            for row in rows:
+                counted[0] += 1
+                yield row
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else self.stdout
+        try:
+            for line in encode(counting(rows)):
+                output.write(line)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'Exported {counted[0]} apps to {options["output"]}'))
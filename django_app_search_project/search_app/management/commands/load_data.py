@@ -1,8 +1,11 @@
 import os
 import pandas as pd
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from search_app.models import App, AppReview
+from search_app.search_cache import invalidate_search_cache
+from search_app.search_index import invalidate_search_index
 
 class Command(BaseCommand):
     help = 'Load data from CSV files'
@@ -15,6 +18,8 @@ class Command(BaseCommand):
         self.stdout.write('Loading apps data...')
         apps_df = pd.read_csv(apps_file)
         
+        # App.save() parses installs, size, price and last_updated into the
+        # indexed installs_count, size_bytes, price_value and last_updated_date
         for _, row in apps_df.iterrows():
             app, created = App.objects.get_or_create(
                 name=row['App'],
@@ -34,6 +39,12 @@ class Command(BaseCommand):
                 }
             )
         
+        # Cached search pages and the in-memory index describe the old catalog.
+        # This only reaches this process and, for the page cache, processes
+        # sharing a cache backend; web workers are told below.
+        invalidate_search_index()
+        invalidate_search_cache()
+        
         self.stdout.write('Loading reviews data...')
         reviews_df = pd.read_csv(reviews_file)
         
@@ -56,4 +67,15 @@ class Command(BaseCommand):
         
         self.stdout.write(
             self.style.SUCCESS('Successfully loaded data from CSV files')
-        )
\ No newline at end of file
+        )
+
+        if getattr(settings, 'SEARCH_INDEX_PATH', None):
+            # Workers notice the new file within SEARCH_INDEX_RELOAD_INTERVAL
+            # seconds and drop their cached pages when they switch to it
+            call_command('build_search_index', stdout=self.stdout._out)
+        else:
+            self.stdout.write(self.style.WARNING(
+                'Running web workers keep their in-memory search index (and, with the default '
+                'locmem cache, their cached result pages) until they restart; set SEARCH_INDEX_PATH '
+                'to have them pick up the new catalog without a restart'
+            ))
\ No newline at end of file
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from search_app.sentiment_queue import run_batch
+
+class Command(BaseCommand):
+    help = 'Score queued user reviews in batches until stopped (or once with --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.SENTIMENT_JOB_BATCH_SIZE,
+            help='Jobs claimed per batch (default: SENTIMENT_JOB_BATCH_SIZE)'
+        )
+        parser.add_argument('--once', action='store_true', help='Process the jobs that are due now, then exit')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty (default: 2)')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        total_scored = total_failed = 0
+        try:
+            while True:
+                scored, failed = run_batch(batch_size)
+                total_scored += scored
+                total_failed += failed
+                if scored or failed:
+                    self.stdout.write(f'Scored {scored} reviews, {failed} failed')
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Scored {total_scored} reviews, {total_failed} failed attempts'))
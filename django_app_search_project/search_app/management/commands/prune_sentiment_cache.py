@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from search_app.sentiment import analyzer_version
+from search_app.sentiment_cache import purge_stale
+
+class Command(BaseCommand):
+    help = 'Delete cached review sentiment scored by an analyzer version other than the current one'
+
+    def handle(self, *args, **options):
+        analyzer = analyzer_version()
+        deleted = purge_stale(analyzer)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} cached scores; keeping those of {analyzer}'))
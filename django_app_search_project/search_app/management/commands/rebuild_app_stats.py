@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+from search_app.app_stats import rebuild_app_stats
+
+class Command(BaseCommand):
+    help = 'Recompute the per-app review counts and sentiment totals (app_stats) from the review tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', type=int, action='append', help='Only this app id (repeatable)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_app_stats(options['app'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats of {written} apps in {elapsed:.2f}s'))
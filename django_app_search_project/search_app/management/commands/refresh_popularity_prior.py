@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from search_app.index_store import write_index
+from search_app.search_index import get_search_index
+
+class Command(BaseCommand):
+    help = 'Recompute the popularity prior used by hybrid ranking, optionally rewriting the index file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=getattr(settings, 'SEARCH_INDEX_PATH', None),
+            help='Index file to rewrite with the new prior (default: SEARCH_INDEX_PATH)'
+        )
+        parser.add_argument('--top', type=int, default=10, help='Apps with the highest prior to list (default: 10)')
+
+    def handle(self, *args, **options):
+        index = get_search_index()
+        started = time.perf_counter()
+        prior = index.refresh_prior()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Refreshed the prior of {len(prior)} apps in {elapsed:.2f}s (mean {prior.mean():.3f})')
+        )
+        from search_app.models import App
+        top_positions = prior.argsort()[::-1][:options['top']]
+        names = App.objects.in_bulk(index.app_ids[top_positions].tolist())
+        for position in top_positions.tolist():
+            app = names.get(int(index.app_ids[position]))
+            self.stdout.write(f'  {prior[position]:.3f}  {app.name if app else index.app_ids[position]}')
+
+        if options['output']:
+            write_index(index, options['output'])
+            self.stdout.write(self.style.SUCCESS(f'Wrote search index to {options["output"]}'))
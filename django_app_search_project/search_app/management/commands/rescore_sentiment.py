@@ -0,0 +1,130 @@
+import collections
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from search_app.app_stats import rebuild_app_stats
+from search_app.models import AppReview, UserReview
+from search_app.sentiment import (
+    analyze_texts, app_review_fields, cached_sentiments, combined_sentiment, store_sentiments,
+)
+from search_app.sentiment_cache import sentiment_cache_stats
+
+# --source -> (model, text and other columns the scores depend on, columns written,
+#              function of those columns and the text scores returning the written values)
+SOURCES = {
+    'user': (
+        UserReview, ['review_text', 'rating'], UserReview.SENTIMENT_FIELDS,
+        lambda text, rating, text_scores: combined_sentiment(text, rating, text_scores),
+    ),
+    'csv': (
+        AppReview, ['translated_review'], ['sentiment', 'sentiment_polarity', 'sentiment_subjectivity'],
+        lambda text, text_scores: app_review_fields(text, text_scores),
+    ),
+}
+
+class Command(BaseCommand):
+    help = (
+        'Re-score stored review sentiment after the scoring changes: reviews are read in chunks, texts missing '
+        'from the sentiment cache are scored in a process pool and the changed reviews written back with bulk_update'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', choices=list(SOURCES), default='user',
+            help='user: community reviews (default); csv: dataset reviews with no polarity'
+        )
+        parser.add_argument('--since', help='Only reviews submitted on or after this date (YYYY-MM-DD, user reviews)')
+        parser.add_argument('--app', type=int, action='append', help='Only reviews of this app id (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Score and report changes without writing them')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Scoring processes (default: CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Reviews read, scored and written at a time (default: 500)')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be at least 1')
+        model, inputs, fields, build = SOURCES[options['source']]
+
+        reviews = model.objects.all()
+        if options['source'] == 'csv':
+            # Dataset labels are kept; only rows the dataset left unscored are filled in
+            reviews = reviews.filter(sentiment_polarity__isnull=True)
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None or options['source'] != 'user':
+                raise CommandError('--since takes a YYYY-MM-DD date and applies to user reviews only')
+            reviews = reviews.filter(created_at__date__gte=since)
+        if options['app']:
+            reviews = reviews.filter(app_id__in=options['app'])
+
+        total = reviews.count()
+        self.stdout.write(f'Re-scoring {total} reviews with {options["workers"]} worker(s)...')
+        rows = reviews.order_by('id').values_list('id', *inputs, *fields).iterator(chunk_size=options['chunk_size'])
+        chunks = iter(lambda: list(itertools.islice(rows, options['chunk_size'])), [])
+
+        self.started = time.perf_counter()
+        self.done = self.changed = 0
+        self.transitions = collections.Counter()
+        cache_before = sentiment_cache_stats()
+        if options['workers'] == 1:
+            for chunk in chunks:
+                lookup = cached_sentiments([row[1] for row in chunk])
+                self.apply(chunk, lookup, analyze_texts(list(lookup[2].values())), build, model, fields, total, options)
+        else:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            window = options['workers'] * 2
+            pending = collections.deque()
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                for chunk in chunks:
+                    lookup = cached_sentiments([row[1] for row in chunk])
+                    pending.append((chunk, lookup, executor.submit(analyze_texts, list(lookup[2].values()))))
+                    if len(pending) >= window:
+                        chunk, lookup, future = pending.popleft()
+                        self.apply(chunk, lookup, future.result(), build, model, fields, total, options)
+                while pending:
+                    chunk, lookup, future = pending.popleft()
+                    self.apply(chunk, lookup, future.result(), build, model, fields, total, options)
+
+        if self.changed and not options['dry_run']:
+            # bulk_update bypasses the signals that keep app_stats current
+            rebuild_app_stats(options['app'])
+        elapsed = time.perf_counter() - self.started
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {self.changed} of {self.done} reviews in {elapsed:.2f}s ({self.done / max(elapsed, 1e-9):.0f} reviews/s)'
+        ))
+        cache = {key: value - cache_before[key] for key, value in sentiment_cache_stats().items() if key != 'entries'}
+        lookups = cache['lru_hits'] + cache['db_hits'] + cache['misses']
+        self.stdout.write(
+            f'Sentiment cache: {cache["lru_hits"]} in-process hits, {cache["db_hits"]} stored hits, '
+            f'{cache["misses"]} texts scored ({(lookups - cache["misses"]) / lookups if lookups else 0:.0%} hit rate)'
+        )
+        for (before, after), count in sorted(self.transitions.items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {before or "unscored"} -> {after}: {count}')
+
+    def apply(self, chunk, lookup, scores, build, model, fields, total, options):
+        """Write the reviews of one scored chunk whose scores changed and report progress"""
+        keys, found, missing = lookup
+        found.update(store_sentiments(missing, scores))
+
+        changed = []
+        for row, key in zip(chunk, keys):
+            values = build(*row[1:-len(fields)], found[key])
+            if values is None:
+                continue
+            before = row[-len(fields):]
+            if tuple(values[field] for field in fields) != tuple(before):
+                changed.append(model(id=row[0], **values))
+                self.transitions[before[0], values['sentiment']] += 1
+        if changed and not options['dry_run']:
+            with transaction.atomic():
+                model.objects.bulk_update(changed, fields)
+
+        self.done += len(chunk)
+        self.changed += len(changed)
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'  {self.done}/{total} reviews, {self.changed} changed ({self.done / max(elapsed, 1e-9):.0f} reviews/s)')
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:51
+
+import math
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import migrations, models
+
+TYPED_FIELDS = ['installs_count', 'size_bytes', 'price_value', 'last_updated_date']
+
+# Frozen copy of the search_app.utils parsers as of this migration, so later
+# changes to them cannot change what it does
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_installs(value):
+    digits = str(value or '').replace(',', '').replace('+', '').strip()
+    return int(digits) if digits.isdigit() else None
+
+
+def parse_price(value):
+    text = str(value or '').replace('$', '').replace(',', '').strip()
+    try:
+        price = float(text)
+    except ValueError:
+        return None
+    return price if math.isfinite(price) else None
+
+
+def parse_size(value):
+    text = str(value or '').strip().upper()
+    multiplier = SIZE_UNITS.get(text[-1:])
+    if multiplier is None:
+        return None
+    try:
+        number = float(text[:-1].replace(',', ''))
+    except ValueError:
+        return None
+    return int(round(number * multiplier)) if math.isfinite(number) else None
+
+
+def parse_last_updated(value):
+    try:
+        return datetime.strptime(str(value or '').strip(), '%B %d, %Y').date()
+    except ValueError:
+        return None
+
+
+def typed_app_fields(installs, size, price, last_updated):
+    price_value = parse_price(price)
+    return {
+        'installs_count': parse_installs(installs),
+        'size_bytes': parse_size(size),
+        'price_value': None if price_value is None else Decimal(str(price_value)).quantize(Decimal('0.01')),
+        'last_updated_date': parse_last_updated(last_updated),
+    }
+
+
+def backfill_typed_fields(apps, schema_editor):
+    App = apps.get_model('search_app', 'App')
+    batch = []
+    for app in App.objects.only('installs', 'size', 'price', 'last_updated').iterator(chunk_size=2000):
+        for field, value in typed_app_fields(app.installs, app.size, app.price, app.last_updated).items():
+            setattr(app, field, value)
+        batch.append(app)
+        if len(batch) >= 1000:
+            App.objects.bulk_update(batch, TYPED_FIELDS)
+            batch = []
+    if batch:
+        App.objects.bulk_update(batch, TYPED_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0005_userreview_confidence_score_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='app',
+            name='installs_count',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='app',
+            name='last_updated_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='app',
+            name='price_value',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, max_digits=8, null=True),
+        ),
+        migrations.AddField(
+            model_name='app',
+            name='size_bytes',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_typed_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# (reviews table, text column, full-text table or index); see review_search.REVIEW_SOURCES
+FULLTEXT_SOURCES = [
+    ('app_reviews', 'translated_review', 'app_reviews_fts'),
+    ('user_reviews', 'review_text', 'user_reviews_fts'),
+]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    for table, column, fts in FULLTEXT_SOURCES:
+        if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+            # External-content FTS5 table: it indexes the review column without
+            # storing a second copy, and triggers keep it in step with the
+            # reviews table, including bulk inserts and queryset updates
+            statements = [
+                f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                f"{column}, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+                f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+                f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+                f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+                f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+                f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+            ]
+        elif connection.vendor == 'postgresql':
+            # An expression index is maintained by Postgres itself on every write
+            statements = [
+                f"CREATE INDEX {fts} ON {table} USING GIN (to_tsvector('english', {column}))",
+            ]
+        else:
+            # Other backends fall back to LIKE matching (see review_search.py)
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    for _, _, fts in FULLTEXT_SOURCES:
+        if connection.vendor == 'sqlite':
+            for trigger in ('insert', 'delete', 'update'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{trigger}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+        elif connection.vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {fts}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0006_app_typed_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
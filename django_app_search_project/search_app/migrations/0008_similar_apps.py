@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0007_review_fulltext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarApp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_apps', to='search_app.app')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='search_app.app')),
+            ],
+            options={
+                'db_table': 'similar_apps',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarapp',
+            constraint=models.UniqueConstraint(fields=('app', 'rank'), name='similar_apps_app_rank'),
+        ),
+    ]
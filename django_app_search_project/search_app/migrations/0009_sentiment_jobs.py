@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0008_similar_apps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentimentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_by', models.CharField(blank=True, max_length=64)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sentiment_job', to='search_app.userreview')),
+            ],
+            options={
+                'db_table': 'sentiment_jobs',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='sentiment_jobs_due')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0009_sentiment_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentimentScore',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('analyzer', models.CharField(db_index=True, max_length=50)),
+                ('polarity', models.FloatField()),
+                ('subjectivity', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sentiment_cache',
+            },
+        ),
+    ]
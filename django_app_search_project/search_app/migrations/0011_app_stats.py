@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:44
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+
+def fill_app_stats(apps, schema_editor):
+    """One grouped aggregate query per review table, frozen as of this migration"""
+    AppReview = apps.get_model('search_app', 'AppReview')
+    UserReview = apps.get_model('search_app', 'UserReview')
+    AppStats = apps.get_model('search_app', 'AppStats')
+
+    def labelled(label):
+        return Count('id', filter=Q(sentiment=label))
+
+    rows = {}
+    for row in AppReview.objects.values('app_id').annotate(
+        csv_reviews=Count('id'),
+        csv_positive=labelled('Positive'),
+        csv_neutral=labelled('Neutral'),
+        csv_negative=labelled('Negative'),
+        csv_polarity_sum=Sum('sentiment_polarity'),
+        csv_polarity_count=Count('sentiment_polarity'),
+    ):
+        rows[row.pop('app_id')] = row
+    for row in UserReview.objects.filter(status='approved').values('app_id').annotate(
+        user_reviews=Count('id'),
+        user_positive=labelled('Positive'),
+        user_neutral=labelled('Neutral'),
+        user_negative=labelled('Negative'),
+        user_polarity_sum=Sum('sentiment_polarity'),
+        user_polarity_count=Count('sentiment_polarity'),
+        user_rating_sum=Sum('rating'),
+        user_contradictions=Count('id', filter=Q(has_contradiction=True)),
+    ):
+        rows.setdefault(row.pop('app_id'), {}).update(row)
+
+    stats = []
+    for app_id, values in rows.items():
+        # Sums over no scored reviews are NULL; the columns default to zero
+        stats.append(AppStats(app_id=app_id, **{field: value for field, value in values.items() if value is not None}))
+    AppStats.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0010_sentiment_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppStats',
+            fields=[
+                ('app', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='search_app.app')),
+                ('csv_reviews', models.IntegerField(default=0)),
+                ('csv_positive', models.IntegerField(default=0)),
+                ('csv_neutral', models.IntegerField(default=0)),
+                ('csv_negative', models.IntegerField(default=0)),
+                ('csv_polarity_sum', models.FloatField(default=0.0)),
+                ('csv_polarity_count', models.IntegerField(default=0)),
+                ('user_reviews', models.IntegerField(default=0)),
+                ('user_positive', models.IntegerField(default=0)),
+                ('user_neutral', models.IntegerField(default=0)),
+                ('user_negative', models.IntegerField(default=0)),
+                ('user_polarity_sum', models.FloatField(default=0.0)),
+                ('user_polarity_count', models.IntegerField(default=0)),
+                ('user_rating_sum', models.IntegerField(default=0)),
+                ('user_contradictions', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'app_stats',
+            },
+        ),
+        migrations.RunPython(fill_app_stats, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
-from textblob import TextBlob
+from django.utils import timezone
+
+from .utils import typed_app_fields
 
 class App(models.Model):
     name = models.CharField(max_length=255, db_index=True)
@@ -17,6 +19,13 @@ class App(models.Model):
     last_updated = models.CharField(max_length=50, null=True, blank=True)
     current_version = models.CharField(max_length=50, null=True, blank=True)
     android_version = models.CharField(max_length=50, null=True, blank=True)
+
+    # Typed copies of installs, size, price and last_updated, parsed on save,
+    # so sorting and range filters run in SQL against an index
+    installs_count = models.BigIntegerField(null=True, blank=True, db_index=True)
+    size_bytes = models.BigIntegerField(null=True, blank=True, db_index=True)
+    price_value = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, db_index=True)
+    last_updated_date = models.DateField(null=True, blank=True, db_index=True)
     
     class Meta:
         db_table = 'apps'
@@ -24,6 +33,15 @@ class App(models.Model):
     def __str__(self):
         return self.name
 
+    def parse_typed_fields(self):
+        """Set the typed columns from the Play Store strings"""
+        for field, value in typed_app_fields(self.installs, self.size, self.price, self.last_updated).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        self.parse_typed_fields()
+        super().save(*args, **kwargs)
+
 class AppReview(models.Model):
     app = models.ForeignKey(App, on_delete=models.CASCADE, related_name='app_reviews')
     translated_review = models.TextField()
@@ -43,6 +61,14 @@ class UserReview(models.Model):
         ('approved', 'Approved'),
         ('rejected', 'Rejected'),
     ]
+
+    # Columns written by analyze_combined_sentiment()
+    SENTIMENT_FIELDS = [
+        'sentiment', 'sentiment_polarity', 'sentiment_subjectivity', 'confidence_score',
+        'has_contradiction', 'text_sentiment_polarity', 'rating_sentiment_polarity',
+    ]
+    # Fields a supervisor's approve/reject writes
+    MODERATION_FIELDS = ['status', 'approved_by', 'approved_at']
     
     app = models.ForeignKey(App, on_delete=models.CASCADE, related_name='user_reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -84,55 +110,21 @@ class UserReview(models.Model):
         designated_supervisor = self.get_designated_supervisor()
         return designated_supervisor == supervisor_user
     
-    def analyze_combined_sentiment(self):
-        """Enhanced sentiment analysis using both text and rating"""
-        if self.review_text and self.rating:
-            # Step 1: Analyze text sentiment
-            blob = TextBlob(self.review_text)
-            text_polarity = blob.sentiment.polarity  # -1 to +1
-            text_subjectivity = blob.sentiment.subjectivity
-            
-            # Step 2: Convert rating to sentiment scale
-            # Rating 1-5 → Polarity -1 to +1
-            rating_polarity = (self.rating - 3) / 2  # 1→-1, 3→0, 5→+1
-            
-            # Step 3: Calculate weighted combination
-            # Give more weight to rating if text is very short or neutral
-            text_weight = min(len(self.review_text.split()) / 10, 0.7)  # Max 70% weight to text
-            rating_weight = 1 - text_weight
-            
-            combined_polarity = (text_polarity * text_weight) + (rating_polarity * rating_weight)
-            
-            # Step 4: Detect contradictions
-            contradiction_threshold = 0.8
-            if abs(text_polarity - rating_polarity) > contradiction_threshold:
-                self.has_contradiction = True
-                # Lower confidence for contradictory reviews
-                confidence_penalty = 0.3
-            else:
-                self.has_contradiction = False
-                confidence_penalty = 0
-            
-            # Step 5: Classify final sentiment
-            if combined_polarity > 0.1:
-                sentiment = 'Positive'
-            elif combined_polarity < -0.1:
-                sentiment = 'Negative'
-            else:
-                sentiment = 'Neutral'
-            
-            # Step 6: Calculate confidence
-            base_confidence = abs(combined_polarity)
-            final_confidence = max(0, base_confidence - confidence_penalty)
-            
-            # Update fields
-            self.sentiment = sentiment
-            self.sentiment_polarity = combined_polarity
-            self.sentiment_subjectivity = text_subjectivity
-            self.confidence_score = final_confidence
-            self.text_sentiment_polarity = text_polarity
-            self.rating_sentiment_polarity = rating_polarity
-            self.save()
+    @property
+    def analysis_pending(self):
+        """Sentiment analysis is queued (see sentiment_queue.py) and has not run yet"""
+        return self.sentiment is None
+
+    def analyze_combined_sentiment(self, save=True, text_scores=None):
+        """Enhanced sentiment analysis using both text and rating (see sentiment.py)"""
+        from .sentiment import combined_sentiment
+
+        scores = combined_sentiment(self.review_text, self.rating, text_scores)
+        if scores is not None:
+            for field, value in scores.items():
+                setattr(self, field, value)
+            if save:
+                self.save()
     
     def get_sentiment_confidence(self):
         """Enhanced confidence calculation"""
@@ -149,6 +141,132 @@ class UserReview(models.Model):
         """Detect if text sentiment and rating don't match"""
         return self.has_contradiction
 
+class SentimentJob(models.Model):
+    """A user review waiting for sentiment analysis, see sentiment_queue.py"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+
+    review = models.OneToOneField(UserReview, on_delete=models.CASCADE, related_name='sentiment_job')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Not picked up before this time; pushed back after each failed attempt
+    available_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sentiment_jobs'
+        indexes = [models.Index(fields=['status', 'available_at'], name='sentiment_jobs_due')]
+
+    def __str__(self):
+        return f"Review {self.review_id} - {self.status}"
+
+class SentimentScore(models.Model):
+    """Cached text sentiment of one normalized review text, see sentiment_cache.py"""
+    key = models.CharField(max_length=64, primary_key=True)
+    analyzer = models.CharField(max_length=50, db_index=True)
+    polarity = models.FloatField()
+    subjectivity = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sentiment_cache'
+
+    def __str__(self):
+        return f"{self.key[:12]} ({self.analyzer}): {self.polarity:.2f}"
+
+class SimilarApp(models.Model):
+    """One precomputed neighbour of an app, filled by "manage.py build_similar_apps" (see similar.py)"""
+    app = models.ForeignKey(App, on_delete=models.CASCADE, related_name='similar_apps')
+    similar = models.ForeignKey(App, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        db_table = 'similar_apps'
+        constraints = [
+            # Also the index the detail page reads an app's neighbours through
+            models.UniqueConstraint(fields=['app', 'rank'], name='similar_apps_app_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.app_id} -> {self.similar_id} ({self.rank})"
+
+class AppStats(models.Model):
+    """
+    Review counts and sentiment totals of one app, kept up to date by
+    app_stats.py as reviews are loaded, approved, rejected and deleted
+
+    Sums and counts are stored instead of means so a review can be added or
+    removed with one UPDATE of F() expressions.
+    """
+    app = models.OneToOneField(App, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+
+    # Dataset reviews (AppReview)
+    csv_reviews = models.IntegerField(default=0)
+    csv_positive = models.IntegerField(default=0)
+    csv_neutral = models.IntegerField(default=0)
+    csv_negative = models.IntegerField(default=0)
+    csv_polarity_sum = models.FloatField(default=0.0)
+    csv_polarity_count = models.IntegerField(default=0)
+
+    # Approved community reviews (UserReview)
+    user_reviews = models.IntegerField(default=0)
+    user_positive = models.IntegerField(default=0)
+    user_neutral = models.IntegerField(default=0)
+    user_negative = models.IntegerField(default=0)
+    user_polarity_sum = models.FloatField(default=0.0)
+    user_polarity_count = models.IntegerField(default=0)
+    user_rating_sum = models.IntegerField(default=0)
+    user_contradictions = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'app_stats'
+
+    def __str__(self):
+        return f"{self.app_id}: {self.reviews} reviews"
+
+    @property
+    def reviews(self):
+        return self.csv_reviews + self.user_reviews
+
+    @property
+    def positive(self):
+        return self.csv_positive + self.user_positive
+
+    @property
+    def neutral(self):
+        return self.csv_neutral + self.user_neutral
+
+    @property
+    def negative(self):
+        return self.csv_negative + self.user_negative
+
+    @property
+    def positive_percent(self):
+        """Share of all reviews labelled Positive, in percent"""
+        labelled = self.positive + self.neutral + self.negative
+        return round(100 * self.positive / labelled) if labelled else None
+
+    @property
+    def mean_polarity(self):
+        """Mean sentiment polarity over every scored review, or None"""
+        count = self.csv_polarity_count + self.user_polarity_count
+        return (self.csv_polarity_sum + self.user_polarity_sum) / count if count else None
+
+    @property
+    def user_mean_polarity(self):
+        return self.user_polarity_sum / self.user_polarity_count if self.user_polarity_count else None
+
+    @property
+    def mean_user_rating(self):
+        return self.user_rating_sum / self.user_reviews if self.user_reviews else None
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     is_supervisor = models.BooleanField(default=False)
@@ -0,0 +1,92 @@
+"""
+Popularity prior for hybrid ranking
+
+Every app gets one number in [0, 1] saying how popular and well liked it
+is, independent of any query: a weighted mix (SEARCH_PRIOR_WEIGHTS) of its
+rating, log-scaled review and install counts, and the mean sentiment of its
+approved user reviews. The priors are kept as a dense float32 array aligned
+with the search index positions, computed when the index is built and
+refreshed offline with "manage.py refresh_popularity_prior", so ranking
+only gathers prior[positions] for the candidates of a query.
+"""
+import numpy as np
+
+from .utils import parse_installs
+
+# Signals mixed into the prior, the keys of SEARCH_PRIOR_WEIGHTS
+PRIOR_SIGNALS = ('rating', 'reviews', 'installs', 'sentiment')
+
+
+def log_scale(counts):
+    """log(1 + count) scaled so the largest count maps to 1"""
+    logs = np.log1p(np.maximum(counts, 0))
+    peak = logs.max() if len(logs) else 0.0
+    return logs / peak if peak > 0 else np.zeros_like(logs)
+
+
+def approved_sentiment():
+    """
+    Mean sentiment polarity of each app's approved user reviews, read from
+    the app_stats totals rather than the reviews themselves
+
+    Returns:
+        dict: App id -> mean polarity in [-1, 1], for apps with approved reviews
+    """
+    from .models import AppStats
+
+    rows = AppStats.objects.filter(user_polarity_count__gt=0).values_list(
+        'app_id', 'user_polarity_sum', 'user_polarity_count'
+    )
+    return {app_id: total / count for app_id, total, count in rows}
+
+
+def popularity_prior(rows, sentiment, weights):
+    """
+    Prior of each app from its catalog fields and review sentiment
+
+    Args:
+        rows (list): Dicts with id, rating, reviews_count and installs, in
+            index order
+        sentiment (dict): App id -> mean approved-review polarity; apps
+            without one count as neutral
+        weights (dict): Weight of each PRIOR_SIGNALS entry
+
+    Returns:
+        numpy.ndarray: float32 prior in [0, 1] per row
+    """
+    ratings = np.array([row['rating'] or 0.0 for row in rows], dtype=np.float64)
+    reviews = np.array([row['reviews_count'] or 0 for row in rows], dtype=np.float64)
+    installs = np.array([parse_installs(row['installs']) or 0 for row in rows], dtype=np.float64)
+    polarity = np.array([sentiment.get(row['id'], 0.0) for row in rows], dtype=np.float64)
+
+    signals = {
+        'rating': np.clip(ratings, 0, 5) / 5,
+        'reviews': log_scale(reviews),
+        'installs': log_scale(installs),
+        'sentiment': (np.clip(polarity, -1, 1) + 1) / 2,
+    }
+    total = sum(max(weights.get(name, 0.0), 0.0) for name in PRIOR_SIGNALS)
+    prior = np.zeros(len(rows))
+    if total > 0:
+        for name in PRIOR_SIGNALS:
+            prior += max(weights.get(name, 0.0), 0.0) / total * signals[name]
+    return prior.astype(np.float32)
+
+
+def hybrid_scores(scores, prior, relevance_scale, prior_weight):
+    """
+    Text relevance blended with the popularity prior, for a batch of candidates
+
+    Args:
+        scores (numpy.ndarray): Raw relevance of each candidate
+        prior (numpy.ndarray): Prior of the same candidates
+        relevance_scale (float): Factor that maps raw relevance into [0, 1],
+            times the text weight; an array gives one factor per candidate
+        prior_weight (float): Weight of the prior
+
+    Returns:
+        numpy.ndarray: relevance_scale * scores + prior_weight * prior
+    """
+    if not prior_weight:
+        return scores * relevance_scale
+    return scores * relevance_scale + prior_weight * prior.astype(np.float64)
@@ -0,0 +1,207 @@
+"""
+Full-text search over review text
+
+AppReview.translated_review and UserReview.review_text are indexed by
+migration 0007: on SQLite an FTS5 external-content table per reviews table,
+kept in step by insert/update/delete triggers; on Postgres a GIN index over
+to_tsvector('english', ...). Matching, ranking (bm25() or ts_rank) and the
+app and sentiment filters all run in the database, and only the requested
+slice of reviews is loaded. Other backends fall back to an unranked LIKE
+match on every query word.
+
+SQLite alters a table by rebuilding it, which drops its triggers: a later
+migration that alters app_reviews or user_reviews must recreate them.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import AppReview, UserReview
+from .utils import TOKEN_PATTERN
+
+# Searchable review text: source name -> model, table, text column and the
+# FTS5 table (SQLite) or GIN index (Postgres) created by migration 0007
+REVIEW_SOURCES = {
+    'csv': {'model': AppReview, 'table': 'app_reviews', 'column': 'translated_review', 'fts_table': 'app_reviews_fts'},
+    'user': {'model': UserReview, 'table': 'user_reviews', 'column': 'review_text', 'fts_table': 'user_reviews_fts'},
+}
+
+_fts_tables = set()
+
+
+def fulltext_backend(source):
+    """
+    How review text of a source is searched on the current database
+
+    Returns:
+        str: 'fts5', 'postgresql', or None for the LIKE fallback
+    """
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor != 'sqlite':
+        return None
+    fts_table = REVIEW_SOURCES[source]['fts_table']
+    if fts_table not in _fts_tables:
+        if fts_table not in connection.introspection.table_names():
+            return None
+        _fts_tables.add(fts_table)
+    return 'fts5'
+
+
+def query_terms(query):
+    """Lowercased words of a review query"""
+    return TOKEN_PATTERN.findall(query.lower())
+
+
+def fts5_expression(query):
+    """
+    FTS5 MATCH expression requiring every word of the query
+
+    Words are quoted, so operators and punctuation typed by a user can
+    never make the expression invalid.
+    """
+    return ' '.join(f'"{term}"' for term in query_terms(query))
+
+
+def match_condition(source, query):
+    """
+    Q object matching reviews of a source whose text contains every query word
+
+    Used by the admin search box; the match is a subquery on the full-text
+    index, so it composes with the admin's own filters and pagination.
+    """
+    spec = REVIEW_SOURCES[source]
+    if not query_terms(query):
+        return Q(pk__in=[])
+    backend = fulltext_backend(source)
+    if backend == 'fts5':
+        return Q(id__in=RawSQL(
+            f"SELECT rowid FROM {spec['fts_table']} WHERE {spec['fts_table']} MATCH %s", [fts5_expression(query)]
+        ))
+    if backend == 'postgresql':
+        return Q(id__in=RawSQL(
+            f"SELECT id FROM {spec['table']} "
+            f"WHERE to_tsvector('english', {spec['column']}) @@ websearch_to_tsquery('english', %s)",
+            [query]
+        ))
+    condition = Q()
+    for term in query_terms(query):
+        condition &= Q(**{f"{spec['column']}__icontains": term})
+    return condition
+
+
+class ReviewResults:
+    """
+    Reviews matching a full-text query, best match first, loaded per slice
+
+    Sliceable and countable, so it can be handed to Paginator directly;
+    each matched review carries its relevance as search_rank (higher is
+    better, None on the LIKE fallback).
+    """
+
+    def __init__(self, query, source='csv', app_id=None, sentiment=None, status=None):
+        self.query = query
+        self.source = source
+        self.spec = REVIEW_SOURCES[source]
+        self.app_id = app_id
+        self.sentiment = sentiment
+        self.status = status
+        self.backend = fulltext_backend(source)
+        self._count = None
+
+    def _filters(self):
+        """SQL conditions on the reviews table (alias r) with their parameters"""
+        clauses, params = [], []
+        if self.app_id is not None:
+            clauses.append('r.app_id = %s')
+            params.append(self.app_id)
+        if self.sentiment:
+            clauses.append('LOWER(r.sentiment) = LOWER(%s)')
+            params.append(self.sentiment)
+        if self.status:
+            clauses.append('r.status = %s')
+            params.append(self.status)
+        return ''.join(f' AND {clause}' for clause in clauses), params
+
+    def _queryset(self):
+        """The LIKE fallback as a queryset"""
+        queryset = self.spec['model'].objects.filter(match_condition(self.source, self.query))
+        if self.app_id is not None:
+            queryset = queryset.filter(app_id=self.app_id)
+        if self.sentiment:
+            queryset = queryset.filter(sentiment__iexact=self.sentiment)
+        if self.status:
+            queryset = queryset.filter(status=self.status)
+        return queryset
+
+    def _select(self, columns):
+        """FROM/WHERE of the full-text query, returning columns"""
+        table, column, fts_table = self.spec['table'], self.spec['column'], self.spec['fts_table']
+        filters, params = self._filters()
+        if self.backend == 'fts5':
+            # CROSS JOIN keeps the full-text match as the outer loop; otherwise
+            # SQLite may walk an app's reviews and re-run the MATCH for each
+            return (
+                f'SELECT {columns} FROM {fts_table} CROSS JOIN {table} r ON r.id = {fts_table}.rowid '
+                f'WHERE {fts_table} MATCH %s{filters}',
+                [fts5_expression(self.query)] + params,
+            )
+        return (
+            f"SELECT {columns} FROM {table} r, websearch_to_tsquery('english', %s) query "
+            f"WHERE to_tsvector('english', r.{column}) @@ query{filters}",
+            [self.query] + params,
+        )
+
+    def count(self):
+        if self._count is None:
+            if not query_terms(self.query):
+                self._count = 0
+            elif self.backend is None:
+                self._count = self._queryset().count()
+            else:
+                sql, params = self._select('COUNT(*)')
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def ranked(self, start, stop):
+        """
+        (review id, rank) pairs ranked start..stop
+
+        bm25() is negated so that, like ts_rank, a higher rank is better.
+        """
+        if stop <= start or not query_terms(self.query):
+            return []
+        if self.backend is None:
+            ids = self._queryset().order_by('-id').values_list('id', flat=True)[start:stop]
+            return [(review_id, None) for review_id in ids]
+        if self.backend == 'fts5':
+            rank = f"-bm25({self.spec['fts_table']})"
+        else:
+            rank = f"ts_rank(to_tsvector('english', r.{self.spec['column']}), query)"
+        sql, params = self._select(f'r.id, {rank} AS search_rank')
+        with connection.cursor() as cursor:
+            cursor.execute(f'{sql} ORDER BY search_rank DESC, r.id LIMIT %s OFFSET %s', params + [stop - start, start])
+            return cursor.fetchall()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('ReviewResults only supports slicing')
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError('ReviewResults does not support slice steps')
+
+        ranked = self.ranked(start, stop)
+        related = ['app', 'user'] if self.spec['model'] is UserReview else ['app']
+        reviews = self.spec['model'].objects.select_related(*related).in_bulk([review_id for review_id, _ in ranked])
+        results = []
+        for review_id, rank in ranked:
+            review = reviews.get(review_id)
+            if review is not None:
+                review.search_rank = rank
+                results.append(review)
+        return results
@@ -0,0 +1,131 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .search_index import materialize_apps
+
+GENERATION_KEY = 'search:generation'
+HITS_KEY = 'search:hits'
+MISSES_KEY = 'search:misses'
+
+
+def get_search_cache():
+    """The cache that holds ranked search pages (see CACHES['search'])"""
+    return caches[getattr(settings, 'SEARCH_CACHE_ALIAS', 'search')]
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query used in cache keys"""
+    return ' '.join(query.lower().split())
+
+
+def _generation(cache):
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # A fresh timestamp, never an old value, so a culled generation
+        # key cannot bring previously cached pages back to life
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _page_key(cache, query, page_number, options):
+    # Options such as the search mode change the ranking, so they are part of the key
+    key_source = normalize_query(query)
+    if options:
+        key_source += '|' + '&'.join(f'{name}={options[name]}' for name in sorted(options))
+    digest = hashlib.sha1(key_source.encode('utf-8')).hexdigest()
+    return f'search:{_generation(cache)}:{digest}:{page_number or 1}'
+
+
+def _count(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing (first use or culled)
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_cached_page(query, page_number, options=None):
+    """
+    Ranked ids cached for a query, page and ranking options, or None on a miss
+
+    Returns:
+        CachedResults: Results that Paginator can slice like RankedResults
+    """
+    cache = get_search_cache()
+    entry = cache.get(_page_key(cache, query, page_number, options))
+    _count(cache, MISSES_KEY if entry is None else HITS_KEY)
+    if entry is None:
+        return None
+    return CachedResults(*entry)
+
+
+def cache_page(query, page_number, page_obj, did_you_mean=None, options=None, facet_counts=None):
+    """Store the ranked app ids shown on a results page, with its facet counts"""
+    cache = get_search_cache()
+    entry = (
+        page_obj.paginator.count,
+        page_obj.start_index() - 1 if page_obj.object_list else 0,
+        [app.id for app in page_obj.object_list],
+        did_you_mean,
+        facet_counts,
+    )
+    cache.set(_page_key(cache, query, page_number, options), entry)
+
+
+def invalidate_search_cache():
+    """Drop every cached page by moving to a new key generation"""
+    get_search_cache().set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def search_cache_stats():
+    """Hit/miss counters shared by every process using the cache"""
+    cache = get_search_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / lookups if lookups else 0.0,
+        'generation': _generation(cache),
+    }
+
+
+class CachedResults:
+    """
+    One cached page of ranked ids, sliceable by Paginator
+
+    Only the slice that was cached (start .. start + len(page_ids)) can be
+    read back, which is exactly what Paginator asks for on the same page.
+    """
+
+    def __init__(self, total, start, app_ids, did_you_mean=None, facet_counts=None):
+        self.total = total
+        self.start = start
+        self.page_ids = app_ids
+        self.did_you_mean = did_you_mean
+        self._facet_counts = facet_counts or {}
+
+    def count(self):
+        return self.total
+
+    def facet_counts(self):
+        return self._facet_counts
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('CachedResults only supports slicing')
+        start, stop, _ = key.indices(self.total)
+        return materialize_apps(self.app_ids(start, stop))
+
+    def app_ids(self, start, stop):
+        """Cached app ids ranked start..stop"""
+        return self.page_ids[max(start - self.start, 0):max(stop - self.start, 0)]
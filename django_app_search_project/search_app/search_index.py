@@ -0,0 +1,852 @@
+import bisect
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from scipy import sparse
+
+from .facets import FacetIndex
+from .popularity import approved_sentiment, hybrid_scores, popularity_prior
+from .suggest import CandidateCache, FuzzyIndex, PrefixIndex
+from .utils import TextSimilarityEngine, parse_installs, tokenize
+
+logger = logging.getLogger(__name__)
+
+# App fields read when the index is built
+INDEXED_FIELDS = (
+    'id', 'name', 'category', 'genres', 'rating', 'reviews_count', 'installs',
+    'type', 'content_rating', 'price',
+)
+
+# Terms a partial query word may expand to when it is not itself in the vocabulary
+MAX_PREFIX_EXPANSIONS = 20
+
+# Orderings on App's indexed typed columns, applied in SQL (see SearchIndex.sql_order)
+SORT_ORDERS = {
+    'installs': (F('installs_count').desc(nulls_last=True), 'id'),
+    'updated': (F('last_updated_date').desc(nulls_last=True), 'id'),
+    'size': (F('size_bytes').asc(nulls_last=True), 'id'),
+    'price': (F('price_value').asc(nulls_last=True), 'id'),
+}
+
+
+def app_document(name, category, genres):
+    """Text that represents an app in the search index"""
+    return f"{name} {category} {genres or ''}"
+
+
+class BM25Index:
+    """
+    Inverted index with precomputed Okapi BM25 weights
+
+    Postings are stored as a terms x documents CSR matrix: row t holds the
+    positions of the documents containing term t (the posting list) and the
+    BM25 weight of t in each of them. Weights do not depend on the query, so
+    scoring only touches the posting lists of the query terms.
+    """
+
+    def __init__(self, terms, term_weights):
+        self.terms = terms  # sorted, so prefixes can be found with bisect
+        self.vocabulary = {term: row for row, term in enumerate(terms)}
+        self.term_weights = term_weights
+        # Largest weight of each term: a query cannot score more than the sum
+        # over its terms, which scales its scores into [0, 1]
+        self.max_weights = np.zeros(term_weights.shape[0], dtype=np.float64)
+        if term_weights.shape[0] and term_weights.shape[1]:
+            self.max_weights = term_weights.max(axis=1).toarray().ravel().astype(np.float64)
+
+    @classmethod
+    def build(cls, documents, k1=1.2, b=0.75):
+        """
+        Build postings and BM25 weights for a list of document strings
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        counter = CountVectorizer(tokenizer=tokenize, lowercase=False, token_pattern=None)
+        try:
+            term_counts = counter.fit_transform(documents).tocoo()
+        except ValueError:
+            # No indexable terms at all
+            return cls([], sparse.csr_matrix((0, len(documents)), dtype=np.float32))
+
+        n_docs, n_terms = term_counts.shape
+        doc_lengths = np.bincount(term_counts.row, weights=term_counts.data, minlength=n_docs)
+        avg_length = doc_lengths.mean() or 1.0
+        doc_freq = np.bincount(term_counts.col, minlength=n_terms)
+        idf = np.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        tf = term_counts.data.astype(np.float64)
+        norm = k1 * (1 - b + b * doc_lengths[term_counts.row] / avg_length)
+        weights = idf[term_counts.col] * tf * (k1 + 1) / (tf + norm)
+
+        term_weights = sparse.csr_matrix(
+            (weights.astype(np.float32), (term_counts.col, term_counts.row)),
+            shape=(n_terms, n_docs)
+        )
+        term_weights.sort_indices()
+        # CountVectorizer numbers its vocabulary alphabetically
+        return cls(list(counter.get_feature_names_out()), term_weights)
+
+    def query_rows(self, query):
+        """
+        Posting-list rows for the terms of a query
+
+        A word that is not in the vocabulary is treated as a prefix
+        ("whats" -> "whatsapp"), limited to MAX_PREFIX_EXPANSIONS terms.
+        """
+        rows = []
+        for token in dict.fromkeys(tokenize(query)):
+            row = self.vocabulary.get(token)
+            if row is not None:
+                rows.append(row)
+                continue
+            start = bisect.bisect_left(self.terms, token)
+            stop = start
+            while (stop < len(self.terms) and stop - start < MAX_PREFIX_EXPANSIONS
+                   and self.terms[stop].startswith(token)):
+                stop += 1
+            rows.extend(range(start, stop))
+        return rows
+
+    def match(self, query):
+        """
+        Documents containing any query term, with their BM25 scores
+
+        Returns:
+            tuple: (positions, scores) numpy arrays; positions are sorted
+        """
+        return self.match_rows(self.query_rows(query))
+
+    def match_rows(self, rows):
+        """Documents and BM25 scores for already resolved posting-list rows"""
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        indptr = self.term_weights.indptr
+        postings = [slice(indptr[row], indptr[row + 1]) for row in rows]
+        docs = np.concatenate([self.term_weights.indices[p] for p in postings])
+        weights = np.concatenate([self.term_weights.data[p] for p in postings])
+
+        positions, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights, minlength=len(positions))
+        return positions.astype(np.int64), scores
+
+    def score_ceiling(self, rows):
+        """Highest score any document can get for these posting-list rows"""
+        return float(self.max_weights[rows].sum()) if rows else 0.0
+
+
+def filter_matches(positions, scores, mask):
+    """Matches whose position passes a facet mask (None keeps everything)"""
+    if mask is None:
+        return positions, scores
+    keep = mask[positions]
+    return positions[keep], scores[keep]
+
+
+class SearchIndex:
+    """
+    TF-IDF and BM25 indexes built once over every App in the catalog
+
+    The vectorizer, document matrix and posting lists are built a single
+    time and kept in process memory, so a query costs a lookup of its terms
+    instead of a table scan and a refit on every request.
+    """
+
+    def __init__(self, app_ids, engine, bm25, ratings, prefix, fuzzy, facets, semantic=None, prior=None):
+        self.app_ids = app_ids
+        self.engine = engine
+        self.bm25 = bm25
+        self.ratings = ratings
+        self.prefix = prefix
+        self.fuzzy = fuzzy
+        self.facets = facets
+        # Popularity prior per position (see popularity.py); zeros until computed
+        self.prior = np.zeros(len(app_ids), dtype=np.float32) if prior is None else prior
+        self._semantic = semantic
+        self._semantic_lock = threading.Lock()
+        self.positions = {app_id: pos for pos, app_id in enumerate(app_ids.tolist())}
+        self.built_at = time.time()
+        # Snapshot identity, kept when the index is written to and loaded from a file
+        self.version = time.time_ns()
+        self.build_seconds = None
+        self.loaded_from = None
+        # Autocomplete candidates of recent prefixes; dropped with the index
+        self.suggestion_cache = None
+        if settings.SEARCH_SUGGEST_CACHE_CANDIDATES > 0:
+            self.suggestion_cache = CandidateCache(
+                settings.SEARCH_SUGGEST_CACHE_CANDIDATES, settings.SEARCH_SUGGEST_CACHE_ENTRIES
+            )
+
+    @classmethod
+    def build(cls, rows=None):
+        """
+        Build the index from App rows
+
+        Args:
+            rows (iterable): Optional dicts with the fields of INDEXED_FIELDS;
+                defaults to every App in the database
+
+        Returns:
+            SearchIndex: The fitted index
+        """
+        started = time.perf_counter()
+        if rows is None:
+            from .models import App
+            rows = App.objects.order_by('id').values(*INDEXED_FIELDS)
+        rows = list(rows)
+
+        app_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        documents = [app_document(row['name'], row['category'], row['genres']) for row in rows]
+        ratings = np.array([row['rating'] or 0.0 for row in rows], dtype=np.float64)
+        popularity = [
+            (row['reviews_count'] or 0, parse_installs(row['installs']) or 0, row['rating'] or 0.0)
+            for row in rows
+        ]
+
+        engine = TextSimilarityEngine(max_features=None)
+        if documents:
+            try:
+                engine.fit(documents)
+            except ValueError:
+                # Every document was made of stop words; nothing to index
+                engine.document_matrix = None
+        bm25 = BM25Index.build(documents)
+        index = cls(
+            app_ids,
+            engine,
+            bm25,
+            ratings,
+            PrefixIndex.build([row['name'] for row in rows], popularity),
+            FuzzyIndex.build(bm25.terms, np.diff(bm25.term_weights.indptr).tolist()),
+            FacetIndex.build(rows),
+            prior=popularity_prior(rows, approved_sentiment(), settings.SEARCH_PRIOR_WEIGHTS),
+        )
+        index.build_seconds = time.perf_counter() - started
+        return index
+
+    def __len__(self):
+        return len(self.app_ids)
+
+    @property
+    def semantic(self):
+        """LSA embeddings of the catalog, fitted on first use"""
+        if self._semantic is None:
+            with self._semantic_lock:
+                if self._semantic is None:
+                    from .semantic import SemanticIndex
+                    self._semantic = SemanticIndex.build(
+                        self.engine.document_matrix,
+                        n_components=settings.SEARCH_SEMANTIC_COMPONENTS,
+                        exact_max_apps=settings.SEARCH_SEMANTIC_EXACT_MAX_APPS,
+                        probes=settings.SEARCH_SEMANTIC_PROBES,
+                    )
+        return self._semantic
+
+    def refresh_prior(self):
+        """
+        Recompute the popularity prior from the database, keeping the index
+
+        Ratings, review and install counts and approved-review sentiment
+        change without the catalog text changing, so the prior can be
+        refreshed offline without refitting anything.
+
+        Returns:
+            numpy.ndarray: The new prior, which replaces self.prior
+        """
+        from .models import App
+
+        by_id = {
+            row['id']: row
+            for row in App.objects.values('id', 'rating', 'reviews_count', 'installs').iterator()
+        }
+        missing = {'rating': None, 'reviews_count': 0, 'installs': None}
+        rows = [by_id.get(app_id, dict(missing, id=app_id)) for app_id in self.app_ids.tolist()]
+        self.prior = popularity_prior(rows, approved_sentiment(), settings.SEARCH_PRIOR_WEIGHTS)
+        return self.prior
+
+    def blend(self, ceiling):
+        """
+        Weights of the hybrid score for a query whose relevance is at most ceiling
+
+        Returns:
+            tuple: (relevance_scale, prior_weight) for popularity.hybrid_scores
+        """
+        prior_weight = settings.SEARCH_POPULARITY_WEIGHT
+        relevance_scale = (1 - prior_weight) / ceiling if ceiling > 0 else 0.0
+        return relevance_scale, prior_weight
+
+    def did_you_mean(self, query):
+        """Spelling correction for a query with unknown words, or None"""
+        return self.fuzzy.correct(query)
+
+    def suggest(self, query, limit=10):
+        """Autocomplete names for a partial query, tolerating typos"""
+        return self.prefix.suggest(query, limit=limit, fuzzy=self.fuzzy, cache=self.suggestion_cache)
+
+    def _sharded_searcher(self):
+        """The process-pool searcher over this index, or None with SEARCH_SHARDS <= 1"""
+        from .sharding import get_sharded_searcher
+        return get_sharded_searcher(self)
+
+    def search(self, query, limit=20, filters=None):
+        """
+        Top apps for a query by hybrid score
+
+        Only apps sharing a term with the query are scored: their BM25
+        score, scaled into [0, 1] by the query's score ceiling, is blended
+        with the popularity prior (SEARCH_POPULARITY_WEIGHT). A bounded heap
+        keeps the best `limit` of them. Ties go to the higher rating.
+
+        Args:
+            query (str): Search query
+            limit (int): Number of results
+            filters (dict): Optional facet field -> selected values
+
+        Returns:
+            list: (app_id, score) pairs, best first
+        """
+        rows = self.bm25.query_rows(query)
+        selection = self.facets.selection(filters)
+        blend = self.blend(self.bm25.score_ceiling(rows))
+        sharded = self._sharded_searcher()
+        if sharded is not None:
+            _, best, _ = sharded.top_k(rows, limit, selection, blend)
+        else:
+            positions, scores = filter_matches(*self.bm25.match_rows(rows), self.facets.mask(selection))
+            scores = hybrid_scores(scores, self.prior[positions], *blend)
+            best = heap_top_k(positions, scores, self.ratings[positions], limit)
+        return [(int(self.app_ids[pos]), score) for score, _, pos in best]
+
+    def batch_search(self, queries, limit=20, filters=None):
+        """
+        Top apps for many queries with one sparse matrix product
+
+        The queries become the rows of a queries x terms matrix with a 1 for
+        each of their terms; multiplying it by the terms x apps BM25 weights
+        scores every query against its posting lists at once. The ranking
+        and tie-breaks are those of search(), but batches are always scored
+        in this process, not on shards.
+
+        Args:
+            queries (list): Query strings
+            limit (int): Results per query
+            filters (dict): Optional facet filters applied to every query
+
+        Returns:
+            list: One list of (app_id, score) pairs per query, best first
+        """
+        rows = [self.bm25.query_rows(query) for query in queries]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(query_rows) for query_rows in rows], out=indptr[1:])
+        query_matrix = sparse.csr_matrix(
+            (
+                np.ones(int(indptr[-1])),
+                np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=int(indptr[-1])),
+                indptr,
+            ),
+            shape=(len(queries), self.bm25.term_weights.shape[0]),
+        )
+        scores = (query_matrix @ self.bm25.term_weights).tocsr()
+        scores.sort_indices()
+        # Blend every query's scores with the prior in one pass over the matrix
+        scales = np.array([self.blend(self.bm25.score_ceiling(query_rows))[0] for query_rows in rows])
+        blended = hybrid_scores(
+            scores.data, self.prior[scores.indices], np.repeat(scales, np.diff(scores.indptr)),
+            settings.SEARCH_POPULARITY_WEIGHT
+        )
+
+        mask = self.facets.mask(self.facets.selection(filters))
+        ranked = []
+        for row in range(len(queries)):
+            span = slice(scores.indptr[row], scores.indptr[row + 1])
+            positions, row_scores = filter_matches(scores.indices[span].astype(np.int64), blended[span], mask)
+            best = heap_top_k(positions, row_scores, self.ratings[positions], limit)
+            ranked.append([(int(self.app_ids[pos]), score) for score, _, pos in best])
+        return ranked
+
+    def rank(self, query, filters=None):
+        """
+        All BM25 matches for a query as lazily materialised results
+
+        Facet filters are applied to the matches before anything is ranked.
+
+        Returns:
+            RankedResults: Sliceable results suitable for Paginator
+        """
+        rows = self.bm25.query_rows(query)
+        selection = self.facets.selection(filters)
+        blend = self.blend(self.bm25.score_ceiling(rows))
+        sharded = self._sharded_searcher()
+        if sharded is not None:
+            return ShardedResults(self, sharded, rows, selection, blend)
+        matches, match_scores = self.bm25.match_rows(rows)
+        positions, scores = filter_matches(matches, match_scores, self.facets.mask(selection))
+        return RankedResults(
+            self, positions, hybrid_scores(scores, self.prior[positions], *blend), selection, matches
+        )
+
+    def semantic_rank(self, query, filters=None):
+        """
+        Apps closest to the query in LSA embedding space
+
+        Cosine similarities (at most 1) are blended with the popularity
+        prior like BM25 scores are.
+
+        Returns:
+            RankedResults: At most SEARCH_SEMANTIC_MAX_RESULTS matches
+        """
+        if self.engine.document_matrix is None:
+            return RankedResults(self, np.empty(0, dtype=np.int64), np.empty(0))
+        from .semantic import top_k
+
+        limit = settings.SEARCH_SEMANTIC_MAX_RESULTS
+        matches, similarities = self.semantic.neighbours(self.engine.vectorizer.transform([query]))
+        selection = self.facets.selection(filters)
+        positions, scores = filter_matches(matches, similarities, self.facets.mask(selection))
+        best = top_k(scores, limit)
+        positions, scores = positions[best], scores[best]
+        return RankedResults(
+            self, positions, hybrid_scores(scores, self.prior[positions], *self.blend(1.0)),
+            selection, matches, similarities, limit
+        )
+
+    def sql_order(self, results=None, order_by=(), conditions=None, filters=None):
+        """
+        Sort and range-filter apps on their typed columns in the database
+
+        The WHERE and ORDER BY run in SQL against the indexed installs_count,
+        size_bytes, price_value and last_updated_date columns, and only the
+        ordered ids come back.
+
+        Args:
+            results (RankedResults): Matches of a query to restrict to, keeping
+                their relevance order when order_by is empty; None browses
+                the whole catalog
+            order_by (tuple): order_by() expressions, e.g. SORT_ORDERS['installs']
+            conditions (dict): Field lookups such as {'installs_count__gte': 1000000}
+            filters (dict): Facet filters, when browsing without results
+
+        Returns:
+            OrderedResults: Sliceable results suitable for Paginator
+        """
+        from .models import App
+
+        queryset = App.objects.filter(**(conditions or {}))
+        if results is None:
+            selection = self.facets.selection(filters)
+        else:
+            selection = results.selection
+            ranked = results.top_positions(results.count())
+            # With facets selected, the matches they filtered out are read
+            # too: they still count towards the selected facets' values
+            candidates = results.matches if selection else ranked
+            if not len(candidates):
+                return OrderedResults(self, np.empty(0, dtype=np.int64))
+            queryset = queryset.filter(id__in=self.app_ids[candidates].tolist())
+        app_ids = queryset.order_by(*(order_by or ('id',))).values_list('id', flat=True)
+        positions = np.array([self.positions.get(app_id, -1) for app_id in app_ids], dtype=np.int64)
+        # Apps saved since the index was built are left out until it is rebuilt
+        passing = positions[positions >= 0]
+
+        if results is None:
+            mask = self.facets.mask(selection)
+            positions = passing if mask is None else passing[mask[passing]]
+            return OrderedResults(self, positions, selection, passing)
+
+        if order_by:
+            positions = passing[np.isin(passing, ranked)]
+        else:
+            positions = ranked[np.isin(ranked, passing)]
+        within = np.zeros(len(self.app_ids), dtype=bool)
+        within[passing] = True
+        return OrderedResults(
+            self, positions, selection, results.matches, results.match_scores, results.limit, within
+        )
+
+
+def heap_top_k(positions, scores, ratings, limit):
+    """
+    Best `limit` matches with a bounded heap
+
+    Returns:
+        list: (score, rating, position) tuples, best first. Ties on score go
+        to the higher rating, then to the earlier position.
+    """
+    return heapq.nlargest(
+        limit,
+        zip(scores.tolist(), ratings.tolist(), positions.tolist()),
+        key=lambda candidate: candidate[:2]
+    )
+
+
+class RankedResults:
+    """
+    Ranked search results that load App rows only for the slice requested
+
+    Matches are kept as index positions and scores. Slicing [start:stop]
+    selects the best `stop` candidates with np.argpartition, orders just
+    those, and fetches the App rows for start..stop in one query, so page N
+    costs O(N * page size) rather than a sort of the whole result set.
+    """
+
+    matches = None
+
+    def __init__(self, index, positions, scores, selection=None, matches=None, match_scores=None, limit=None,
+                 within=None):
+        """
+        Args:
+            index (SearchIndex): Snapshot the positions refer to
+            positions (numpy.ndarray): Matches passing the facet selection
+            scores (numpy.ndarray): Their scores
+            selection (dict): Facet rows the matches were filtered with
+            matches, match_scores, limit, within: The matches before facet
+                filtering and how they become results, for
+                FacetIndex.disjunctive_counts
+        """
+        self.index = index
+        self.positions = positions
+        self.scores = scores
+        self.selection = selection or {}
+        if matches is not None:
+            self.matches = matches
+        self.match_scores = match_scores
+        self.limit = limit
+        self.within = within
+
+    def count(self):
+        return len(self.positions)
+
+    def facet_counts(self):
+        """
+        Facet values of every match, counted from the facet bitsets
+
+        A selected facet is counted over the matches of the other facets'
+        selections only (disjunctive faceting).
+
+        Returns:
+            dict: Field -> list of (value, count) pairs
+        """
+        facets = self.index.facets
+        if not self.selection:
+            return facets.counts_by_facet(facets.counts(self.positions))
+        return facets.counts_by_facet(facets.disjunctive_counts(
+            self.matches, self.selection, self.match_scores, self.limit, self.within
+        ))
+
+    def __len__(self):
+        return self.count()
+
+    def top_positions(self, k):
+        """
+        Index positions of the best k matches, best first
+
+        Ties on score go to the higher rating and then to the lower position,
+        the same order as SearchIndex.search.
+        """
+        k = min(k, len(self.positions))
+        if k <= 0:
+            return self.positions[:0]
+
+        candidates = np.arange(len(self.positions))
+        if k < len(self.positions):
+            # Everything scoring at least the k-th best score, so ties on the
+            # boundary are resolved by the full ordering below
+            kth_score = -np.partition(-self.scores, k - 1)[k - 1]
+            candidates = np.flatnonzero(self.scores >= kth_score)
+
+        positions = self.positions[candidates]
+        order = np.lexsort((positions, -self.index.ratings[positions], -self.scores[candidates]))
+        return positions[order[:k]]
+
+    def app_ids(self, start, stop):
+        """App ids ranked start..stop"""
+        return self.index.app_ids[self.top_positions(stop)[start:stop]].tolist()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError('RankedResults does not support slice steps')
+            return self._materialize(self.app_ids(start, max(start, stop)))
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('RankedResults index out of range')
+        return self._materialize(self.app_ids(key, key + 1))[0]
+
+    def _materialize(self, app_ids):
+        return materialize_apps(app_ids)
+
+
+class ShardedResults(RankedResults):
+    """
+    RankedResults whose scoring runs on the shards of a ShardedSearcher
+
+    Only the merged top-k positions and the summed facet counts come back
+    from the workers; the first request fetches one page ahead so count(),
+    facet_counts() and page 1 share a round trip.
+    """
+
+    PREFETCH = 20
+
+    def __init__(self, index, searcher, rows, selection=None, blend=(1.0, 0.0)):
+        super().__init__(index, None, None, selection)
+        self.searcher = searcher
+        self.rows = rows
+        self.blend = blend
+        self._fetched_k = -1
+        self._total = 0
+        self._best = []
+        self._facet_counts = None
+
+    def _fetch(self, k):
+        if k > self._fetched_k:
+            self._total, self._best, self._facet_counts = self.searcher.top_k(
+                self.rows, k, self.selection, self.blend
+            )
+            self._fetched_k = k
+        return self._best[:k]
+
+    def count(self):
+        if self._fetched_k < 0:
+            self._fetch(self.PREFETCH)
+        return self._total
+
+    def facet_counts(self):
+        self.count()
+        return self.index.facets.counts_by_facet(self._facet_counts)
+
+    def top_positions(self, k):
+        positions = [pos for _, _, pos in self._fetch(max(k, 0))]
+        return np.array(positions, dtype=np.int64)
+
+    @property
+    def matches(self):
+        """Matches before facet filtering, from the parent's own posting lists"""
+        return self.index.bm25.match_rows(self.rows)[0]
+
+
+class OrderedResults(RankedResults):
+    """RankedResults whose order was already decided, e.g. by the database"""
+
+    def __init__(self, index, positions, selection=None, matches=None, match_scores=None, limit=None, within=None):
+        super().__init__(index, positions, None, selection, matches, match_scores, limit, within)
+
+    def top_positions(self, k):
+        return self.positions[:max(k, 0)]
+
+
+def materialize_apps(app_ids):
+    """Load App rows (with their AppStats) for ranked ids in one query, keeping the ranking order"""
+    from .models import App
+    apps_by_id = App.objects.select_related('stats').in_bulk(app_ids)
+    return [apps_by_id[app_id] for app_id in app_ids if app_id in apps_by_id]
+
+
+# The published snapshot. A snapshot is never modified once published: a
+# rebuild builds a complete new SearchIndex and replaces this reference in one
+# assignment, so a search that already holds the old snapshot finishes on it.
+_index = None
+_index_stale = True  # the catalog changed after _index was built
+_file_pending = False  # SEARCH_INDEX_PATH was replaced after _index was loaded
+_file_signature = None  # (inode, mtime) of the index file _index came from
+_file_checked_at = 0.0
+_index_lock = threading.Lock()  # held while the next snapshot is built
+_rebuild_thread = None
+_rebuild_thread_lock = threading.Lock()
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _check_index_file():
+    """
+    Notice a new SEARCH_INDEX_PATH file, renamed into place by another process
+
+    write_index() swaps files with an atomic rename, so a new inode or
+    mtime means a complete new index. Checked at most once every
+    SEARCH_INDEX_RELOAD_INTERVAL seconds.
+    """
+    global _file_pending, _file_checked_at
+    path = getattr(settings, 'SEARCH_INDEX_PATH', None)
+    if not path:
+        return
+    now = time.monotonic()
+    if now - _file_checked_at < settings.SEARCH_INDEX_RELOAD_INTERVAL:
+        return
+    _file_checked_at = now
+    state = _file_state(path)
+    if state is not None and state != _file_signature:
+        _file_pending = True
+
+
+def _next_snapshot():
+    """
+    Build the snapshot that replaces _index; the caller holds _index_lock
+
+    The index file is opened on first use and whenever a new one appears,
+    unless the catalog has changed since; otherwise the index is built from
+    the database.
+    """
+    global _index_stale, _file_pending, _file_signature
+    path = getattr(settings, 'SEARCH_INDEX_PATH', None)
+    use_file = path and (_index is None or (_file_pending and not _index_stale))
+    # Clear the flags before building so an invalidation that lands while we
+    # read the catalog triggers another rebuild.
+    _index_stale = _file_pending = False
+    if use_file and os.path.exists(path):
+        from .index_store import IndexFormatError, load_index
+        state = _file_state(path)
+        try:
+            index = load_index(path)
+        except IndexFormatError as error:
+            logger.warning('Ignoring search index file: %s', error)
+        else:
+            _file_signature = state
+            return index
+    return SearchIndex.build()
+
+
+def _publish(index):
+    """Make index the snapshot every new search uses"""
+    global _index
+    _index = index
+    # Pages cached from the previous snapshot while this one was built
+    from .search_cache import invalidate_search_cache
+    invalidate_search_cache()
+    logger.info('Published search index version %s (%d apps)', index.version, len(index))
+    return index
+
+
+def _needs_rebuild():
+    return _index is None or _index_stale or _file_pending
+
+
+def _prepare_in_background(index):
+    """
+    Fit what a snapshot would otherwise fit on first use, before it is
+    published, so no search after a swap pays for it inline
+    """
+    if settings.SEARCH_SEMANTIC_ENABLED and index.engine.document_matrix is not None:
+        index.semantic
+    return index
+
+
+def _rebuild_until_current():
+    """Background thread: publish new snapshots until nothing is pending"""
+    from django.db import connections
+    try:
+        while _needs_rebuild():
+            with _index_lock:
+                if _needs_rebuild():
+                    _publish(_prepare_in_background(_next_snapshot()))
+    except Exception:
+        logger.exception('Background search index rebuild failed; still serving version %s',
+                         _index.version if _index is not None else None)
+    finally:
+        connections.close_all()
+
+
+def _start_background_rebuild():
+    """Start the rebuild thread unless one is already running"""
+    global _rebuild_thread
+    with _rebuild_thread_lock:
+        if _rebuild_thread is None or not _rebuild_thread.is_alive():
+            _rebuild_thread = threading.Thread(
+                target=_rebuild_until_current, name='search-index-rebuild', daemon=True
+            )
+            _rebuild_thread.start()
+
+
+def get_search_index():
+    """
+    Return the current index snapshot
+
+    The first call builds (or opens) the index. After the catalog changes,
+    or a new index file appears, the next snapshot is built in a background
+    thread with SEARCH_INDEX_BACKGROUND_REBUILD while searches keep getting
+    the previous one, and inline otherwise.
+    """
+    _check_index_file()
+    index = _index
+    if index is not None and not (_index_stale or _file_pending):
+        return index
+    if index is not None and settings.SEARCH_INDEX_BACKGROUND_REBUILD:
+        _start_background_rebuild()
+        return index
+
+    with _index_lock:
+        if _needs_rebuild():
+            _publish(_next_snapshot())
+        return _index
+
+
+def current_search_index():
+    """The published snapshot, or None before the first build; never builds"""
+    return _index
+
+
+def rebuild_search_index():
+    """Rebuild the process-wide index from the database immediately"""
+    global _index_stale
+    with _index_lock:
+        _index_stale = False
+        return _publish(SearchIndex.build())
+
+
+def wait_for_search_index(timeout=None):
+    """
+    Wait for a background rebuild to publish its snapshot
+
+    Returns:
+        bool: True when no rebuild is running any more
+    """
+    thread = _rebuild_thread
+    if thread is not None:
+        thread.join(timeout)
+        return not thread.is_alive()
+    return True
+
+
+def search_index_status():
+    """Version, build time and rebuild state of the published snapshot"""
+    index = _index
+    thread = _rebuild_thread
+    status = {
+        'version': None,
+        'built_at': None,
+        'build_seconds': None,
+        'apps': 0,
+        'source': None,
+        'stale': _index_stale or _file_pending,
+        'rebuilding': thread is not None and thread.is_alive(),
+    }
+    if index is not None:
+        status.update({
+            'version': index.version,
+            'built_at': datetime.fromtimestamp(index.built_at, timezone.utc).isoformat(),
+            'build_seconds': index.build_seconds,
+            'apps': len(index),
+            'source': index.loaded_from or 'database',
+        })
+    return status
+
+
+def invalidate_search_index():
+    """Mark the index stale; the next search triggers a rebuild"""
+    global _index_stale
+    _index_stale = True
@@ -0,0 +1,154 @@
+import numpy as np
+
+# Below this cosine an app is not considered related to the query
+MIN_SIMILARITY = 0.1
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores, k):
+    """Positions of the k largest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return best[np.argsort(-scores[best], kind='stable')]
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest neighbour index
+
+    A k-means coarse quantizer splits the embeddings into lists. A query is
+    compared with the centroids, and only the members of the `probes`
+    closest lists are scored exactly, so the work per query grows with the
+    list size rather than with the catalog.
+    """
+
+    def __init__(self, centroids, list_indptr, list_members, probes):
+        self.centroids = centroids
+        self.list_indptr = list_indptr
+        self.list_members = list_members
+        self.probes = probes
+
+    @classmethod
+    def build(cls, embeddings, n_lists=None, probes=8):
+        from sklearn.cluster import MiniBatchKMeans
+
+        if n_lists is None:
+            n_lists = max(1, int(4 * np.sqrt(len(embeddings))))
+        n_lists = min(n_lists, len(embeddings))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=0, n_init=3).fit(embeddings)
+
+        assignments = kmeans.labels_
+        list_members = np.argsort(assignments, kind='stable').astype(np.int64)
+        list_indptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=list_indptr[1:])
+        centroids = _normalize_rows(kmeans.cluster_centers_).astype(np.float32)
+        return cls(centroids, list_indptr, list_members, probes)
+
+    def candidates(self, query_embedding):
+        """Embedding positions in the lists closest to the query"""
+        probed = top_k(self.centroids @ query_embedding, self.probes)
+        return np.concatenate([
+            self.list_members[self.list_indptr[row]:self.list_indptr[row + 1]] for row in probed
+        ])
+
+
+class SemanticIndex:
+    """
+    Latent semantic (LSA) embeddings of the catalog TF-IDF matrix
+
+    TruncatedSVD projects every app onto about a hundred dense dimensions, in
+    which apps that share vocabulary with similar apps end up close even
+    when they share no words with each other. Embeddings are unit-length
+    float32 rows of one contiguous array, so exact search is a single
+    matrix-vector product; large catalogs use an IVFIndex instead.
+    """
+
+    def __init__(self, term_vectors, embeddings, ann=None):
+        # SVD components transposed to terms x dimensions, so embedding a
+        # query reads only the rows of its own terms
+        self.term_vectors = term_vectors
+        self.embeddings = embeddings
+        self.ann = ann
+
+    @classmethod
+    def build(cls, document_matrix, n_components=100, exact_max_apps=20000, probes=8):
+        """
+        Args:
+            document_matrix: Catalog TF-IDF matrix (apps x terms)
+            n_components (int): Embedding dimensions
+            exact_max_apps (int): Catalogs up to this size are searched exactly
+            probes (int): IVF lists scanned per query
+
+        Returns:
+            SemanticIndex: The fitted index
+        """
+        from sklearn.decomposition import TruncatedSVD
+
+        n_components = max(1, min(n_components, min(document_matrix.shape) - 1))
+        svd = TruncatedSVD(n_components=n_components, random_state=0).fit(document_matrix)
+        term_vectors = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        embeddings = np.ascontiguousarray(
+            _normalize_rows(np.asarray(document_matrix @ term_vectors)), dtype=np.float32
+        )
+
+        ann = None
+        if len(embeddings) > exact_max_apps:
+            ann = IVFIndex.build(embeddings, probes=probes)
+        return cls(term_vectors, embeddings, ann)
+
+    def embed(self, query_vector):
+        """Unit-length embedding of a 1 x terms TF-IDF query vector"""
+        query_vector = query_vector.tocsr()
+        weights = query_vector.data.astype(np.float32)
+        embedding = weights @ self.term_vectors[query_vector.indices]
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def neighbours(self, query_vector):
+        """
+        Every app at least MIN_SIMILARITY from the query, unordered
+
+        Args:
+            query_vector: 1 x terms TF-IDF query vector
+
+        Returns:
+            tuple: (positions, scores) of the apps
+        """
+        embedding = self.embed(query_vector)
+        if not embedding.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if self.ann is None:
+            candidates = np.arange(len(self.embeddings))
+            scores = self.embeddings @ embedding
+        else:
+            candidates = self.ann.candidates(embedding)
+            scores = self.embeddings[candidates] @ embedding
+
+        keep = scores >= MIN_SIMILARITY
+        return candidates[keep], scores[keep]
+
+    def search(self, query_vector, limit=200, mask=None):
+        """
+        Apps closest to the query in embedding space
+
+        Args:
+            query_vector: 1 x terms TF-IDF query vector
+            limit (int): Maximum number of results
+            mask (numpy.ndarray): Optional boolean mask of allowed positions
+
+        Returns:
+            tuple: (positions, scores) of at most `limit` apps, best first
+        """
+        candidates, scores = self.neighbours(query_vector)
+        if mask is not None:
+            keep = mask[candidates]
+            candidates, scores = candidates[keep], scores[keep]
+        best = top_k(scores, limit)
+        return candidates[best], scores[best]
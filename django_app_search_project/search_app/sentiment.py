@@ -0,0 +1,190 @@
+"""
+Review sentiment scoring
+
+Functions of the review text (and star rating) shared by
+UserReview.analyze_combined_sentiment, the sentiment queue worker and
+"manage.py rescore_sentiment", so every path scores reviews the same way.
+Text sentiment goes through the cache in sentiment_cache.py; analyze_texts
+is the uncached analyzer (TextBlob, or the vectorized lexicon scorer of
+sentiment_lexicon.py with SENTIMENT_BACKEND = 'lexicon'), which needs no
+database and is what the process pool of rescore_sentiment runs.
+"""
+import functools
+from importlib.metadata import version
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Rating and text polarities further apart than this mark a contradiction
+CONTRADICTION_THRESHOLD = 0.8
+CONTRADICTION_PENALTY = 0.3
+# Combined polarity above +NEUTRAL_BAND is Positive, below -NEUTRAL_BAND Negative
+NEUTRAL_BAND = 0.1
+# Most of the combined polarity that the text can contribute
+MAX_TEXT_WEIGHT = 0.7
+
+
+@functools.lru_cache(maxsize=None)
+def _package_version(name):
+    return version(name)
+
+
+def analyzer_version():
+    """Identifies the scores the analyzer produces; part of every sentiment cache key"""
+    backend = sentiment_backend()
+    return f'{backend}-{_package_version("textblob")}-r{settings.SENTIMENT_ANALYZER_REVISION}'
+
+
+def sentiment_backend():
+    """
+    The SENTIMENT_BACKEND setting
+
+    Raises:
+        ImproperlyConfigured: For a backend that does not exist
+    """
+    backend = getattr(settings, 'SENTIMENT_BACKEND', 'textblob')
+    if backend not in SENTIMENT_BACKENDS:
+        raise ImproperlyConfigured(
+            f"Unknown SENTIMENT_BACKEND {backend!r}; expected {', '.join(SENTIMENT_BACKENDS)}"
+        )
+    return backend
+
+
+def textblob_sentiments(texts):
+    """TextBlob's pattern analyzer, one text at a time"""
+    # Imported on first use: loading TextBlob and its lexicon is slow
+    from textblob import TextBlob
+
+    scores = []
+    for text in texts:
+        sentiment = TextBlob(text or '').sentiment
+        scores.append((sentiment.polarity, sentiment.subjectivity))
+    return scores
+
+
+def lexicon_sentiments(texts):
+    """The same lexicon and rules scored for the whole batch at once, see sentiment_lexicon.py"""
+    from .sentiment_lexicon import get_lexicon_analyzer
+
+    polarity, subjectivity = get_lexicon_analyzer().score(texts)
+    return list(zip(polarity.tolist(), subjectivity.tolist()))
+
+
+# SENTIMENT_BACKEND -> function scoring a list of texts
+SENTIMENT_BACKENDS = {
+    'textblob': textblob_sentiments,
+    'lexicon': lexicon_sentiments,
+}
+
+
+def analyze_texts(texts):
+    """Score texts with SENTIMENT_BACKEND, without the cache; returns a (polarity, subjectivity) per text"""
+    return SENTIMENT_BACKENDS[sentiment_backend()](texts)
+
+
+def cached_sentiments(texts):
+    """
+    Look texts up in the sentiment cache
+
+    Returns:
+        tuple: (cache key per text, key -> scores found, key -> text still to score)
+    """
+    from .sentiment_cache import cache_key, get_sentiment_cache
+
+    analyzer = analyzer_version()
+    keys = [cache_key(text, analyzer) for text in texts]
+    found = get_sentiment_cache().get_many(keys)
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    return keys, found, missing
+
+
+def store_sentiments(missing, scores):
+    """Cache the scores analyze_texts returned for the texts of cached_sentiments' missing"""
+    from .sentiment_cache import get_sentiment_cache
+
+    scored = dict(zip(missing, scores))
+    get_sentiment_cache().set_many(scored, analyzer_version())
+    return scored
+
+
+def text_sentiments(texts):
+    """Return the (polarity, subjectivity) of each text, scoring only texts not cached yet"""
+    keys, found, missing = cached_sentiments(texts)
+    if missing:
+        found.update(store_sentiments(missing, analyze_texts(list(missing.values()))))
+    return [found[key] for key in keys]
+
+
+def text_sentiment(text):
+    """Return the (polarity, subjectivity) of a text"""
+    return text_sentiments([text])[0]
+
+
+def polarity_label(polarity):
+    """Sentiment label of the app review dataset: the sign of the polarity"""
+    if polarity > 0:
+        return 'Positive'
+    if polarity < 0:
+        return 'Negative'
+    return 'Neutral'
+
+
+def combined_sentiment(review_text, rating, text_scores=None):
+    """
+    Score a user review from both its text and its star rating
+
+    Args:
+        review_text (str): Review text
+        rating (int): Star rating from 1 to 5
+        text_scores (tuple): The text's (polarity, subjectivity) if already known
+
+    Returns:
+        dict: UserReview.SENTIMENT_FIELDS -> value, or None without text or rating
+    """
+    if not (review_text and rating):
+        return None
+
+    # Step 1: Analyze text sentiment (-1 to +1)
+    text_polarity, text_subjectivity = text_scores or text_sentiment(review_text)
+
+    # Step 2: Convert rating to sentiment scale
+    # Rating 1-5 → Polarity -1 to +1
+    rating_polarity = (rating - 3) / 2  # 1→-1, 3→0, 5→+1
+
+    # Step 3: Calculate weighted combination
+    # Give more weight to rating if text is very short or neutral
+    text_weight = min(len(review_text.split()) / 10, MAX_TEXT_WEIGHT)
+    rating_weight = 1 - text_weight
+    combined_polarity = (text_polarity * text_weight) + (rating_polarity * rating_weight)
+
+    # Step 4: Detect contradictions, which lower the confidence
+    has_contradiction = abs(text_polarity - rating_polarity) > CONTRADICTION_THRESHOLD
+    confidence_penalty = CONTRADICTION_PENALTY if has_contradiction else 0
+
+    # Step 5: Classify final sentiment
+    if combined_polarity > NEUTRAL_BAND:
+        sentiment = 'Positive'
+    elif combined_polarity < -NEUTRAL_BAND:
+        sentiment = 'Negative'
+    else:
+        sentiment = 'Neutral'
+
+    return {
+        'sentiment': sentiment,
+        'sentiment_polarity': combined_polarity,
+        'sentiment_subjectivity': text_subjectivity,
+        # Step 6: Calculate confidence
+        'confidence_score': max(0, abs(combined_polarity) - confidence_penalty),
+        'has_contradiction': has_contradiction,
+        'text_sentiment_polarity': text_polarity,
+        'rating_sentiment_polarity': rating_polarity,
+    }
+
+
+def app_review_fields(text, text_scores=None):
+    """Score an app review the way the dataset was; returns its sentiment fields"""
+    polarity, subjectivity = text_scores or text_sentiment(text or '')
+    return {'sentiment': polarity_label(polarity), 'sentiment_polarity': polarity, 'sentiment_subjectivity': subjectivity}
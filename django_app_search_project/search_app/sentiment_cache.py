@@ -0,0 +1,148 @@
+"""
+Memoized text sentiment
+
+Short reviews repeat a lot ("Good", "Nice app", "Love it"), so the text
+sentiment of a review is cached under the SHA-256 of the analyzer version
+and the text with its whitespace collapsed. Case is kept: TextBlob scores
+"Great :D" and "great :d" differently.
+
+Lookups go to a per-process LRU first and then to the sentiment_cache
+table, which every process and every later import share; only texts found
+in neither are scored. Because the analyzer version is part of the key, a
+new TextBlob release or SENTIMENT_ANALYZER_REVISION starts from an empty
+cache, and purge_stale() deletes the rows the old version left behind.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+# Keys per "key IN (...)" query, below SQLite's bound-parameter limit
+LOOKUP_BATCH = 500
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_text(text):
+    """Review text with runs of whitespace collapsed, which does not change its score"""
+    return ' '.join((text or '').split())
+
+
+def cache_key(text, analyzer):
+    return hashlib.sha256(f'{analyzer}\0{normalize_text(text)}'.encode('utf-8')).hexdigest()
+
+
+class SentimentCache:
+    """
+    Bounded LRU of (polarity, subjectivity) by cache key, backed by the
+    sentiment_cache table when persist is set
+    """
+
+    def __init__(self, max_entries, persist=True):
+        self.max_entries = max_entries
+        self.persist = persist
+        self.entries = OrderedDict()
+        self.lru_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """
+        Look up cache keys in the LRU, then the table
+
+        Returns:
+            dict: Key -> (polarity, subjectivity) for the keys found
+        """
+        keys = set(keys)
+        found = {}
+        with self._lock:
+            for key in keys:
+                scores = self.entries.get(key)
+                if scores is not None:
+                    self.entries.move_to_end(key)
+                    found[key] = scores
+            self.lru_hits += len(found)
+
+        missing = [key for key in keys if key not in found]
+        stored = {}
+        if missing and self.persist:
+            from .models import SentimentScore
+
+            for start in range(0, len(missing), LOOKUP_BATCH):
+                rows = SentimentScore.objects.filter(key__in=missing[start:start + LOOKUP_BATCH])
+                for key, polarity, subjectivity in rows.values_list('key', 'polarity', 'subjectivity'):
+                    stored[key] = (polarity, subjectivity)
+            self._remember(stored)
+            found.update(stored)
+        with self._lock:
+            self.db_hits += len(stored)
+            self.misses += len(missing) - len(stored)
+        return found
+
+    def set_many(self, scores, analyzer):
+        """Cache freshly computed key -> (polarity, subjectivity) pairs of one analyzer"""
+        self._remember(scores)
+        if scores and self.persist:
+            from .models import SentimentScore
+
+            # Another process may have stored the same text in the meantime
+            SentimentScore.objects.bulk_create(
+                [
+                    SentimentScore(key=key, analyzer=analyzer, polarity=polarity, subjectivity=subjectivity)
+                    for key, (polarity, subjectivity) in scores.items()
+                ],
+                batch_size=LOOKUP_BATCH,
+                ignore_conflicts=True,
+            )
+
+    def _remember(self, scores):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, value in scores.items():
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Empty the LRU and reset the counters (the table is left alone)"""
+        with self._lock:
+            self.entries.clear()
+            self.lru_hits = self.db_hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.lru_hits + self.db_hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'lru_hits': self.lru_hits,
+            'db_hits': self.db_hits,
+            'misses': self.misses,
+            'hit_rate': (self.lru_hits + self.db_hits) / lookups if lookups else 0.0,
+        }
+
+
+def get_sentiment_cache():
+    """The sentiment cache of this process"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SentimentCache(settings.SENTIMENT_CACHE_ENTRIES, settings.SENTIMENT_CACHE_PERSIST)
+    return _cache
+
+
+def sentiment_cache_stats():
+    """Hit/miss counters of this process's sentiment cache"""
+    return get_sentiment_cache().stats()
+
+
+def purge_stale(analyzer):
+    """Delete stored scores of every analyzer version but this one; returns the number deleted"""
+    from .models import SentimentScore
+
+    deleted, _ = SentimentScore.objects.exclude(analyzer=analyzer).delete()
+    return deleted
@@ -0,0 +1,245 @@
+"""
+Vectorized lexicon sentiment (SENTIMENT_BACKEND = 'lexicon')
+
+Scores a whole batch of reviews with NumPy instead of running TextBlob's
+pure-Python loop once per review. It reads the same lexicon TextBlob uses
+(every word's averaged polarity, subjectivity and intensity, plus its
+emoticons) and applies the same rules, but to flat arrays of all the
+batch's tokens at once:
+
+- a known word after a known adverb ("very good") forms one assessment
+  with the adverb, its scores scaled by the adverb's intensity, as long as
+  only words of up to two letters come between them;
+- a negation ("not good", "never a good") halves and flips the assessment
+  and inverts its intensity; a negation right after an "-ly" adverb
+  ("really not good") negates that adverb's assessment instead;
+- every "!" boosts the polarity of the assessment before it by 25%;
+- emoticons are assessments of their own.
+
+A review's polarity and subjectivity are the means over its assessments.
+Tokenization is a regular expression, which does not split contractions or
+abbreviations exactly like TextBlob's tokenizer, so scores agree with
+TextBlob within a small tolerance rather than exactly (see
+SentimentLexiconTestCase and "manage.py benchmark_sentiment").
+"""
+import functools
+import re
+import threading
+
+import numpy as np
+
+EXCLAMATION_BOOST = 1.25
+NEGATION_FACTOR = -0.5
+# Distinct tokens remembered between batches; beyond this the non-lexicon
+# ones are forgotten before the next batch
+MAX_TOKEN_CODES = 200000
+
+# Per-token flags
+KNOWN, MODIFIER, NEGATION, EXCLAMATION, EMOTICON, LY, BREAKS_MODIFIER, BREAKS_NEGATION = (1 << bit for bit in range(8))
+
+
+class LexiconAnalyzer:
+    """
+    Batch sentiment scorer over a word -> (polarity, subjectivity, intensity) lexicon
+
+    Every distinct token gets an integer code the first time it is seen, with
+    its scores and rule flags stored in arrays indexed by code, so scoring a
+    batch is one dictionary lookup per token followed by array operations.
+    """
+
+    def __init__(self, lexicon, modifiers, negations, emoticons):
+        """
+        Args:
+            lexicon (dict): Word -> (polarity, subjectivity, intensity)
+            modifiers (set): Lexicon words that modify the next word (adverbs)
+            negations (iterable): Negation words
+            emoticons (dict): Emoticon -> polarity
+        """
+        self.negations = frozenset(negations)
+        self._lock = threading.Lock()
+        self.codes = {}
+        self.polarity, self.subjectivity, self.intensity, self.flags = [], [], [], []
+        for word, (polarity, subjectivity, intensity) in lexicon.items():
+            self._add(word, polarity, subjectivity, intensity, KNOWN | (MODIFIER if word in modifiers else 0))
+        for emoticon, polarity in emoticons.items():
+            self._add(emoticon, polarity, 1.0, 1.0, EMOTICON)
+        self._freeze()
+
+        # Emoticons are matched case-sensitively as whole tokens, before words
+        # (which may contain "-" or "*", as in "f*cking"), ellipses and single
+        # punctuation marks; everything else is lowercased
+        emoticon_pattern = '|'.join(re.escape(e) for e in sorted(emoticons, key=len, reverse=True))
+        self.token_pattern = re.compile(
+            rf"(?:(?<=\s)|^)({emoticon_pattern})(?=[\s,.!?]|$)|([^\W_]+(?:[-*][^\W_]+)*|\.\.\.|[^\w\s])"
+        )
+
+    def _add(self, token, polarity=0.0, subjectivity=0.0, intensity=1.0, flags=0):
+        if not flags & KNOWN:
+            # Words outside the lexicon (and emoticons) only matter to the rules
+            if token in self.negations:
+                flags |= NEGATION
+            elif len(token.strip("'")) > 1:
+                flags |= BREAKS_NEGATION
+            if len(token) > 2:
+                flags |= BREAKS_MODIFIER
+            if token == '!':
+                flags |= EXCLAMATION
+        if token.endswith('ly'):
+            flags |= LY
+        self.codes[token] = len(self.flags)
+        self.polarity.append(polarity)
+        self.subjectivity.append(subjectivity)
+        self.intensity.append(intensity)
+        self.flags.append(flags)
+        return self.codes[token]
+
+    def _freeze(self):
+        self._arrays = (
+            np.asarray(self.polarity, dtype=np.float64),
+            np.asarray(self.subjectivity, dtype=np.float64),
+            np.asarray(self.intensity, dtype=np.float64),
+            np.asarray(self.flags, dtype=np.int32),
+        )
+
+    def tokenize(self, text):
+        # Like TextBlob, split "don't" into "do n ' t" (so lexicon entries such as
+        # "don't" never match and "n't" is no negation)
+        text = (text or '').replace("n't", " n't")
+        return [emoticon or other.lower() for emoticon, other in self.token_pattern.findall(text)]
+
+    def encode(self, texts):
+        """Token codes of every text, concatenated, and the text number of each token"""
+        codes, docs = [], []
+        grown = False
+        if len(self.codes) >= MAX_TOKEN_CODES:
+            # Forget unknown tokens instead of growing without bound, never in
+            # the middle of a batch, whose codes handed out so far must stay valid
+            self._reset_unknown()
+            grown = True
+        for doc, text in enumerate(texts):
+            tokens = self.tokenize(text)
+            for token in tokens:
+                code = self.codes.get(token)
+                if code is None:
+                    code = self._add(token)
+                    grown = True
+                codes.append(code)
+            docs.extend([doc] * len(tokens))
+        if grown:
+            self._freeze()
+        return np.asarray(codes, dtype=np.int64), np.asarray(docs, dtype=np.int64)
+
+    def _reset_unknown(self):
+        keep = sum(1 for flags in self.flags if flags & (KNOWN | EMOTICON))
+        # Lexicon words and emoticons are added first, so they are a prefix
+        self.codes = {token: code for token, code in self.codes.items() if code < keep}
+        del self.polarity[keep:], self.subjectivity[keep:], self.intensity[keep:], self.flags[keep:]
+
+    def score(self, texts):
+        """
+        Score a batch of texts
+
+        Returns:
+            tuple: (polarity, subjectivity) float arrays, one value per text
+        """
+        texts = list(texts)
+        polarity = np.zeros(len(texts))
+        subjectivity = np.zeros(len(texts))
+        with self._lock:
+            # Codes of unseen tokens are added (and the arrays replaced) while encoding
+            codes, docs = self.encode(texts)
+            lexicon_polarity, lexicon_subjectivity, lexicon_intensity, lexicon_flags = self._arrays
+        if not len(codes):
+            return polarity, subjectivity
+
+        flags = lexicon_flags[codes]
+        position = np.arange(len(codes))
+        doc_start = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+        start_of = doc_start[np.cumsum(np.r_[True, docs[1:] != docs[:-1]]) - 1]
+
+        def last_before(mask):
+            """Position of the last token before each token (same text) where mask holds, else -1"""
+            last = np.maximum.accumulate(np.where(mask, position, -1))
+            last = np.r_[-1, last[:-1]]
+            return np.where(last >= start_of, last, -1)
+
+        known = (flags & KNOWN) != 0
+        prev_known = last_before(known)
+        prev_flags = np.where(prev_known >= 0, lexicon_flags[codes[prev_known]], 0)
+        # A modifier carries over to the next known word across words of up to two letters
+        after_modifier = (prev_flags & MODIFIER) != 0
+        breaks_modifier = (flags & BREAKS_MODIFIER) != 0
+        modifier_active = after_modifier & (last_before(breaks_modifier) < prev_known)
+
+        # "really not good": the negation negates the latest assessment (the -ly
+        # adverb's) and is used up, and the adverb still modifies the next word
+        negation = (flags & NEGATION) != 0
+        consumed = negation & modifier_active & ((prev_flags & LY) != 0)
+        modifier_active = after_modifier & (last_before(breaks_modifier & ~consumed) < prev_known)
+        last_negation = last_before(negation & ~consumed)
+        negated = known & (last_negation > np.maximum(prev_known, last_before((flags & BREAKS_NEGATION) != 0)))
+
+        # A merged word joins the latest assessment, which may be an emoticon
+        # after the adverb ("really :) good")
+        assessed = known | ((flags & EMOTICON) != 0)
+        prev_assessed = last_before(assessed)
+        merged = known & modifier_active
+        starts = assessed & ~merged
+        group_of = np.cumsum(starts) - 1  # assessment number of each assessed token
+
+        # Scores of each token, scaled by the intensity of the word it merges into
+        token_polarity = lexicon_polarity[codes]
+        token_subjectivity = lexicon_subjectivity[codes]
+        intensity = lexicon_intensity[codes]
+        effective_intensity = np.where(negated, 1.0 / intensity, intensity)
+        scale = np.where(merged, effective_intensity[np.maximum(prev_assessed, 0)], 1.0)
+        token_polarity = np.clip(token_polarity * scale, -1.0, 1.0)
+        token_subjectivity = np.clip(token_subjectivity * scale, -1.0, 1.0)
+
+        assessed_positions = np.flatnonzero(assessed)
+        if not len(assessed_positions):
+            return polarity, subjectivity
+        groups = group_of[assessed_positions]
+        n_groups = groups[-1] + 1
+        # An assessment takes the scores of its last word
+        last_of_group = np.zeros(n_groups, dtype=np.int64)
+        last_of_group[groups] = assessed_positions
+        group_polarity = token_polarity[last_of_group]
+        group_subjectivity = token_subjectivity[last_of_group]
+        group_docs = docs[last_of_group]
+
+        group_negated = np.zeros(n_groups, dtype=bool)
+        group_negated[groups[negated[assessed_positions]]] = True
+        consumed_positions = np.flatnonzero(consumed)
+        group_negated[group_of[prev_assessed[consumed_positions]]] = True
+
+        # Each "!" boosts the assessment before it in the same text
+        exclamations = np.flatnonzero(((flags & EXCLAMATION) != 0) & (prev_assessed >= 0))
+        boosts = np.bincount(group_of[prev_assessed[exclamations]], minlength=n_groups)
+        group_polarity = np.clip(group_polarity * EXCLAMATION_BOOST ** boosts, -1.0, 1.0)
+        group_polarity = np.where(group_negated, group_polarity * NEGATION_FACTOR, group_polarity)
+
+        counts = np.bincount(group_docs, minlength=len(texts))
+        totals = np.maximum(counts, 1)
+        polarity = np.bincount(group_docs, weights=group_polarity, minlength=len(texts)) / totals
+        subjectivity = np.bincount(group_docs, weights=group_subjectivity, minlength=len(texts)) / totals
+        return polarity, subjectivity
+
+
+@functools.lru_cache(maxsize=None)
+def get_lexicon_analyzer():
+    """Analyzer over TextBlob's English sentiment lexicon, loaded once per process"""
+    from textblob._text import EMOTICONS
+    from textblob.en import sentiment
+
+    if not dict.__len__(sentiment):
+        sentiment.load()
+    lexicon = {word: tuple(tags[None]) for word, tags in dict.items(sentiment)}
+    modifiers = {word for word, tags in dict.items(sentiment) if any(tag in tags for tag in sentiment.modifiers)}
+    # TextBlob never matches emoticons made of letters ("XD"); "(!)" marks irony
+    emoticons = {
+        emoticon: polarity for (_, polarity), group in EMOTICONS.items() for emoticon in group
+        if not emoticon.isalpha()
+    }
+    emoticons['(!)'] = 0.0
+    return LexiconAnalyzer(lexicon, modifiers, sentiment.negations, emoticons)
@@ -0,0 +1,139 @@
+"""
+Database-backed queue for review sentiment analysis
+
+Submitting a review saves it once and adds a SentimentJob row in the same
+transaction; "manage.py process_sentiment_jobs" claims due jobs in batches,
+scores their reviews, writes the results with one bulk UPDATE and deletes
+the finished jobs. Until then the review shows "analysis pending".
+
+Workers claim jobs by stamping them with a token in a single conditional
+UPDATE, so several workers (or hosts) can share the queue without row
+locks. A failed job goes back to the queue with an exponential delay and
+is marked failed after SENTIMENT_JOB_MAX_ATTEMPTS attempts; a job claimed
+by a worker that died is claimed again once its lease
+(SENTIMENT_JOB_LEASE seconds) has run out.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_sentiment(review):
+    """Queue sentiment analysis of a saved review; does nothing if it is already queued"""
+    from .models import SentimentJob
+
+    job, created = SentimentJob.objects.get_or_create(review=review)
+    if not created and job.status == 'failed':
+        SentimentJob.objects.filter(id=job.id).update(status='queued', attempts=0, available_at=timezone.now())
+    return job
+
+
+def claim_jobs(batch_size):
+    """
+    Claim up to batch_size due jobs for this worker
+
+    Returns:
+        list: Claimed SentimentJob rows with their reviews, oldest first
+    """
+    from .models import SentimentJob
+
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.SENTIMENT_JOB_LEASE)
+    due = (
+        Q(status='queued', available_at__lte=now)
+        | Q(status='running', claimed_at__lt=expired)
+    )
+    candidates = list(
+        SentimentJob.objects.filter(due).order_by('available_at', 'id').values_list('id', flat=True)[:batch_size]
+    )
+    if not candidates:
+        return []
+    # Only rows still due when the UPDATE runs are claimed, so two workers
+    # racing for the same candidates never both get a job
+    SentimentJob.objects.filter(due, id__in=candidates).update(
+        status='running', claimed_by=token, claimed_at=now, attempts=F('attempts') + 1
+    )
+    return list(
+        SentimentJob.objects.filter(status='running', claimed_by=token)
+        .select_related('review').order_by('available_at', 'id')
+    )
+
+
+def retry_delay(attempts):
+    """Seconds before a job that failed `attempts` times is tried again"""
+    return settings.SENTIMENT_JOB_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+
+
+def process_jobs(jobs):
+    """
+    Score the reviews of jobs claimed together and record the outcome of each
+
+    A job whose lease ran out and was claimed again by another worker is
+    left to that worker.
+
+    Returns:
+        tuple: (number of reviews scored, number of failed attempts)
+    """
+    from .app_stats import record_review_change
+    from .models import SentimentJob, UserReview
+    from .sentiment import text_sentiments
+
+    token = jobs[0].claimed_by if jobs else None
+    try:
+        # One cache lookup for the whole batch
+        text_scores = text_sentiments([job.review.review_text for job in jobs])
+    except Exception:
+        # Let each review fail (or not) on its own below
+        logger.exception('Batch text sentiment failed; scoring reviews one by one')
+        text_scores = [None] * len(jobs)
+    scored, failed = [], []
+    for job, scores in zip(jobs, text_scores):
+        try:
+            job.review.analyze_combined_sentiment(save=False, text_scores=scores)
+        except Exception as error:
+            logger.warning('Sentiment analysis of review %s failed (attempt %s): %s', job.review_id, job.attempts, error)
+            failed.append((job, error))
+        else:
+            scored.append(job)
+
+    with transaction.atomic():
+        # Reread the reviews (status included: a supervisor may have approved
+        # one since the claim) and lock them until the scores are written
+        current = UserReview.objects.select_for_update().in_bulk([job.review_id for job in scored])
+        reviews = []
+        for job in scored:
+            review = current.get(job.review_id)
+            if review is not None:
+                for field in UserReview.SENTIMENT_FIELDS:
+                    setattr(review, field, getattr(job.review, field))
+                reviews.append(review)
+        UserReview.objects.bulk_update(reviews, UserReview.SENTIMENT_FIELDS)
+        for review in reviews:
+            # bulk_update sends no post_save; approved reviews' new scores reach app_stats here
+            record_review_change(review)
+        SentimentJob.objects.filter(id__in=[job.id for job in scored], claimed_by=token).delete()
+        now = timezone.now()
+        for job, error in failed:
+            exhausted = job.attempts >= settings.SENTIMENT_JOB_MAX_ATTEMPTS
+            SentimentJob.objects.filter(id=job.id, claimed_by=token).update(
+                status='failed' if exhausted else 'queued',
+                available_at=now + timedelta(seconds=retry_delay(job.attempts)),
+                last_error=f'{type(error).__name__}: {error}',
+            )
+    return len(scored), len(failed)
+
+
+def run_batch(batch_size=None):
+    """Claim and process one batch; returns (scored, failed) like process_jobs"""
+    jobs = claim_jobs(batch_size or settings.SENTIMENT_JOB_BATCH_SIZE)
+    if not jobs:
+        return 0, 0
+    return process_jobs(jobs)
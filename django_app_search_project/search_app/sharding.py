@@ -0,0 +1,171 @@
+"""
+Parallel BM25 scoring over document shards in a process pool
+
+The catalog is split into SEARCH_SHARDS contiguous ranges of index
+positions. Each shard holds the columns of the BM25 posting matrix for its
+apps, so a query scores every shard independently; a shard returns only its
+local top-k and the parent merges those lists with a heap. Because a shard
+sums the same posting lists in the same order as the single-process path,
+scores, tie-breaks and therefore rankings are identical.
+"""
+import heapq
+import itertools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.conf import settings
+
+from .popularity import hybrid_scores
+from .search_index import BM25Index, filter_matches, heap_top_k
+
+# Shards of the index the worker process was started for
+_worker_shards = None
+
+
+def _init_worker(shards):
+    global _worker_shards
+    _worker_shards = shards
+
+
+def _search_shard(shard_number, rows, k, selection, blend):
+    return _worker_shards[shard_number].top_k(rows, k, selection, blend)
+
+
+class IndexShard:
+    """One contiguous range of index positions with its BM25, prior and facet columns"""
+
+    def __init__(self, offset, term_weights, ratings, facets, prior):
+        self.offset = offset
+        self.bm25 = BM25Index([], term_weights)
+        self.ratings = ratings
+        self.facets = facets
+        self.prior = prior
+
+    def top_k(self, rows, k, selection, blend):
+        """
+        The blend comes from the parent, since scaling a query's scores
+        needs the score ceiling over the whole catalog.
+
+        Returns:
+            tuple: (number of matches in this shard, best k as
+            (score, rating, global position) tuples, best first, facet
+            value counts of the shard's matches, selected facets counted
+            disjunctively)
+        """
+        matches, match_scores = self.bm25.match_rows(rows)
+        positions, scores = filter_matches(matches, match_scores, self.facets.mask(selection))
+        scores = hybrid_scores(scores, self.prior[positions], *blend)
+        best = heap_top_k(positions + self.offset, scores, self.ratings[positions], k)
+        return len(positions), best, self.facets.disjunctive_counts(matches, selection)
+
+
+class ShardedSearcher:
+    """
+    A SearchIndex's BM25 matrix split across a persistent process pool
+
+    Workers receive every shard once, when they start, and afterwards only
+    the query's posting-list rows travel to them.
+    """
+
+    def __init__(self, index, n_shards, max_workers=None):
+        self.index = index
+        self.prior = index.prior
+        self.requested_shards = n_shards
+        n_shards = max(1, min(n_shards, len(index.app_ids)))
+        bounds = np.linspace(0, len(index.app_ids), n_shards + 1).astype(np.int64).tolist()
+        term_weights = index.bm25.term_weights
+        self.shards = [
+            IndexShard(
+                start,
+                term_weights[:, start:stop].tocsr(),
+                np.asarray(index.ratings[start:stop]),
+                index.facets.slice(start, stop),
+                np.asarray(index.prior[start:stop]),
+            )
+            for start, stop in zip(bounds, bounds[1:])
+        ]
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers or n_shards,
+            initializer=_init_worker,
+            initargs=(self.shards,),
+        )
+
+    def top_k(self, rows, k, selection=None, blend=(1.0, 0.0)):
+        """
+        Score all shards in parallel and merge their local top-k
+
+        Args:
+            rows (list): Posting-list rows from BM25Index.query_rows
+            k (int): Number of results wanted
+            selection (dict): Facet rows from FacetIndex.selection
+            blend (tuple): (relevance_scale, prior_weight) from SearchIndex.blend
+
+        Returns:
+            tuple: (total number of matches, best k as (score, rating,
+            position) tuples, best first, facet value counts)
+        """
+        if not rows:
+            return 0, [], np.zeros(len(self.index.facets.values), dtype=np.int64)
+        try:
+            futures = [
+                self.executor.submit(_search_shard, shard_number, rows, k, selection or {}, blend)
+                for shard_number in range(len(self.shards))
+            ]
+        except RuntimeError:
+            # The pool was retired because a newer index was published; finish
+            # this query on the old snapshot's shards in this process
+            results = [shard.top_k(rows, k, selection or {}, blend) for shard in self.shards]
+        else:
+            results = [future.result() for future in futures]
+        total = sum(count for count, _, _ in results)
+        # Shards are in position order, so equal keys keep the lower position
+        best = heapq.nlargest(
+            k,
+            itertools.chain.from_iterable(shard_best for _, shard_best, _ in results),
+            key=lambda candidate: candidate[:2]
+        )
+        return total, best, sum(counts for _, _, counts in results)
+
+    def shutdown(self):
+        # Queries already submitted still complete; see top_k for later ones
+        self.executor.shutdown(wait=False)
+
+
+_searcher = None
+_searcher_lock = threading.Lock()
+
+
+def get_sharded_searcher(index):
+    """
+    The sharded searcher for index, or None when SEARCH_SHARDS is 1
+
+    The pool is started on first use and replaced when the index or its
+    prior is, since its workers hold a copy of the shards they were started
+    with. Once a newer snapshot is published, searches still running on an
+    older one score in-process rather than restarting the pool for it.
+    """
+    global _searcher
+    n_shards = getattr(settings, 'SEARCH_SHARDS', 1)
+    if n_shards <= 1:
+        return None
+
+    from .search_index import current_search_index
+    if _searcher is not None and _searcher.index is not index and current_search_index() not in (None, index):
+        return None
+    with _searcher_lock:
+        if (_searcher is None or _searcher.index is not index or _searcher.prior is not index.prior
+                or _searcher.requested_shards != n_shards):
+            if _searcher is not None:
+                _searcher.shutdown()
+            _searcher = ShardedSearcher(index, n_shards, getattr(settings, 'SEARCH_SHARD_WORKERS', None))
+        return _searcher
+
+
+def shutdown_sharded_searcher():
+    """Stop the worker pool, if one is running"""
+    global _searcher
+    with _searcher_lock:
+        if _searcher is not None:
+            _searcher.shutdown()
+        _searcher = None
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .app_stats import forget_review, record_review_change, remember_contribution
+from .models import App, AppReview, UserReview
+from .search_cache import invalidate_search_cache
+from .search_index import invalidate_search_index
+
+
+@receiver(post_save, sender=App)
+@receiver(post_delete, sender=App)
+def app_catalog_changed(sender, **kwargs):
+    """Keep the in-memory search index and cached result pages in step with the App table"""
+    invalidate_search_index()
+    invalidate_search_cache()
+
+
+@receiver(post_init, sender=AppReview)
+@receiver(post_init, sender=UserReview)
+def review_loaded(sender, instance, **kwargs):
+    remember_contribution(instance)
+
+
+@receiver(post_save, sender=AppReview)
+@receiver(post_save, sender=UserReview)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    """Keep the app's AppStats row in step with its reviews (see app_stats.py)"""
+    if not raw:
+        record_review_change(instance, created)
+
+
+@receiver(post_delete, sender=AppReview)
+@receiver(post_delete, sender=UserReview)
+def review_deleted(sender, instance, **kwargs):
+    forget_review(instance)
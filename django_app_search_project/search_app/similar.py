@@ -0,0 +1,96 @@
+"""
+Precomputed "similar apps" neighbours
+
+Every app's nearest neighbours are its highest cosine similarities over the
+TF-IDF vectors of name, category and genres, the matrix the search index
+already holds. The job multiplies one block of rows by the transposed
+matrix at a time (block x catalog, sparse), so memory grows with the block
+size rather than with the square of the catalog, and keeps the top
+SEARCH_SIMILAR_APPS of each row in the SimilarApp table. The app detail
+page then reads them with one indexed lookup on (app, rank).
+
+Run "manage.py build_similar_apps" after loading or editing the catalog;
+apps added since the last run simply have no neighbours yet.
+"""
+import numpy as np
+from django.db import transaction
+
+# Rows written per INSERT when the neighbour table is refilled
+INSERT_BATCH_SIZE = 5000
+
+
+def nearest_neighbours(matrix, ratings, top_n, block_size):
+    """
+    Top-n most similar rows of an L2-normalised sparse matrix, block by block
+
+    Args:
+        matrix (scipy.sparse.csr_matrix): One normalised row per app
+        ratings (numpy.ndarray): Rating per row, to break ties on similarity
+        top_n (int): Neighbours to keep per row
+        block_size (int): Rows multiplied at a time
+
+    Yields:
+        tuple: (position, neighbour positions, similarities) per row, most
+        similar first; ties go to the higher rating, then the earlier position
+    """
+    matrix = matrix.tocsr()
+    transposed = matrix.T.tocsr()
+    for start in range(0, matrix.shape[0], block_size):
+        block = (matrix[start:start + block_size] @ transposed).tocsr()
+        for offset in range(block.shape[0]):
+            position = start + offset
+            row = slice(block.indptr[offset], block.indptr[offset + 1])
+            columns, scores = block.indices[row], block.data[row]
+            keep = (columns != position) & (scores > 0)
+            columns, scores = columns[keep], scores[keep]
+            if len(scores) > top_n:
+                # Drop everything below the n-th best score before sorting,
+                # keeping rows tied with it for the rating tie-break
+                cutoff = np.partition(scores, len(scores) - top_n)[len(scores) - top_n]
+                columns, scores = columns[scores >= cutoff], scores[scores >= cutoff]
+            order = np.lexsort((columns, -ratings[columns], -scores))[:top_n]
+            yield position, columns[order], scores[order]
+
+
+def neighbours_of(app_id, limit):
+    """Queryset of an app's stored neighbours, best first, with the neighbour apps joined in"""
+    from .models import SimilarApp
+
+    return SimilarApp.objects.filter(app_id=app_id).select_related('similar').order_by('rank')[:limit]
+
+
+def build_similar_apps(index, top_n, block_size):
+    """
+    Replace the SimilarApp table with the neighbours of every indexed app
+
+    Args:
+        index (SearchIndex): Index whose TF-IDF matrix is compared
+        top_n (int): Neighbours stored per app
+        block_size (int): Rows multiplied at a time
+
+    Returns:
+        int: Neighbour rows written
+    """
+    from .models import SimilarApp
+
+    app_ids = index.app_ids.tolist()
+    written = 0
+    with transaction.atomic():
+        SimilarApp.objects.all().delete()
+        if index.engine.document_matrix is None or top_n <= 0:
+            return 0
+        batch = []
+        for position, neighbours, scores in nearest_neighbours(
+            index.engine.document_matrix, index.ratings, top_n, block_size
+        ):
+            batch.extend(
+                SimilarApp(app_id=app_ids[position], similar_id=app_ids[neighbour], rank=rank, score=score)
+                for rank, (neighbour, score) in enumerate(zip(neighbours.tolist(), scores.tolist()), 1)
+            )
+            if len(batch) >= INSERT_BATCH_SIZE:
+                SimilarApp.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        SimilarApp.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -0,0 +1,370 @@
+import bisect
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .utils import english_stop_words
+
+# Where a word starts inside a lowercased app name
+WORD_START_PATTERN = re.compile(r'(?<![^\W_])[^\W_]')
+
+# Longest prefix worth storing; suggestions are asked for short inputs
+MAX_KEY_LENGTH = 64
+
+# Sorts after any character, so query + KEY_END bounds every key with that prefix
+KEY_END = '\U0010ffff'
+
+
+def normalize_prefix(query):
+    """Lowercased query with single spaces, cut to MAX_KEY_LENGTH"""
+    return ' '.join(query.lower().split())[:MAX_KEY_LENGTH]
+
+
+class CandidateCache:
+    """
+    Bounded LRU of autocomplete candidates, keyed by normalized prefix
+
+    Each entry is (start, stop, ranks): the prefix's slice of
+    PrefixIndex.keys and the popularity ranks of every app it matches.
+    Typing only narrows a prefix ("inst" -> "insta"), so the next keystroke
+    bisects inside the cached slice and filters the cached ranks instead of
+    starting over. Memory is bounded by the number of ranks held in total
+    (max_candidates) and by the number of prefixes (max_entries); the least
+    recently used prefixes are evicted first.
+
+    Spelling corrections of single words are kept too (at most max_entries),
+    so the words of a typo'd query are not corrected again on every
+    keystroke that follows them.
+    """
+
+    def __init__(self, max_candidates, max_entries):
+        self.max_candidates = max_candidates
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.corrections = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.refinements = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, prefix):
+        entry = self.entries.get(prefix)
+        if entry is not None:
+            with self._lock:
+                if prefix in self.entries:
+                    self.entries.move_to_end(prefix)
+        return entry
+
+    def parent(self, prefix):
+        """Entry of the longest cached proper prefix of prefix, or None"""
+        for end in range(len(prefix) - 1, 0, -1):
+            entry = self.get(prefix[:end])
+            if entry is not None:
+                return entry
+        return None
+
+    def put(self, prefix, entry):
+        ranks = entry[2]
+        if len(ranks) > self.max_candidates:
+            return
+        with self._lock:
+            replaced = self.entries.pop(prefix, None)
+            if replaced is not None:
+                self.size -= len(replaced[2])
+            self.entries[prefix] = entry
+            self.size += len(ranks)
+            while self.size > self.max_candidates or len(self.entries) > self.max_entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted[2])
+
+    def correction(self, word):
+        """Cached correction of a word, the word itself when it has none, or None when unknown"""
+        corrected = self.corrections.get(word)
+        if corrected is not None:
+            with self._lock:
+                if word in self.corrections:
+                    self.corrections.move_to_end(word)
+        return corrected
+
+    def put_correction(self, word, corrected):
+        with self._lock:
+            self.corrections[word] = corrected
+            self.corrections.move_to_end(word)
+            while len(self.corrections) > self.max_entries:
+                self.corrections.popitem(last=False)
+
+    def stats(self):
+        return {
+            'prefixes': len(self.entries),
+            'corrections': len(self.corrections),
+            'candidates': self.size,
+            'hits': self.hits,
+            'refinements': self.refinements,
+            'misses': self.misses,
+        }
+
+
+class PrefixIndex:
+    """
+    Sorted array of app-name prefixes for autocomplete
+
+    Every lowercased name is stored once from each word start ("photo
+    editor pro" -> "photo editor pro", "editor pro", "pro"), so typing the
+    start of any word finds the app. A query is two bisects over the sorted
+    keys; the matching range is then reduced to the most popular apps.
+    """
+
+    def __init__(self, keys, entry_ranks, names_by_rank):
+        self.keys = keys
+        self.entry_ranks = entry_ranks
+        self.names_by_rank = names_by_rank
+
+    @classmethod
+    def build(cls, names, popularity):
+        """
+        Args:
+            names (list): App names
+            popularity (list): Sort key per app, larger is more popular
+
+        Returns:
+            PrefixIndex: The built index
+        """
+        by_popularity = sorted(range(len(names)), key=lambda i: popularity[i], reverse=True)
+        rank_of = {app: rank for rank, app in enumerate(by_popularity)}
+
+        entries = []
+        for app, name in enumerate(names):
+            lowered = ' '.join(name.lower().split())
+            starts = {0} | {match.start() for match in WORD_START_PATTERN.finditer(lowered)}
+            entries.extend((lowered[start:start + MAX_KEY_LENGTH], rank_of[app]) for start in starts)
+        entries.sort()
+
+        return cls(
+            [key for key, _ in entries],
+            np.array([rank for _, rank in entries], dtype=np.int32),
+            [names[app] for app in by_popularity],
+        )
+
+    def key_range(self, query, lo=0, hi=None):
+        """Slice of self.keys starting with the (lowercased) query, searched within keys[lo:hi]"""
+        prefix = normalize_prefix(query)
+        hi = len(self.keys) if hi is None else hi
+        start = bisect.bisect_left(self.keys, prefix, lo, hi)
+        stop = bisect.bisect_left(self.keys, prefix + KEY_END, start, hi)
+        return start, stop
+
+    def candidates(self, query, cache=None):
+        """
+        Popularity ranks of every app with a word starting with the query
+
+        With a CandidateCache, a query extending a cached prefix is answered
+        from that prefix's entry: its slice of keys is bisected again and its
+        ranks are filtered, which keeps them in popularity order without
+        sorting.
+
+        Returns:
+            numpy.ndarray: Distinct ranks, most popular first
+        """
+        if cache is None:
+            start, stop = self.key_range(query)
+            return np.unique(self.entry_ranks[start:stop])
+
+        prefix = normalize_prefix(query)
+        entry = cache.get(prefix)
+        if entry is not None:
+            cache.hits += 1
+            return entry[2]
+
+        parent = cache.parent(prefix)
+        if parent is None:
+            cache.misses += 1
+            start, stop = self.key_range(prefix)
+            ranks = np.unique(self.entry_ranks[start:stop])
+        else:
+            cache.refinements += 1
+            parent_start, parent_stop, parent_ranks = parent
+            start, stop = self.key_range(prefix, parent_start, parent_stop)
+            if (start, stop) == (parent_start, parent_stop):
+                ranks = parent_ranks
+            else:
+                matched = np.zeros(len(self.names_by_rank), dtype=bool)
+                matched[self.entry_ranks[start:stop]] = True
+                ranks = parent_ranks[matched[parent_ranks]]
+        cache.put(prefix, (start, stop, ranks))
+        return ranks
+
+    def suggest(self, query, limit=10, fuzzy=None, cache=None):
+        """
+        Most popular app names with a word starting with the query
+
+        When nothing matches and a FuzzyIndex is given, the query is spell
+        corrected ("facebok" -> "facebook") and looked up again.
+
+        Returns:
+            list: Up to `limit` app names, most popular first
+        """
+        ranks = self.candidates(query, cache)
+        if not len(ranks):
+            corrected = fuzzy.correct(query, cache) if fuzzy is not None else None
+            if corrected is None:
+                return []
+            ranks = self.candidates(corrected, cache)
+        # Ranks are popularity positions, so the smallest distinct ranks win
+        return [self.names_by_rank[rank] for rank in ranks[:limit].tolist()]
+
+
+def delete_variants(word, max_distance):
+    """Every string reachable from word by deleting up to max_distance characters"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {
+            variant[:i] + variant[i + 1:]
+            for variant in frontier
+            for i in range(len(variant))
+        }
+        variants |= frontier
+    return variants
+
+
+def edit_distance(source, target, max_distance):
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent swaps)
+
+    Returns:
+        int: The distance, or max_distance + 1 once it is known to be larger
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+class FuzzyIndex:
+    """
+    Symmetric-delete spelling index (the SymSpell technique)
+
+    Each vocabulary word is stored under every variant of its first
+    PREFIX_LENGTH characters with up to max_distance deletions. A misspelt
+    word is looked up by its own deletion variants, so only the handful of
+    words sharing a variant are compared with a real edit distance.
+    """
+
+    PREFIX_LENGTH = 7
+
+    def __init__(self, words, frequencies, variants, variant_indptr, variant_words, max_distance):
+        self.words = words
+        self.frequencies = frequencies
+        self.word_set = set(words)
+        # Deletion variant -> word ids, as CSR rows: variant_words[indptr[r]:indptr[r + 1]]
+        self.variants = variants
+        self.variant_rows = {variant: row for row, variant in enumerate(variants)}
+        self.variant_indptr = variant_indptr
+        self.variant_words = variant_words
+        self.max_distance = max_distance
+
+    @classmethod
+    def build(cls, words, frequencies, max_distance=2):
+        """
+        Args:
+            words (list): Vocabulary words
+            frequencies (list): How many apps use each word, to break ties
+
+        Returns:
+            FuzzyIndex: The built index
+        """
+        kept = [
+            (word, frequency) for word, frequency in zip(words, frequencies)
+            if len(word) >= 3 and word.isalpha()
+        ]
+        deletes = {}
+        for word_id, (word, _) in enumerate(kept):
+            for variant in delete_variants(word[:cls.PREFIX_LENGTH], max_distance):
+                deletes.setdefault(variant, []).append(word_id)
+
+        variants = sorted(deletes)
+        lengths = np.array([len(deletes[variant]) for variant in variants], dtype=np.int64)
+        indptr = np.zeros(len(variants) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        word_ids = np.fromiter(
+            (word_id for variant in variants for word_id in deletes[variant]),
+            dtype=np.int32,
+            count=int(indptr[-1])
+        )
+        return cls(
+            [word for word, _ in kept],
+            [frequency for _, frequency in kept],
+            variants,
+            indptr,
+            word_ids,
+            max_distance,
+        )
+
+    def lookup(self, word):
+        """
+        Vocabulary words within max_distance edits of word
+
+        Returns:
+            list: (word, distance) pairs, closest and most frequent first
+        """
+        word = word.lower()
+        if word in self.word_set:
+            return [(word, 0)]
+
+        candidate_ids = set()
+        for variant in delete_variants(word[:self.PREFIX_LENGTH], self.max_distance):
+            row = self.variant_rows.get(variant)
+            if row is not None:
+                start, stop = self.variant_indptr[row], self.variant_indptr[row + 1]
+                candidate_ids.update(self.variant_words[start:stop].tolist())
+
+        matches = []
+        for word_id in candidate_ids:
+            distance = edit_distance(word, self.words[word_id], self.max_distance)
+            if distance <= self.max_distance:
+                matches.append((distance, -self.frequencies[word_id], self.words[word_id]))
+        matches.sort()
+        return [(candidate, distance) for distance, _, candidate in matches]
+
+    def correct(self, query, cache=None):
+        """
+        The query with unknown words replaced by their closest correction
+
+        Args:
+            query (str): The query to correct
+            cache (CandidateCache): Optional memo of word corrections
+
+        Returns:
+            str: The corrected query, or None when nothing was changed
+        """
+        words = query.lower().split()
+        corrected = []
+        for word in words:
+            best = cache.correction(word) if cache is not None else None
+            if best is None:
+                matches = []
+                if len(word) >= 3 and word.isalpha() and word not in english_stop_words():
+                    matches = self.lookup(word)
+                best = matches[0][0] if matches else word
+                if cache is not None:
+                    cache.put_correction(word, best)
+            corrected.append(best)
+        if corrected == words:
+            return None
+        return ' '.join(corrected)
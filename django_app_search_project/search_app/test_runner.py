@@ -0,0 +1,20 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class SearchTestRunner(DiscoverRunner):
+    """
+    The default runner, with the search index rebuilt inline after catalog
+    changes instead of in a background thread, so a test that saves an app
+    can search for it straight away. Tests of the background rebuild turn it
+    back on with override_settings.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._inline_rebuild = override_settings(SEARCH_INDEX_BACKGROUND_REBUILD=False)
+        self._inline_rebuild.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._inline_rebuild.disable()
+        super().teardown_test_environment(**kwargs)
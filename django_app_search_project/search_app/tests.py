@@ -1,5 +1,5 @@
-from django.test import TestCase, Client
-from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.contrib.auth.models import AnonymousUser, User
 from django.urls import reverse
 from django.contrib import messages
 from unittest.mock import patch
@@ -420,4 +420,1497 @@ class AppSearchTestCase(TestCase):
         
         # Photo editing should have highest similarity
         max_similarity_index = similarities.index(max(similarities))
-        self.assertEqual(max_similarity_index, 0)  # First document should be most similar
\ No newline at end of file
+        self.assertEqual(max_similarity_index, 0)  # First document should be most similar
+
+class SearchIndexTestCase(TestCase):
+    def setUp(self):
+        self.photo = App.objects.create(
+            name='Photo Editor Pro',
+            category='PHOTOGRAPHY',
+            rating=4.2,
+            genres='Photography'
+        )
+        self.calculator = App.objects.create(
+            name='Simple Calculator',
+            category='TOOLS',
+            rating=4.0,
+            genres='Tools'
+        )
+
+    def test_index_scores_matching_apps_only(self):
+        """Test BM25 ranking scores only the apps sharing a term with the query"""
+        from .search_index import rebuild_search_index
+
+        index = rebuild_search_index()
+        results = index.search('photo editor')
+
+        self.assertEqual([app_id for app_id, _ in results], [self.photo.id])
+        self.assertGreater(results[0][1], 0)
+        self.assertEqual(index.search('nothing matches this'), [])
+
+    def test_index_rebuilt_after_catalog_change(self):
+        """Test saving an App invalidates the in-memory index"""
+        from .search_index import get_search_index
+
+        first = get_search_index()
+        new_app = App.objects.create(name='Budget Planner', category='FINANCE')
+        second = get_search_index()
+
+        self.assertIsNot(first, second)
+        self.assertIn(new_app.id, second.positions)
+
+
+class BM25SearchTestCase(TestCase):
+    def setUp(self):
+        self.editor = App.objects.create(
+            name='Photo Editor Pro',
+            category='PHOTOGRAPHY',
+            rating=4.2,
+            genres='Photography'
+        )
+        self.collage = App.objects.create(
+            name='Collage Maker',
+            category='PHOTOGRAPHY',
+            rating=4.6,
+            genres='Photography'
+        )
+        self.messenger = App.objects.create(
+            name='WhatsApp Messenger',
+            category='COMMUNICATION',
+            rating=4.4,
+            genres='Communication'
+        )
+
+    def test_only_matching_apps_are_candidates(self):
+        """Test BM25 scores only apps that share a term with the query"""
+        from .search_index import rebuild_search_index
+
+        ranked = rebuild_search_index().search('photography')
+        ranked_ids = [app_id for app_id, _ in ranked]
+
+        self.assertCountEqual(ranked_ids, [self.editor.id, self.collage.id])
+        # Equal scores fall back to the higher rating
+        self.assertEqual(ranked_ids[0], self.collage.id)
+
+    def test_multi_word_query_matches_across_fields(self):
+        """Test query words may come from the name and the category"""
+        response = self.client.get(reverse('search_results'), {'q': 'editor photography'})
+
+        self.assertEqual(response.status_code, 200)
+        apps = list(response.context['page_obj'])
+        self.assertEqual(apps[0], self.editor)
+        self.assertIn(self.collage, apps)
+        self.assertNotIn(self.messenger, apps)
+
+    def test_partial_word_expands_to_prefix(self):
+        """Test an unknown word is matched as a prefix of indexed terms"""
+        response = self.client.get(reverse('search_results'), {'q': 'whats'})
+
+        self.assertContains(response, 'WhatsApp Messenger')
+
+    def test_search_index_top_k_limit(self):
+        """Test the heap keeps only the requested number of results"""
+        from .search_index import rebuild_search_index
+
+        ranked = rebuild_search_index().search('photography', limit=1)
+        self.assertEqual(len(ranked), 1)
+
+
+class RankedResultsTestCase(TestCase):
+    def setUp(self):
+        from .search_index import rebuild_search_index
+
+        App.objects.bulk_create([
+            App(
+                name=f'Puzzle Game {i}' if i % 3 else f'Puzzle Game Classic Edition {i}',
+                category='GAME',
+                rating=3 + (i % 5) * 0.4,
+                genres='Puzzle'
+            )
+            for i in range(45)
+        ])
+        App.objects.create(name='Weather Radar', category='WEATHER', genres='Weather')
+        self.index = rebuild_search_index()
+
+    def test_slices_follow_full_ranking(self):
+        """Test argpartition slices agree with the full heap ranking"""
+        results = self.index.rank('puzzle game')
+        expected = [app_id for app_id, _ in self.index.search('puzzle game', limit=45)]
+
+        self.assertEqual(results.count(), 45)
+        self.assertEqual(results.app_ids(0, 20), expected[:20])
+        self.assertEqual(results.app_ids(20, 40), expected[20:40])
+        self.assertEqual(results.app_ids(40, 60), expected[40:])
+
+    def test_page_loads_only_its_rows(self):
+        """Test slicing fetches just the requested App rows in one query"""
+        results = self.index.rank('puzzle game')
+
+        with self.assertNumQueries(1):
+            page = results[20:40]
+
+        self.assertEqual(len(page), 20)
+        self.assertEqual([app.id for app in page], results.app_ids(20, 40))
+
+    def test_search_view_paginates_lazily(self):
+        """Test the results page reports the full count but renders one page"""
+        response = self.client.get(reverse('search_results'), {'q': 'puzzle', 'page': 3})
+
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 45)
+        self.assertEqual(page_obj.number, 3)
+        self.assertEqual(len(page_obj.object_list), 5)
+
+
+class SimilarAppsTestCase(TestCase):
+    def setUp(self):
+        self.weather = App.objects.create(name='Weather Radar', category='WEATHER', genres='Weather', rating=4.0)
+        self.forecast = App.objects.create(name='Weather Forecast', category='WEATHER', genres='Weather', rating=4.5)
+        self.storm = App.objects.create(name='Storm Radar', category='WEATHER', genres='Weather', rating=3.9)
+        self.chess = App.objects.create(name='Chess Master', category='GAME', genres='Board', rating=4.8)
+
+    def test_blocked_neighbours_match_the_full_product(self):
+        """Test the top neighbours do not depend on the block size"""
+        import numpy as np
+        from scipy import sparse
+        from .similar import nearest_neighbours
+
+        rng = np.random.default_rng(0)
+        matrix = sparse.random(50, 30, density=0.2, format='csr', random_state=1)
+        matrix = sparse.csr_matrix(matrix.multiply(1 / np.sqrt(matrix.multiply(matrix).sum(axis=1) + 1e-12)))
+        ratings = rng.random(50)
+
+        full = (matrix @ matrix.T).toarray()
+        np.fill_diagonal(full, 0)
+        for position, neighbours, scores in nearest_neighbours(matrix, ratings, top_n=5, block_size=7):
+            self.assertNotIn(position, neighbours.tolist())
+            self.assertTrue(np.allclose(scores, np.sort(full[position])[::-1][:len(scores)]))
+
+    def test_build_stores_ranked_neighbours(self):
+        """Test the job stores each app's most similar apps in order, never the app itself"""
+        from .search_index import rebuild_search_index
+        from .similar import build_similar_apps
+        from .models import SimilarApp
+
+        written = build_similar_apps(rebuild_search_index(), top_n=2, block_size=2)
+
+        neighbours = [row.similar for row in SimilarApp.objects.filter(app=self.weather).order_by('rank')]
+        self.assertEqual(written, SimilarApp.objects.count())
+        # "radar" is rarer in the catalog than "weather", so it weighs more
+        self.assertEqual(neighbours, [self.storm, self.forecast])
+        self.assertFalse(SimilarApp.objects.filter(app=self.chess).exists())
+
+    def test_app_detail_shows_neighbours_with_one_query(self):
+        """Test the detail page reads its neighbours with a single lookup"""
+        from django.test.utils import CaptureQueriesContext
+        from django.db import connection
+        from .search_index import rebuild_search_index
+        from .similar import build_similar_apps
+
+        build_similar_apps(rebuild_search_index(), top_n=3, block_size=512)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('app_detail', args=[self.weather.id]))
+
+        self.assertEqual(response.context['similar_apps'], [self.storm, self.forecast])
+        self.assertContains(response, 'Similar Apps')
+        self.assertEqual(sum('similar_apps' in query['sql'] for query in queries.captured_queries), 1)
+
+
+class HybridRankingTestCase(TestCase):
+    def setUp(self):
+        self.obscure = App.objects.create(name='Weather Radar', category='WEATHER', rating=4.9, reviews_count=0)
+        self.popular = App.objects.create(
+            name='Weather Live', category='WEATHER', rating=4.3, reviews_count=900000, installs='50,000,000+'
+        )
+
+    def test_popular_app_wins_text_ties(self):
+        """Test the prior breaks equal text relevance in favour of the popular app"""
+        from .search_index import rebuild_search_index
+
+        ranked = rebuild_search_index().search('weather')
+
+        self.assertEqual([app_id for app_id, _ in ranked], [self.popular.id, self.obscure.id])
+        self.assertTrue(all(0 <= score <= 1 for _, score in ranked))
+
+    @override_settings(SEARCH_POPULARITY_WEIGHT=0)
+    def test_zero_weight_is_pure_text_relevance(self):
+        """Test turning the prior off restores the BM25 order with its rating tie-break"""
+        from .search_index import rebuild_search_index
+
+        ranked = rebuild_search_index().search('weather')
+
+        self.assertEqual([app_id for app_id, _ in ranked], [self.obscure.id, self.popular.id])
+        self.assertEqual(ranked[0][1], ranked[1][1])
+
+    def test_refresh_prior_reads_review_sentiment(self):
+        """Test an offline refresh picks up approved review sentiment without a rebuild"""
+        from .search_index import rebuild_search_index
+
+        index = rebuild_search_index()
+        before = index.prior[index.positions[self.obscure.id]]
+        user = User.objects.create_user(username='reviewer', password='x')
+        UserReview.objects.create(
+            app=self.obscure, user=user, review_text='Great', rating=5, status='approved', sentiment_polarity=1.0
+        )
+        UserReview.objects.create(
+            app=self.obscure, user=user, review_text='Awful', rating=1, status='pending', sentiment_polarity=-1.0
+        )
+
+        index.refresh_prior()
+
+        self.assertGreater(index.prior[index.positions[self.obscure.id]], before)
+        self.assertEqual(index.prior.dtype.name, 'float32')
+
+
+@override_settings(SEARCH_SHARDS=3)
+class ShardedSearchTestCase(TestCase):
+    def setUp(self):
+        from .search_index import rebuild_search_index
+
+        App.objects.bulk_create([
+            App(
+                name=f'Puzzle Game {i}' if i % 4 else f'Puzzle Adventure Game {i}',
+                category='GAME',
+                rating=3 + (i % 3) * 0.5,
+                genres='Puzzle;Adventure' if i % 5 else 'Puzzle'
+            )
+            for i in range(50)
+        ])
+        self.index = rebuild_search_index()
+
+    def tearDown(self):
+        from .sharding import shutdown_sharded_searcher
+        shutdown_sharded_searcher()
+
+    def test_sharded_results_match_single_process(self):
+        """Test the merged shard top-k equals the single-process ranking"""
+        from .search_index import ShardedResults
+
+        sharded = self.index.rank('puzzle adventure')
+        sharded_top = self.index.search('puzzle adventure', limit=15)
+        with self.settings(SEARCH_SHARDS=1):
+            single = self.index.rank('puzzle adventure')
+            single_top = self.index.search('puzzle adventure', limit=15)
+
+        self.assertIsInstance(sharded, ShardedResults)
+        self.assertEqual(sharded_top, single_top)
+        self.assertEqual(sharded.count(), single.count())
+        self.assertEqual(sharded.app_ids(0, 20), single.app_ids(0, 20))
+        self.assertEqual(sharded.app_ids(40, 60), single.app_ids(40, 60))
+
+    def test_sharded_facets_match_single_process(self):
+        """Test shards apply facet filters and sum facet counts like one process"""
+        filters = {'genres': ['Adventure']}
+        sharded = self.index.rank('puzzle', filters)
+        with self.settings(SEARCH_SHARDS=1):
+            single = self.index.rank('puzzle', filters)
+
+        self.assertEqual(sharded.count(), single.count())
+        self.assertEqual(sharded.app_ids(0, 20), single.app_ids(0, 20))
+        self.assertEqual(sharded.facet_counts(), single.facet_counts())
+        self.assertEqual(dict(single.facet_counts()['genres']), {'Adventure': 40, 'Puzzle': 50})
+
+
+class FacetSearchTestCase(TestCase):
+    def setUp(self):
+        from .search_index import rebuild_search_index
+
+        App.objects.bulk_create([
+            App(name='Chess Master', category='GAME', type='Free', price='0',
+                content_rating='Everyone', genres='Board;Strategy', rating=4.5),
+            App(name='Chess Pro', category='GAME', type='Paid', price='$2.99',
+                content_rating='Everyone', genres='Board', rating=4.7),
+            App(name='Chess Tutor', category='EDUCATION', type='Free', price='0',
+                content_rating='Teen', genres='Education;Board', rating=4.0),
+            App(name='Chess Clock', category='TOOLS', type='Paid', price='$24.99',
+                content_rating='Everyone', genres='Tools', rating=3.9),
+        ])
+        self.index = rebuild_search_index()
+
+    def test_filters_and_across_facets_or_within(self):
+        """Test facets intersect while values of one facet are alternatives"""
+        def names(filters):
+            return sorted(
+                App.objects.get(id=app_id).name for app_id, _ in self.index.search('chess', filters=filters)
+            )
+
+        self.assertEqual(names({'category': ['GAME']}), ['Chess Master', 'Chess Pro'])
+        self.assertEqual(names({'category': ['GAME'], 'type': ['Free']}), ['Chess Master'])
+        self.assertEqual(names({'category': ['GAME', 'TOOLS'], 'price': ['$20 and up']}), ['Chess Clock'])
+        self.assertEqual(names({'genres': ['Board'], 'content_rating': ['Teen']}), ['Chess Tutor'])
+        self.assertEqual(names({'category': ['NO_SUCH_CATEGORY']}), [])
+
+    def test_facet_counts_need_no_queries(self):
+        """Test per-value counts for a query come from the bitsets alone"""
+        results = self.index.rank('chess', {'type': ['Free']})
+
+        with self.assertNumQueries(0):
+            counts = results.facet_counts()
+
+        self.assertEqual(results.count(), 2)
+        self.assertEqual(counts['category'], [('EDUCATION', 1), ('GAME', 1)])
+        self.assertEqual(counts['genres'], [('Board', 2), ('Education', 1), ('Strategy', 1)])
+        self.assertEqual(counts['price'], [('Free', 2)])
+
+    def test_selected_facets_counted_from_one_ranking(self):
+        """Test sibling counts of selected facets come from the matches already scored"""
+        results = self.index.rank('chess', {'category': ['GAME'], 'type': ['Free']})
+
+        with patch.object(self.index.bm25, 'match_rows', side_effect=AssertionError), self.assertNumQueries(0):
+            counts = results.facet_counts()
+
+        self.assertEqual(results.count(), 1)
+        self.assertEqual(counts['category'], [('EDUCATION', 1), ('GAME', 1)])
+        self.assertEqual(counts['type'], [('Free', 1), ('Paid', 1)])
+        self.assertEqual(counts['genres'], [('Board', 1), ('Strategy', 1)])
+
+    def test_search_view_filters_and_shows_facets(self):
+        """Test facet query parameters filter the page and feed the sidebar"""
+        response = self.client.get(reverse('search_results'), {'q': 'chess', 'type': 'Paid'})
+
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertContains(response, 'Chess Pro')
+        self.assertNotContains(response, 'Chess Master')
+        type_facet = next(facet for facet in response.context['facets'] if facet['field'] == 'type')
+        self.assertEqual(type_facet['values'], [
+            {'value': 'Free', 'count': 2, 'selected': False},
+            {'value': 'Paid', 'count': 2, 'selected': True},
+        ])
+        self.assertIn('type=Paid', response.context['query_params'])
+
+    def test_selected_facet_keeps_sibling_counts(self):
+        """Test a facet's own selection does not narrow its counts, the other facets' do"""
+        # Ranked, browsed and sorted-in-SQL results
+        for params in ({'q': 'chess'}, {}, {'q': 'chess', 'sort': 'installs'}):
+            response = self.client.get(reverse('search_results'), dict(params, category='GAME', type='Free'))
+            self.assertEqual(response.context['page_obj'].paginator.count, 1, params)
+            facets = {facet['field']: facet['values'] for facet in response.context['facets']}
+            self.assertEqual(
+                [(entry['value'], entry['count'], entry['selected']) for entry in facets['category']],
+                [('EDUCATION', 1, False), ('GAME', 1, True)],
+            )
+            self.assertEqual(
+                [(entry['value'], entry['count']) for entry in facets['type']], [('Free', 1), ('Paid', 1)]
+            )
+
+
+class TypedColumnsTestCase(TestCase):
+    def setUp(self):
+        self.apps = [
+            App.objects.create(name='Chess Master', category='GAME', type='Free', price='0',
+                               installs='5,000,000+', size='19M', last_updated='January 7, 2018'),
+            App.objects.create(name='Chess Pro', category='GAME', type='Paid', price='$2.99',
+                               installs='10,000+', size='512k', last_updated='June 20, 2018'),
+            App.objects.create(name='Chess Tutor', category='EDUCATION', type='Free', price='0',
+                               installs='1,000,000+', size='Varies with device', last_updated='March 3, 2017'),
+        ]
+
+    def test_save_parses_typed_columns(self):
+        """Test saving an app fills the typed columns from the Play Store strings"""
+        import datetime
+        from decimal import Decimal
+
+        pro = App.objects.get(name='Chess Pro')
+        self.assertEqual(pro.installs_count, 10000)
+        self.assertEqual(pro.size_bytes, 512 * 1024)
+        self.assertEqual(pro.price_value, Decimal('2.99'))
+        self.assertEqual(pro.last_updated_date, datetime.date(2018, 6, 20))
+        self.assertIsNone(App.objects.get(name='Chess Tutor').size_bytes)
+
+    def test_migration_backfills_existing_rows(self):
+        """Test the data migration parses rows that bypassed save()"""
+        import importlib
+        from django.apps import apps
+
+        migration = importlib.import_module('search_app.migrations.0006_app_typed_columns')
+        App.objects.update(installs_count=None, last_updated_date=None)
+        migration.backfill_typed_fields(apps, None)
+
+        self.assertEqual(App.objects.get(name='Chess Master').installs_count, 5000000)
+        self.assertFalse(App.objects.filter(last_updated_date__isnull=True).exists())
+
+    def test_search_sorts_and_filters_in_sql(self):
+        """Test ?sort= and range parameters order and filter the matches"""
+        response = self.client.get(reverse('search_results'), {'q': 'chess', 'sort': 'installs'})
+        self.assertEqual(
+            [app.name for app in response.context['page_obj']],
+            ['Chess Master', 'Chess Tutor', 'Chess Pro']
+        )
+
+        response = self.client.get(
+            reverse('search_results'), {'q': 'chess', 'sort': 'updated', 'min_installs': '1000000'}
+        )
+        self.assertEqual([app.name for app in response.context['page_obj']], ['Chess Master', 'Chess Tutor'])
+
+    def test_browse_without_query(self):
+        """Test filters alone browse the catalog: free apps with 1M+ installs updated in 2018"""
+        response = self.client.get(reverse('search_results'), {
+            'type': 'Free', 'min_installs': '1000000', 'updated_after': '2018-01-01', 'updated_before': 'bad',
+        })
+
+        self.assertTrue(response.context['browsing'])
+        self.assertEqual([app.name for app in response.context['page_obj']], ['Chess Master'])
+        self.assertEqual(response.context['range_params'], {'min_installs': '1000000', 'updated_after': '2018-01-01'})
+
+    def test_sidebar_form_keeps_every_range_parameter(self):
+        """Test the filter form has an input for every range parameter, filled from the URL"""
+        import re
+        from .export import RANGE_FILTERS
+
+        values = {
+            'min_installs': '10', 'max_installs': '9000000', 'max_size_mb': '50', 'min_price': '0',
+            'max_price': '5', 'updated_after': '2017-01-01', 'updated_before': '2019-01-01',
+        }
+        self.assertEqual(set(values), set(RANGE_FILTERS))
+        response = self.client.get(reverse('search_results'), dict(values, q='chess'))
+
+        form = re.search(r'<form[^>]*id="facet-form".*?</form>', response.content.decode(), re.S).group()
+        for name, value in values.items():
+            self.assertRegex(form, rf'name="{name}"[^>]*value="{value}"')
+
+    def test_out_of_range_values_are_ignored_or_clamped(self):
+        """Test non-finite and oversized range values never reach the database unchecked"""
+        for name, value in (
+            ('min_price', 'NaN'), ('min_price', 'sNaN'), ('min_price', 'Infinity'),
+            ('max_size_mb', 'inf'), ('max_size_mb', '-nan'),
+        ):
+            response = self.client.get(reverse('search_results'), {'q': 'chess', name: value})
+            self.assertEqual(response.status_code, 200, f'{name}={value}')
+            self.assertEqual(response.context['range_params'], {})
+            self.assertEqual(len(response.context['page_obj']), 3)
+
+        response = self.client.get(reverse('search_results'), {
+            'q': 'chess', 'min_installs': '99999999999999999999999', 'max_price': '1e100',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        # Clamped to the largest size: every app with a known size matches
+        response = self.client.get(reverse('search_results'), {'q': 'chess', 'max_size_mb': '1e300'})
+        self.assertEqual([app.name for app in response.context['page_obj']], ['Chess Master', 'Chess Pro'])
+
+
+class BatchSearchTestCase(TestCase):
+    def setUp(self):
+        from .search_index import rebuild_search_index
+
+        App.objects.bulk_create([
+            App(name='Photo Editor Pro', category='PHOTOGRAPHY', type='Free', genres='Photography', rating=4.2),
+            App(name='Photo Collage', category='PHOTOGRAPHY', type='Paid', genres='Photography', rating=4.5),
+            App(name='Chess Master', category='GAME', type='Free', genres='Board', rating=4.6),
+            App(name='Music Player', category='MUSIC_AND_AUDIO', type='Free', genres='Music', rating=4.0),
+        ])
+        self.index = rebuild_search_index()
+
+    def test_batch_matches_single_queries(self):
+        """Test one matrix product ranks every query like search() does"""
+        queries = ['photo', 'chess master', 'music photo', 'nothing here', '']
+
+        self.assertEqual(
+            self.index.batch_search(queries, limit=3),
+            [self.index.search(query, limit=3) for query in queries]
+        )
+        self.assertEqual(
+            self.index.batch_search(queries, limit=3, filters={'type': ['Free']}),
+            [self.index.search(query, limit=3, filters={'type': ['Free']}) for query in queries]
+        )
+
+    def test_batch_endpoint(self):
+        """Test the JSON endpoint returns ids and scores per query"""
+        import json
+
+        response = self.client.post(
+            reverse('search_batch'),
+            json.dumps({'queries': ['photo', 'chess'], 'limit': 1}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([result['query'] for result in data['results']], ['photo', 'chess'])
+        self.assertEqual(data['results'][0]['ids'], [App.objects.get(name='Photo Collage').id])
+        self.assertEqual(data['results'][1]['ids'], [App.objects.get(name='Chess Master').id])
+        self.assertEqual(len(data['results'][0]['scores']), 1)
+
+    @override_settings(SEARCH_BATCH_MAX_QUERIES=2)
+    def test_batch_endpoint_rejects_bad_requests(self):
+        """Test malformed or oversized batches get a 400 and GET a 405"""
+        import json
+
+        url = reverse('search_batch')
+        for body in ('not json', json.dumps({'queries': 'photo'}), json.dumps({'queries': ['a', 'b', 'c']}),
+                     json.dumps({'queries': ['a'], 'limit': 0}), json.dumps({'queries': ['a'], 'filters': {'x': []}})):
+            response = self.client.post(url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        from .search_index import rebuild_search_index
+
+        App.objects.bulk_create([
+            App(name='Finance Tracker', category='FINANCE', type='Free', price='0', installs='50,000+', rating=4.1),
+            App(name='Finance Pro', category='FINANCE', type='Paid', price='$2.99', installs='1,000+', rating=4.7),
+            App(name='Family Puzzles', category='FAMILY', type='Free', price='0', installs='500,000+', rating=4.3),
+        ])
+        for app in App.objects.all():
+            # bulk_create skips save(), which fills the typed columns
+            app.save()
+        rebuild_search_index()
+
+    def export(self, **params):
+        response = self.client.get(reverse('search_export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_keeps_search_order(self):
+        """Test every result is streamed as one JSON line, in ranking order"""
+        import json
+        from .search_index import get_search_index
+
+        response, content = self.export(q='finance')
+        rows = {row['name']: row for row in map(json.loads, content.splitlines())}
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            [row['id'] for row in rows.values()],
+            [app_id for app_id, _ in get_search_index().search('finance')]
+        )
+        self.assertEqual(rows['Finance Pro']['price_value'], '2.99')
+        self.assertEqual(rows['Finance Tracker']['installs_count'], 50000)
+
+    def test_csv_export_of_catalog_slices(self):
+        """Test facet and range slices without a query are exported as CSV"""
+        import csv
+        from .export import EXPORT_FIELDS
+
+        response, content = self.export(format='csv', category='FAMILY')
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(rows[0], list(EXPORT_FIELDS))
+        self.assertEqual([row[1] for row in rows[1:]], ['Family Puzzles'])
+
+        _, content = self.export(format='csv', min_installs='10000', sort='installs')
+        names = [row[1] for row in list(csv.reader(content.splitlines()))[1:]]
+        self.assertEqual(names, ['Family Puzzles', 'Finance Tracker'])
+
+    def test_export_reads_in_chunks(self):
+        """Test rows are identical whatever the chunk size"""
+        from .export import export_rows, search_request
+        from django.http import QueryDict
+
+        for params in ('', 'q=finance'):
+            search = search_request(QueryDict(params))
+            self.assertEqual(list(export_rows(search, chunk_size=1)), list(export_rows(search, chunk_size=100)))
+
+    def test_unknown_format_is_rejected(self):
+        """Test an unsupported ?format= gets a 400"""
+        response = self.client.get(reverse('search_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+class ReviewSearchTestCase(TestCase):
+    def setUp(self):
+        self.weather = App.objects.create(name='Weather Radar', category='WEATHER')
+        self.camera = App.objects.create(name='Camera Plus', category='PHOTOGRAPHY')
+        self.user = User.objects.create_user(username='reviewer', password='testpass123')
+
+        self.drain = AppReview.objects.create(
+            app=self.weather, translated_review='Battery drain is terrible, battery dies by noon', sentiment='Negative'
+        )
+        self.mixed = AppReview.objects.create(
+            app=self.weather, translated_review='Accurate forecasts but some battery use', sentiment='Positive'
+        )
+        self.other_app = AppReview.objects.create(
+            app=self.camera, translated_review='Drains the battery when recording', sentiment='Negative'
+        )
+
+    def search(self, query, **kwargs):
+        from .review_search import ReviewResults
+
+        return ReviewResults(query, **kwargs)
+
+    def test_results_are_ranked_by_relevance(self):
+        """Test the review mentioning the query most often ranks first"""
+        results = self.search('battery')
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0:3][0], self.drain)
+        self.assertGreater(results[0:3][0].search_rank, results[0:3][2].search_rank)
+
+    def test_every_query_word_must_match(self):
+        """Test stemmed words are ANDed together"""
+        self.assertCountEqual(self.search('battery drains')[0:10], [self.drain, self.other_app])
+        self.assertEqual(len(self.search('battery forecast')), 1)
+
+    def test_app_and_sentiment_filters(self):
+        """Test results can be narrowed to one app and one sentiment"""
+        self.assertEqual(
+            list(self.search('battery', app_id=self.weather.id, sentiment='negative')[0:10]), [self.drain]
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test the triggers keep the full-text index in step with the reviews table"""
+        self.mixed.translated_review = 'Accurate forecasts, widgets look great'
+        self.mixed.save()
+        AppReview.objects.filter(id=self.other_app.id).delete()
+        added = AppReview.objects.create(app=self.camera, translated_review='Great widgets', sentiment='Positive')
+
+        self.assertEqual(list(self.search('battery')[0:10]), [self.drain])
+        self.assertCountEqual(self.search('widget')[0:10], [self.mixed, added])
+
+    def test_user_source_only_shows_approved_reviews(self):
+        """Test the review search page lists approved community reviews only"""
+        approved = UserReview.objects.create(
+            app=self.weather, user=self.user, review_text='Battery friendly', rating=5, status='approved'
+        )
+        UserReview.objects.create(app=self.camera, user=self.user, review_text='Battery hog', rating=1)
+
+        response = self.client.get(reverse('review_search'), {'q': 'battery', 'source': 'user'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [approved])
+
+    def test_bad_app_parameter_is_ignored(self):
+        """Test a malformed or out-of-range app id searches every app"""
+        for app in ('\u00b2', '99999999999999999999999', '-1', 'abc'):
+            response = self.client.get(reverse('review_search'), {'q': 'battery', 'app': app})
+            self.assertEqual(response.status_code, 200, app)
+            self.assertIsNone(response.context['app'])
+            self.assertEqual(response.context['page_obj'].paginator.count, 3)
+
+        response = self.client.get(reverse('review_search'), {'q': 'battery', 'app': f' {self.camera.id} '})
+        self.assertEqual(list(response.context['page_obj']), [self.other_app])
+
+    def test_punctuation_cannot_break_the_query(self):
+        """Test FTS5 operators typed by a user are searched as plain words"""
+        self.assertEqual(len(self.search('battery" (drain*')), 2)
+        self.assertEqual(len(self.search('!!!')), 0)
+
+    def test_admin_search_uses_review_text(self):
+        """Test the admin search box matches review text through the full-text index"""
+        User.objects.create_superuser(username='admin', password='adminpass123', email='admin@example.com')
+        self.client.login(username='admin', password='adminpass123')
+
+        response = self.client.get(reverse('admin:search_app_appreview_changelist'), {'q': 'recording'})
+
+        self.assertEqual(list(response.context['cl'].result_list), [self.other_app])
+
+class AsyncViewsTestCase(TransactionTestCase):
+    # Scoring runs on pool threads with their own connections, which only
+    # see committed rows, so these tests cannot run inside a transaction
+    def setUp(self):
+        from .search_cache import invalidate_search_cache
+
+        self.chess = App.objects.create(name='Chess Master', category='GAME', rating=4.6, genres='Board')
+        App.objects.create(name='Chess Clock', category='TOOLS', rating=3.9, genres='Tools')
+        invalidate_search_cache()
+
+    async def test_async_search_results(self):
+        """Test the async results view ranks and renders like the sync view"""
+        from django.test import AsyncRequestFactory
+        from . import async_views
+
+        response = await async_views.search_results(AsyncRequestFactory().get('/search/', {'q': 'chess'}))
+
+        content = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Found 2 apps', content)
+        self.assertLess(content.index('Chess Master'), content.index('Chess Clock'))
+
+    async def test_async_suggestions(self):
+        """Test async autocomplete answers from the prefix index"""
+        import json
+        from django.test import AsyncRequestFactory
+        from . import async_views
+
+        response = await async_views.search_suggestions(AsyncRequestFactory().get('/', {'q': 'che'}))
+
+        self.assertEqual(json.loads(response.content), ['Chess Master', 'Chess Clock'])
+
+    async def test_async_app_detail(self):
+        """Test the async detail page reads the app with the async ORM"""
+        from django.http import Http404
+        from django.test import AsyncRequestFactory
+        from . import async_views
+
+        request = AsyncRequestFactory().get('/')
+        request.user = AnonymousUser()
+        response = await async_views.app_detail(request, self.chess.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Chess Master', response.content.decode())
+        with self.assertRaises(Http404):
+            await async_views.app_detail(request, self.chess.id + 1000)
+
+
+class SearchCacheTestCase(TestCase):
+    def setUp(self):
+        from .search_cache import invalidate_search_cache
+
+        self.app = App.objects.create(
+            name='WhatsApp Messenger',
+            category='COMMUNICATION',
+            rating=4.4,
+            genres='Communication'
+        )
+        invalidate_search_cache()
+
+    def test_repeated_query_served_from_cache(self):
+        """Test a normalized repeat of a query is a cache hit"""
+        from .search_cache import search_cache_stats
+
+        before = search_cache_stats()
+        self.client.get(reverse('search_results'), {'q': 'WhatsApp'})
+        with patch('search_app.export.get_search_index') as get_index:
+            response = self.client.get(reverse('search_results'), {'q': '  whatsapp '})
+            get_index.assert_not_called()
+        after = search_cache_stats()
+
+        self.assertContains(response, 'WhatsApp Messenger')
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+
+    def test_cache_invalidated_when_app_saved(self):
+        """Test saving an App drops cached result pages"""
+        self.client.get(reverse('search_results'), {'q': 'messenger'})
+
+        App.objects.create(name='Signal Private Messenger', category='COMMUNICATION')
+        response = self.client.get(reverse('search_results'), {'q': 'messenger'})
+
+        self.assertContains(response, 'Signal Private Messenger')
+
+    def test_cache_stats_require_staff(self):
+        """Test cache counters are exposed to staff only"""
+        response = self.client.get(reverse('search_cache_stats'))
+        self.assertEqual(response.status_code, 302)
+
+        staff = User.objects.create_user(username='ops', password='opspass123', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('search_cache_stats'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_rate', response.json())
+
+
+class PrefixSuggestionTestCase(TestCase):
+    def setUp(self):
+        App.objects.create(name='Instagram', category='SOCIAL', reviews_count=5000, installs='1,000,000+')
+        App.objects.create(name='InstaSize Collage', category='PHOTOGRAPHY', reviews_count=800)
+        App.objects.create(name='Boomerang from Instagram', category='PHOTOGRAPHY', reviews_count=2000)
+
+    def test_suggestions_ranked_by_popularity(self):
+        """Test suggestions match word starts and are ordered by popularity"""
+        response = self.client.get(reverse('search_suggestions'), {'q': 'Insta'})
+
+        self.assertEqual(
+            response.json(),
+            ['Instagram', 'Boomerang from Instagram', 'InstaSize Collage']
+        )
+
+    def test_suggestions_do_not_query_database(self):
+        """Test a warm prefix index answers without touching the database"""
+        from .search_index import get_search_index
+
+        get_search_index()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('search_suggestions'), {'q': 'boom'})
+
+        self.assertEqual(response.json(), ['Boomerang from Instagram'])
+
+    def test_suggestions_refresh_after_catalog_change(self):
+        """Test new apps appear in suggestions once saved"""
+        self.client.get(reverse('search_suggestions'), {'q': 'insta'})
+        App.objects.create(name='Instapaper', category='BOOKS')
+
+        response = self.client.get(reverse('search_suggestions'), {'q': 'instap'})
+
+        self.assertEqual(response.json(), ['Instapaper'])
+
+    def test_keystrokes_refine_cached_candidates(self):
+        """Test each keystroke filters the previous prefix's candidates to the same answer as a rescan"""
+        from .suggest import CandidateCache
+        from .search_index import get_search_index
+
+        index = get_search_index()
+        cache = CandidateCache(max_candidates=100, max_entries=100)
+        for query in ['ins', 'inst', 'insta', 'instas', 'instag', 'instagram', 'instagramx', 'boo', 'boomerang f']:
+            self.assertEqual(
+                index.prefix.suggest(query, cache=cache), index.prefix.suggest(query), query
+            )
+        self.assertEqual(cache.misses, 2)
+        self.assertGreater(cache.refinements, 0)
+
+    def test_candidate_cache_is_bounded(self):
+        """Test the least recently used prefixes are evicted past the candidate budget"""
+        import numpy as np
+        from .suggest import CandidateCache
+
+        cache = CandidateCache(max_candidates=5, max_entries=10)
+        cache.put('abc', (0, 3, np.arange(3)))
+        cache.put('xyz', (5, 7, np.arange(2)))
+        cache.get('abc')
+        cache.put('def', (8, 10, np.arange(2)))
+        cache.put('huge', (0, 9, np.arange(9)))
+
+        self.assertEqual(list(cache.entries), ['abc', 'def'])
+        self.assertEqual(cache.size, 5)
+
+
+class TypoToleranceTestCase(TestCase):
+    def setUp(self):
+        App.objects.create(name='Facebook', category='SOCIAL', reviews_count=9000)
+        App.objects.create(name='WhatsApp Messenger', category='COMMUNICATION', reviews_count=8000)
+
+    def test_fuzzy_lookup_within_two_edits(self):
+        """Test the symmetric-delete index finds words up to two edits away"""
+        from .suggest import FuzzyIndex
+
+        fuzzy = FuzzyIndex.build(['facebook', 'messenger', 'weather'], [5, 3, 2])
+
+        self.assertEqual(fuzzy.lookup('facebok')[0], ('facebook', 1))
+        self.assertEqual(fuzzy.lookup('fcaebok')[0], ('facebook', 2))
+        self.assertEqual(fuzzy.lookup('fbk'), [])
+        self.assertIsNone(fuzzy.correct('weather for facebook'))
+        self.assertEqual(fuzzy.correct('wether messanger'), 'weather messenger')
+
+    def test_suggestions_fall_back_to_correction(self):
+        """Test autocomplete corrects a misspelt query"""
+        response = self.client.get(reverse('search_suggestions'), {'q': 'facebok'})
+
+        self.assertEqual(response.json(), ['Facebook'])
+
+    def test_results_page_offers_did_you_mean(self):
+        """Test the results page suggests the corrected query"""
+        response = self.client.get(reverse('search_results'), {'q': 'facebok'})
+
+        self.assertEqual(response.context['did_you_mean'], 'facebook')
+        self.assertContains(response, 'Did you mean')
+
+    def test_did_you_mean_keeps_filters(self):
+        """Test following the correction keeps the sort, facets and range filters"""
+        from urllib.parse import parse_qs
+
+        response = self.client.get(reverse('search_results'), {
+            'q': 'facebok', 'sort': 'installs', 'category': 'SOCIAL', 'min_installs': '10', 'page': '2',
+        })
+
+        self.assertEqual(parse_qs(response.context['did_you_mean_params']), {
+            'q': ['facebook'], 'mode': ['keyword'], 'sort': ['installs'], 'category': ['SOCIAL'], 'min_installs': ['10'],
+        })
+        self.assertContains(response, f'?{response.context["did_you_mean_params"]}'.replace('&', '&amp;'))
+
+
+class StartupTestCase(TestCase):
+    def test_setup_does_not_import_heavy_dependencies(self):
+        """Test django.setup() and the URLconf leave scikit-learn, pandas and TextBlob unloaded"""
+        import subprocess
+        import sys
+        from django.conf import settings
+
+        script = (
+            'import sys, django; django.setup(); import app_search_project.urls; '
+            'print(",".join(m for m in ("sklearn", "pandas", "textblob") if m in sys.modules))'
+        )
+        env = {'DJANGO_SETTINGS_MODULE': 'app_search_project.settings', 'SEARCH_WARMUP': '', 'PATH': ''}
+        output = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+
+        self.assertEqual(output.strip(), '')
+
+    def test_warm_up_loads_the_index(self):
+        """Test the 'index' step builds the index that searches then reuse"""
+        from .search_index import get_search_index, invalidate_search_index
+        from .warmup import warm_up
+
+        App.objects.create(name='Weather Radar', category='WEATHER')
+        invalidate_search_index()
+        timings = warm_up(['index'])
+
+        self.assertEqual(list(timings), ['index'])
+        self.assertEqual(len(get_search_index()), 1)
+
+    def test_unknown_warm_up_step_is_rejected(self):
+        """Test a misspelled SEARCH_WARMUP step fails loudly"""
+        from django.core.exceptions import ImproperlyConfigured
+        from .warmup import warm_up
+
+        with self.assertRaises(ImproperlyConfigured):
+            warm_up(['index', 'indexes'])
+
+
+class SentimentQueueTestCase(TestCase):
+    def setUp(self):
+        self.app = App.objects.create(name='Notes', category='PRODUCTIVITY')
+        supervisor = User.objects.create_user(username='supervisor', password='supervisor123')
+        UserProfile.objects.create(user=supervisor, is_supervisor=True)
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        UserProfile.objects.create(user=self.user, supervisor=supervisor)
+
+    def submit(self, text='Great app, really useful', rating=5):
+        self.client.login(username='writer', password='testpass123')
+        self.client.post(reverse('app_detail', args=[self.app.id]), {'review_text': text, 'rating': rating})
+        return UserReview.objects.get(app=self.app, user=self.user)
+
+    def test_submission_queues_analysis(self):
+        """Test submitting a review queues its analysis instead of running it"""
+        with patch.object(UserReview, 'analyze_combined_sentiment') as analyze:
+            review = self.submit()
+
+        analyze.assert_not_called()
+        self.assertTrue(review.analysis_pending)
+        self.assertEqual(review.sentiment_job.status, 'queued')
+        review.status = 'approved'
+        review.save()
+        self.assertContains(self.client.get(reverse('app_detail', args=[self.app.id])), 'Analysis pending')
+
+    def test_worker_scores_queued_reviews(self):
+        """Test a batch scores every queued review and removes its job"""
+        from .models import SentimentJob
+        from .sentiment_queue import enqueue_sentiment, run_batch
+
+        first = self.submit()
+        second = UserReview.objects.create(app=self.app, user=self.user, review_text='Crashes all the time', rating=1)
+        enqueue_sentiment(second)
+
+        self.assertEqual(run_batch(10), (2, 0))
+        self.assertFalse(SentimentJob.objects.exists())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.sentiment, 'Positive')
+        self.assertEqual(second.sentiment, 'Negative')
+        self.assertEqual(run_batch(10), (0, 0))
+
+    @override_settings(SENTIMENT_JOB_MAX_ATTEMPTS=2, SENTIMENT_JOB_RETRY_DELAY=30)
+    def test_failed_jobs_are_retried_with_backoff(self):
+        """Test a failing job is delayed, retried and finally marked failed"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import SentimentJob
+        from .sentiment_queue import run_batch
+
+        review = self.submit()
+        failing = patch.object(UserReview, 'analyze_combined_sentiment', side_effect=RuntimeError('lexicon missing'))
+        with failing, self.assertLogs('search_app.sentiment_queue', 'WARNING'):
+            self.assertEqual(run_batch(10), (0, 1))
+            job = SentimentJob.objects.get(review=review)
+            self.assertEqual((job.status, job.attempts), ('queued', 1))
+            self.assertGreater(job.available_at, timezone.now() + timedelta(seconds=20))
+            self.assertEqual(run_batch(10), (0, 0))
+
+            SentimentJob.objects.update(available_at=timezone.now())
+            self.assertEqual(run_batch(10), (0, 1))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIn('lexicon missing', job.last_error)
+        self.assertEqual(run_batch(10), (0, 0))
+        review.refresh_from_db()
+        self.assertTrue(review.analysis_pending)
+
+    def test_moderation_and_worker_do_not_overwrite_each_other(self):
+        """Test approval keeps scores written after it loaded the review, and vice versa"""
+        from django.shortcuts import get_object_or_404
+        from .models import AppStats
+        from .sentiment_queue import claim_jobs, enqueue_sentiment, process_jobs, run_batch
+
+        def load_then_analyse(*args, **kwargs):
+            review = get_object_or_404(*args, **kwargs)
+            run_batch(10)
+            return review
+
+        # The worker finishes between the approval loading and saving the review
+        review = self.submit()
+        self.client.login(username='supervisor', password='supervisor123')
+        with patch('search_app.views.get_object_or_404', side_effect=load_then_analyse):
+            self.client.post(reverse('approve_review', args=[review.id]), {'action': 'approve'})
+        review.refresh_from_db()
+        self.assertEqual((review.status, review.sentiment), ('approved', 'Positive'))
+        stats = AppStats.objects.get(app=self.app)
+        self.assertEqual((stats.user_reviews, stats.user_positive, stats.user_polarity_count), (1, 1, 1))
+
+        # The review is approved between the worker claiming and scoring it
+        other = UserReview.objects.create(
+            app=App.objects.create(name='Chess', category='GAME'), user=self.user, review_text='Awful', rating=1
+        )
+        enqueue_sentiment(other)
+        jobs = claim_jobs(10)
+        self.client.post(reverse('approve_review', args=[other.id]), {'action': 'approve'})
+        process_jobs(jobs)
+        stats = AppStats.objects.get(app=other.app)
+        self.assertEqual((stats.user_reviews, stats.user_negative, stats.user_polarity_count), (1, 1, 1))
+
+
+class RescoreSentimentTestCase(TestCase):
+    def setUp(self):
+        self.app = App.objects.create(name='Notes', category='PRODUCTIVITY')
+        self.other = App.objects.create(name='Chess', category='GAME')
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+
+    def rescore(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        output = StringIO()
+        call_command('rescore_sentiment', '--workers', '1', *args, stdout=output)
+        return output.getvalue()
+
+    def test_stale_scores_are_rewritten(self):
+        """Test reviews scored by older rules are re-scored, and --dry-run and --app limit it"""
+        stale = UserReview.objects.create(
+            app=self.app, user=self.user, review_text='Excellent, I love it', rating=5, sentiment='Neutral'
+        )
+        other = UserReview.objects.create(
+            app=self.other, user=self.user, review_text='Terrible and slow', rating=1, sentiment='Neutral'
+        )
+
+        self.assertIn('Would update 1 of 1', self.rescore('--app', str(self.app.id), '--dry-run'))
+        stale.refresh_from_db()
+        self.assertEqual(stale.sentiment, 'Neutral')
+
+        output = self.rescore('--app', str(self.app.id))
+        self.assertIn('Neutral -> Positive: 1', output)
+        stale.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(stale.sentiment, 'Positive')
+        self.assertIsNotNone(stale.confidence_score)
+        self.assertEqual(other.sentiment, 'Neutral')
+        self.assertIn('Updated 0 of 1', self.rescore('--app', str(self.app.id)))
+
+    def test_process_pool_fills_missing_app_review_polarity(self):
+        """Test --source csv scores only dataset rows without a polarity, across worker processes"""
+        missing = [
+            AppReview.objects.create(app=self.app, translated_review=text, sentiment='')
+            for text in ('Great app', 'Awful crashes', 'It opens')
+        ]
+        labelled = AppReview.objects.create(
+            app=self.app, translated_review='Great app', sentiment='Negative', sentiment_polarity=-0.5
+        )
+
+        self.rescore('--source', 'csv', '--workers', '2', '--chunk-size', '1')
+
+        self.assertEqual(
+            [review.sentiment for review in AppReview.objects.filter(id__in=[r.id for r in missing]).order_by('id')],
+            ['Positive', 'Negative', 'Neutral'],
+        )
+        labelled.refresh_from_db()
+        self.assertEqual((labelled.sentiment, labelled.sentiment_polarity), ('Negative', -0.5))
+
+
+class SentimentCacheTestCase(TestCase):
+    def setUp(self):
+        from .sentiment_cache import get_sentiment_cache
+
+        self.cache = get_sentiment_cache()
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def test_repeated_texts_are_scored_once(self):
+        """Test duplicate texts (up to whitespace) are analyzed once, in-process and from the table"""
+        from . import sentiment
+
+        texts = ['Good', 'Nice app', ' Good ', 'Nice  app']
+        with patch.object(sentiment, 'analyze_texts', wraps=sentiment.analyze_texts) as analyze:
+            scores = sentiment.text_sentiments(texts)
+            self.assertEqual(sentiment.text_sentiments(texts), scores)
+            self.cache.clear()
+            self.assertEqual(sentiment.text_sentiment('Good'), scores[0])
+
+        analyze.assert_called_once_with(['Good', 'Nice app'])
+        self.assertEqual(scores[0], scores[2])
+        self.assertAlmostEqual(scores[0][0], 0.7)
+        stats = self.cache.stats()
+        self.assertEqual((stats['lru_hits'], stats['db_hits'], stats['misses']), (0, 1, 0))
+
+    def test_new_analyzer_version_misses_old_scores(self):
+        """Test changing SENTIMENT_ANALYZER_REVISION rescores texts and stale rows can be purged"""
+        from .models import SentimentScore
+        from .sentiment import analyzer_version, text_sentiment
+        from .sentiment_cache import purge_stale
+
+        text_sentiment('Love it')
+        with override_settings(SENTIMENT_ANALYZER_REVISION=99):
+            text_sentiment('Love it')
+            self.assertEqual(self.cache.stats()['misses'], 2)
+            self.assertEqual(SentimentScore.objects.count(), 2)
+            self.assertEqual(purge_stale(analyzer_version()), 1)
+            self.assertEqual(list(SentimentScore.objects.values_list('analyzer', flat=True)), [analyzer_version()])
+
+
+class SentimentLexiconTestCase(TestCase):
+    # Reference corpus of short app reviews: modifiers, negations, "!", emoticons
+    REFERENCE_REVIEWS = [
+        'Good', 'Nice app', 'Love it', 'Great app!', 'Very good app, works well', 'Not good at all',
+        'This app is not very good', 'Really not good', "I don't like the new update",
+        'Worst app ever. Crashes all the time!!', 'Terrible, totally useless :(', 'Great :)', 'Awesome!!!',
+        "It's ok I guess", 'Works fine but too many ads', 'The interface is beautiful and easy to use',
+        'Horrible customer service, never again', 'Best game I have ever played <3',
+        'Not bad, pretty decent actually', 'Extremely slow and buggy',
+        'I love this app so much, it helps me every day', 'Battery drain is awful after the latest update',
+        'Simple, clean and fast', 'Nothing special', 'Could be better', 'Very very good',
+        'Absolutely amazing experience', 'The new version is really bad', 'It keeps freezing on my phone',
+        'Perfect for keeping notes organized!', 'Not a good app', 'No good',
+        'Never a dull moment, highly recommended', 'The ads are so annoying', 'Easy to use and very helpful',
+        'Too expensive for what it does', 'Useless. Waste of time and money', 'Good but needs dark mode',
+        'Happy with it :D', 'Great (!) another update that deletes my notes...', '',
+    ]
+
+    def test_agrees_with_textblob(self):
+        """Test the vectorized backend scores the reference corpus like TextBlob within 0.05"""
+        from .sentiment import lexicon_sentiments, polarity_label, textblob_sentiments
+
+        expected = textblob_sentiments(self.REFERENCE_REVIEWS)
+        scored = lexicon_sentiments(self.REFERENCE_REVIEWS)
+
+        for text, (polarity, subjectivity), (expected_polarity, expected_subjectivity) in zip(
+            self.REFERENCE_REVIEWS, scored, expected
+        ):
+            with self.subTest(text=text):
+                self.assertAlmostEqual(polarity, expected_polarity, delta=0.05)
+                self.assertAlmostEqual(subjectivity, expected_subjectivity, delta=0.05)
+                self.assertEqual(polarity_label(round(polarity, 6)), polarity_label(round(expected_polarity, 6)))
+
+    def test_token_limit_keeps_scores(self):
+        """Test forgetting unknown tokens once the limit is reached never changes a score"""
+        from . import sentiment_lexicon
+        from .sentiment import textblob_sentiments
+
+        analyzer = sentiment_lexicon.get_lexicon_analyzer.__wrapped__()
+        expected = textblob_sentiments(self.REFERENCE_REVIEWS)
+        # Reached partway through the first batch, and again before every later one
+        with patch.object(sentiment_lexicon, 'MAX_TOKEN_CODES', len(analyzer.codes) + 5):
+            for _ in range(3):
+                polarity, subjectivity = analyzer.score(self.REFERENCE_REVIEWS)
+                for text, scores, reference in zip(self.REFERENCE_REVIEWS, zip(polarity, subjectivity), expected):
+                    with self.subTest(text=text):
+                        self.assertAlmostEqual(scores[0], reference[0], delta=0.05)
+                        self.assertAlmostEqual(scores[1], reference[1], delta=0.05)
+
+    def test_backend_is_selectable(self):
+        """Test SENTIMENT_BACKEND='lexicon' scores reviews without TextBlob and gets its own cache keys"""
+        from django.core.exceptions import ImproperlyConfigured
+        from .sentiment import analyzer_version
+        from .sentiment_cache import get_sentiment_cache
+
+        get_sentiment_cache().clear()
+        self.addCleanup(get_sentiment_cache().clear)
+        app = App.objects.create(name='Notes', category='PRODUCTIVITY')
+        review = UserReview(app=app, user=User.objects.create_user(username='writer'), review_text='Love it', rating=5)
+        textblob_version = analyzer_version()
+        with override_settings(SENTIMENT_BACKEND='lexicon'), patch('textblob.TextBlob', side_effect=AssertionError):
+            self.assertNotEqual(analyzer_version(), textblob_version)
+            review.analyze_combined_sentiment(save=False)
+        self.assertEqual(review.sentiment, 'Positive')
+        self.assertAlmostEqual(review.text_sentiment_polarity, 0.5)
+
+        with override_settings(SENTIMENT_BACKEND='vader'), self.assertRaises(ImproperlyConfigured):
+            review.analyze_combined_sentiment(save=False)
+
+
+class AppStatsTestCase(TestCase):
+    def setUp(self):
+        self.app = App.objects.create(name='Notes', category='PRODUCTIVITY')
+        self.supervisor = User.objects.create_user(username='supervisor', password='supervisor123')
+        UserProfile.objects.create(user=self.supervisor, is_supervisor=True)
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        UserProfile.objects.create(user=self.user, supervisor=self.supervisor)
+        AppReview.objects.create(app=self.app, translated_review='Love it', sentiment='Positive', sentiment_polarity=0.5)
+        AppReview.objects.create(app=self.app, translated_review='Meh', sentiment='Neutral', sentiment_polarity=0.0)
+
+    def moderate(self, review, action):
+        self.client.login(username='supervisor', password='supervisor123')
+        self.client.post(reverse('approve_review', args=[review.id]), {'action': action})
+
+    def test_moderation_updates_stats_incrementally(self):
+        """Test loading, approving, rejecting and deleting reviews keeps app_stats current"""
+        from .app_stats import aggregate_rows
+        from .models import AppStats
+
+        review = UserReview.objects.create(
+            app=self.app, user=self.user, review_text='Great', rating=4,
+            sentiment='Positive', sentiment_polarity=0.8, has_contradiction=True,
+        )
+        stats = AppStats.objects.get(app=self.app)
+        self.assertEqual((stats.csv_reviews, stats.csv_positive, stats.user_reviews), (2, 1, 0))
+
+        self.moderate(review, 'approve')
+        stats.refresh_from_db()
+        self.assertEqual((stats.reviews, stats.positive, stats.user_contradictions), (3, 2, 1))
+        self.assertAlmostEqual(stats.mean_polarity, 1.3 / 3)
+        self.assertEqual(stats.mean_user_rating, 4)
+        self.assertEqual(aggregate_rows(AppReview, UserReview)[self.app.id]['user_rating_sum'], stats.user_rating_sum)
+
+        self.moderate(UserReview.objects.get(id=review.id), 'reject')
+        AppReview.objects.filter(sentiment='Neutral').get().delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.reviews, stats.positive, stats.neutral, stats.user_reviews), (1, 1, 0, 0))
+        self.assertEqual((stats.user_polarity_count, stats.user_rating_sum, stats.user_contradictions), (0, 0, 0))
+
+    def test_rebuild_matches_incremental_stats(self):
+        """Test rebuild_app_stats and the migration recompute the same rows the signals maintain"""
+        import importlib
+        from io import StringIO
+        from django.apps import apps
+        from django.core.management import call_command
+        from .models import AppStats
+
+        for rating, sentiment in ((5, 'Positive'), (1, 'Negative')):
+            UserReview.objects.create(
+                app=self.app, user=self.user, review_text=sentiment, rating=rating, status='approved',
+                sentiment=sentiment, sentiment_polarity=0.6 if rating == 5 else -0.6,
+            )
+        fields = [field.name for field in AppStats._meta.fields]
+        incremental = AppStats.objects.filter(app=self.app).values(*fields).get()
+
+        AppStats.objects.all().delete()
+        call_command('rebuild_app_stats', stdout=StringIO())
+        self.assertEqual(AppStats.objects.filter(app=self.app).values(*fields).get(), incremental)
+
+        # The migration's own copy of the aggregation fills the table the same way
+        AppStats.objects.all().delete()
+        importlib.import_module('search_app.migrations.0011_app_stats').fill_app_stats(apps, None)
+        self.assertEqual(AppStats.objects.filter(app=self.app).values(*fields).get(), incremental)
+
+        response = self.client.get(reverse('app_detail', args=[self.app.id]))
+        self.assertContains(response, 'Review Sentiment')
+        self.assertEqual(response.context['csv_review_count'], 2)
+
+class IndexStoreTestCase(TestCase):
+    def setUp(self):
+        import tempfile
+        from .search_index import rebuild_search_index
+
+        App.objects.create(name='Photo Editor Pro', category='PHOTOGRAPHY', rating=4.2, genres='Photography')
+        App.objects.create(name='Facebook', category='SOCIAL', rating=4.1, reviews_count=900)
+        self.index = rebuild_search_index()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = f'{self.tmpdir.name}/search.idx'
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip_memory_maps_arrays(self):
+        """Test a written index loads as memmaps and answers identically"""
+        import numpy as np
+        from .index_store import load_index, write_index
+
+        write_index(self.index, self.path)
+        loaded = load_index(self.path)
+
+        self.assertIsInstance(loaded.app_ids, np.memmap)
+        self.assertEqual(loaded.search('photo'), self.index.search('photo'))
+        self.assertEqual((loaded.engine.document_matrix != self.index.engine.document_matrix).nnz, 0)
+        self.assertEqual(
+            (loaded.engine.vectorizer.transform(['photo editor']) != self.index.engine.vectorizer.transform(['photo editor'])).nnz, 0
+        )
+        self.assertEqual(loaded.suggest('faceb'), ['Facebook'])
+        self.assertEqual(loaded.did_you_mean('facebok'), 'facebook')
+        self.assertEqual(
+            loaded.search('photo', filters={'category': ['PHOTOGRAPHY']}),
+            self.index.search('photo', filters={'category': ['PHOTOGRAPHY']})
+        )
+
+    def test_old_format_version_rejected(self):
+        """Test a file with another format version is refused, not misread"""
+        from .index_store import PREAMBLE, IndexFormatError, load_index, write_index
+
+        write_index(self.index, self.path)
+        with open(self.path, 'r+b') as handle:
+            magic, version, header_length = PREAMBLE.unpack(handle.read(PREAMBLE.size))
+            handle.seek(0)
+            handle.write(PREAMBLE.pack(magic, version + 1, header_length))
+
+        with self.assertRaises(IndexFormatError):
+            load_index(self.path)
+
+    def test_first_load_uses_configured_file(self):
+        """Test the process-wide index is opened from SEARCH_INDEX_PATH"""
+        from . import search_index
+        from .index_store import write_index
+
+        write_index(self.index, self.path)
+        with override_settings(SEARCH_INDEX_PATH=self.path), \
+                patch.object(search_index, '_index', None), \
+                patch.object(search_index.SearchIndex, 'build') as build:
+            loaded = search_index.get_search_index()
+
+        build.assert_not_called()
+        self.assertEqual(loaded.built_at, self.index.built_at)
+        self.assertEqual(loaded.version, self.index.version)
+
+    def test_new_index_file_replaces_the_loaded_one(self):
+        """Test a process switches to an index file renamed over the one it loaded"""
+        from . import search_index
+        from .index_store import write_index
+
+        write_index(self.index, self.path)
+        with override_settings(SEARCH_INDEX_PATH=self.path, SEARCH_INDEX_RELOAD_INTERVAL=0), \
+                patch.object(search_index, '_index', None):
+            first = search_index.get_search_index()
+            newer = search_index.SearchIndex.build()
+            write_index(newer, self.path)
+            second = search_index.get_search_index()
+
+        self.assertEqual(first.version, self.index.version)
+        self.assertEqual(second.version, newer.version)
+        self.assertEqual(second.loaded_from, self.path)
+
+
+@override_settings(SEARCH_INDEX_BACKGROUND_REBUILD=True)
+class IndexHotSwapTestCase(TransactionTestCase):
+    # The rebuild thread reads the catalog on its own connection, which only
+    # sees committed rows
+    def setUp(self):
+        from .search_index import rebuild_search_index
+
+        for number in range(20):
+            App.objects.create(name=f'Weather Station {number}', category='WEATHER')
+        self.index = rebuild_search_index()
+
+    def tearDown(self):
+        from .search_index import wait_for_search_index
+        wait_for_search_index(timeout=60)
+
+    def wait_for_version_after(self, version):
+        import time
+        from .search_index import current_search_index, get_search_index
+
+        deadline = time.monotonic() + 60
+        while current_search_index().version == version:
+            self.assertLess(time.monotonic(), deadline, 'no new index snapshot was published')
+            get_search_index()
+            time.sleep(0.01)
+        return current_search_index()
+
+    def test_stale_index_is_served_while_the_next_one_builds(self):
+        """Test a catalog change does not make searches wait for the rebuild"""
+        from .search_index import get_search_index, search_index_status
+
+        App.objects.create(name='Weather Radar', category='WEATHER')
+
+        self.assertIs(get_search_index(), self.index)
+        newer = self.wait_for_version_after(self.index.version)
+        self.assertEqual(len(newer), 21)
+        self.assertEqual(search_index_status()['version'], newer.version)
+        # Semantic embeddings were fitted before the swap, not by the first search
+        self.assertIsNotNone(newer._semantic)
+
+    def test_searches_run_continuously_across_swaps(self):
+        """Test queries keep succeeding, each on one whole snapshot, while indexes are swapped"""
+        import threading
+        from .search_index import get_search_index, wait_for_search_index
+
+        stop = threading.Event()
+        errors, versions, queries = [], set(), [0]
+
+        def search_until_stopped():
+            while not stop.is_set():
+                try:
+                    index = get_search_index()
+                    results = index.search('weather', limit=1000)
+                    # Every app is a weather app: a snapshot mixing two builds
+                    # would return too few or unknown ids
+                    if len(results) != len(index) or any(app_id not in index.positions for app_id, _ in results):
+                        errors.append(f'inconsistent results on version {index.version}')
+                    versions.add(index.version)
+                    queries[0] += 1
+                except Exception as error:
+                    errors.append(repr(error))
+
+        readers = [threading.Thread(target=search_until_stopped) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        published = [self.index.version]
+        try:
+            for swap in range(3):
+                for number in range(5):
+                    App.objects.create(name=f'Weather Buoy {swap}-{number}', category='WEATHER')
+                published.append(self.wait_for_version_after(published[-1]).version)
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+
+        self.assertEqual(errors, [])
+        # The last snapshot waited for may be an intermediate rebuild that
+        # predates the last apps: start any rebuild still due and let it finish
+        get_search_index()
+        wait_for_search_index(timeout=60)
+        self.assertEqual(len(get_search_index()), 35)
+        self.assertEqual(len(set(published)), 4)
+        self.assertGreater(len(versions), 1)
+        self.assertGreater(queries[0], 0)
+
+    def test_index_status_requires_staff(self):
+        """Test only staff can read the index version and build time"""
+        User.objects.create_user(username='staff', password='staffpass123', is_staff=True)
+
+        self.assertEqual(self.client.get(reverse('search_index_status')).status_code, 302)
+        self.client.login(username='staff', password='staffpass123')
+        status = self.client.get(reverse('search_index_status')).json()
+
+        self.assertEqual(status['version'], self.index.version)
+        self.assertEqual(status['apps'], 20)
+        self.assertEqual(status['source'], 'database')
+        self.assertFalse(status['rebuilding'])
+
+
+@override_settings(SEARCH_SEMANTIC_COMPONENTS=2)
+class SemanticSearchTestCase(TestCase):
+    def setUp(self):
+        from .search_index import rebuild_search_index
+
+        for name, category in [
+            ('Budget Planner', 'FINANCE'),
+            ('Budget Expense Book', 'FINANCE'),
+            ('Expense Manager', 'FINANCE'),
+            ('Workout Coach', 'HEALTH_AND_FITNESS'),
+            ('Running Workout Log', 'HEALTH_AND_FITNESS'),
+            ('Yoga Coach', 'HEALTH_AND_FITNESS'),
+        ]:
+            App.objects.create(name=name, category=category)
+        self.index = rebuild_search_index()
+
+    def test_semantic_mode_finds_related_apps_without_shared_words(self):
+        """Test LSA ranks apps from the same topic even without the query word"""
+        response = self.client.get(reverse('search_results'), {'q': 'budget', 'mode': 'semantic'})
+
+        names = [app.name for app in response.context['page_obj']]
+        self.assertEqual(response.context['mode'], 'semantic')
+        self.assertIn('Expense Manager', names)
+        self.assertNotIn('Yoga Coach', names)
+
+    def test_capped_semantic_results_count_selected_facets_disjunctively(self):
+        """Test a selected facet is counted over the capped neighbours of the other selections"""
+        with self.settings(SEARCH_SEMANTIC_MAX_RESULTS=1):
+            unfiltered = self.index.semantic_rank('budget')
+            filtered = self.index.semantic_rank('budget', {'category': ['HEALTH_AND_FITNESS']})
+
+        self.assertEqual(unfiltered.facet_counts()['category'], [('FINANCE', 1)])
+        self.assertEqual(filtered.facet_counts()['category'], [('FINANCE', 1)])
+
+    def test_embeddings_are_contiguous_unit_float32(self):
+        """Test embeddings are one contiguous float32 array of unit rows"""
+        import numpy as np
+
+        embeddings = self.index.semantic.embeddings
+        self.assertEqual(embeddings.dtype, np.float32)
+        self.assertTrue(embeddings.flags['C_CONTIGUOUS'])
+        self.assertTrue(np.allclose(np.linalg.norm(embeddings, axis=1), 1, atol=1e-5))
+
+    def test_ivf_matches_exact_search_when_probing_every_list(self):
+        """Test the approximate index returns the exact neighbours when it probes all lists"""
+        from .semantic import SemanticIndex
+
+        matrix = self.index.engine.document_matrix
+        query = self.index.engine.vectorizer.transform(['expense'])
+        exact = SemanticIndex.build(matrix, n_components=2)
+        approximate = SemanticIndex.build(matrix, n_components=2, exact_max_apps=1, probes=len(self.index))
+
+        self.assertIsNone(exact.ann)
+        self.assertIsNotNone(approximate.ann)
+        self.assertEqual(
+            sorted(approximate.search(query)[0].tolist()),
+            sorted(exact.search(query)[0].tolist())
+        )
@@ -1,12 +1,21 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI (see asgi.py) the hot read paths are served by native async views
+read_views = async_views if settings.SEARCH_ASYNC_VIEWS else views
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('register/', views.register_view, name='register'),
-    path('search/', views.search_results, name='search_results'),
-    path('search/suggestions/', views.search_suggestions, name='search_suggestions'),
-    path('app/<int:app_id>/', views.app_detail, name='app_detail'),
+    path('search/', read_views.search_results, name='search_results'),
+    path('search/suggestions/', read_views.search_suggestions, name='search_suggestions'),
+    path('search/export/', views.search_export, name='search_export'),
+    path('search/batch/', views.search_batch, name='search_batch'),
+    path('search/cache-stats/', views.search_cache_stats_view, name='search_cache_stats'),
+    path('search/index-status/', views.search_index_status_view, name='search_index_status'),
+    path('reviews/search/', views.review_search, name='review_search'),
+    path('app/<int:app_id>/', read_views.app_detail, name='app_detail'),
     path('supervisor/', views.supervisor_dashboard, name='supervisor_dashboard'),
     path('supervisor/approve/<int:review_id>/', views.approve_review, name='approve_review'),
 ]
\ No newline at end of file
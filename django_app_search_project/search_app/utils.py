@@ -1,20 +1,166 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
-import numpy as np
+import functools
+import math
+import re
+from datetime import datetime
+from decimal import Decimal
+
+# Letters and digits; underscores split too so "ART_AND_DESIGN" becomes words
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+# Play Store size suffixes, in bytes
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+@functools.lru_cache(maxsize=None)
+def english_stop_words():
+    """
+    scikit-learn's English stop words
+
+    Imported on first use, so loading this module (and everything that
+    imports it at startup) does not pull in scikit-learn.
+    """
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return ENGLISH_STOP_WORDS
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search terms, dropping English stop words
+    
+    Args:
+        text (str): Raw text such as an app name or a query
+        
+    Returns:
+        list: Terms in their original order
+    """
+    stop_words = english_stop_words()
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in stop_words
+    ]
+
+
+def parse_installs(value):
+    """
+    Parse a Play Store installs string such as "10,000+" into an integer
+    
+    Returns:
+        int: Install count, or None when the value is missing or malformed
+    """
+    digits = str(value or '').replace(',', '').replace('+', '').strip()
+    return int(digits) if digits.isdigit() else None
+
+
+def parse_price(value):
+    """
+    Parse a Play Store price string such as "$4.99" or "0" into a float
+
+    Returns:
+        float: Price in dollars, or None when the value is missing or malformed
+    """
+    text = str(value or '').replace('$', '').replace(',', '').strip()
+    try:
+        price = float(text)
+    except ValueError:
+        return None
+    # float() also accepts "nan" and "inf", which the CSV uses for missing values
+    return price if math.isfinite(price) else None
+
+
+def parse_size(value):
+    """
+    Parse a Play Store size string such as "19M" or "512k" into bytes
+    
+    Returns:
+        int: Size in bytes, or None for "Varies with device" and malformed values
+    """
+    text = str(value or '').strip().upper()
+    multiplier = SIZE_UNITS.get(text[-1:])
+    if multiplier is None:
+        return None
+    try:
+        number = float(text[:-1].replace(',', ''))
+    except ValueError:
+        return None
+    return int(round(number * multiplier)) if math.isfinite(number) else None
+
+
+def parse_last_updated(value):
+    """
+    Parse a Play Store date such as "January 7, 2018"
+    
+    Returns:
+        datetime.date: The date, or None when the value is missing or malformed
+    """
+    try:
+        return datetime.strptime(str(value or '').strip(), '%B %d, %Y').date()
+    except ValueError:
+        return None
+
+
+def typed_app_fields(installs, size, price, last_updated):
+    """
+    Normalized, indexable values of the App fields stored as Play Store strings
+    
+    Returns:
+        dict: installs_count, size_bytes, price_value and last_updated_date
+    """
+    price_value = parse_price(price)
+    return {
+        'installs_count': parse_installs(installs),
+        'size_bytes': parse_size(size),
+        'price_value': None if price_value is None else Decimal(str(price_value)).quantize(Decimal('0.01')),
+        'last_updated_date': parse_last_updated(last_updated),
+    }
+
 
 class TextSimilarityEngine:
     """
     Advanced text similarity engine using TF-IDF and cosine similarity
     """
     
-    def __init__(self):
+    def __init__(self, max_features=5000):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
         self.vectorizer = TfidfVectorizer(
             stop_words='english',
             lowercase=True,
-            max_features=5000,
+            max_features=max_features,
             ngram_range=(1, 2)  # Include both unigrams and bigrams
         )
+        self.document_matrix = None
+    
+    def fit(self, documents):
+        """
+        Fit the vectorizer once on a fixed corpus and keep its TF-IDF matrix
+        
+        Args:
+            documents (list): List of document strings
+            
+        Returns:
+            TextSimilarityEngine: self, so calls can be chained
+        """
+        self.document_matrix = self.vectorizer.fit_transform(documents).tocsr()
+        return self
+    
+    @classmethod
+    def restore(cls, terms, idf, document_matrix):
+        """
+        Recreate a fitted engine from saved state without refitting
+        
+        Args:
+            terms (list): Vocabulary, ordered by column
+            idf (numpy.ndarray): Inverse document frequency per column
+            document_matrix (scipy.sparse.csr_matrix): Fitted TF-IDF matrix
+            
+        Returns:
+            TextSimilarityEngine: An engine that transforms queries like the fitted one
+        """
+        engine = cls(max_features=None)
+        engine.vectorizer.set_params(vocabulary={term: column for column, term in enumerate(terms)})
+        engine.vectorizer.idf_ = idf
+        engine.document_matrix = document_matrix
+        return engine
     
     def calculate_similarity(self, query, documents):
         """
@@ -29,6 +175,7 @@ class TextSimilarityEngine:
         """
         if not documents:
             return []
+        from sklearn.metrics.pairwise import cosine_similarity
         
         # Prepare corpus
         corpus = documents + [query]
@@ -1,18 +1,29 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.models import User 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
-import numpy as np
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from urllib.parse import urlencode
+import json
+import time
 
-from .utils import TextSimilarityEngine
+from .export import BIGINT_RANGE, EXPORT_FORMATS, export_rows, ranked_results, search_request
+from .app_stats import stats_for
+from .facets import FACETS, FACET_FIELDS
+from .review_search import REVIEW_SOURCES, ReviewResults
+from .search_index import get_search_index, search_index_status
+from .search_cache import cache_page, get_cached_page, search_cache_stats
+from .sentiment_cache import sentiment_cache_stats
+from .sentiment_queue import enqueue_sentiment
+from .similar import neighbours_of
 
 from .models import App, AppReview, UserReview, UserProfile
 from .forms import CustomUserCreationForm, UserReviewForm
@@ -35,78 +46,239 @@ def register_view(request):
 def search_suggestions(request):
     query = request.GET.get('q', '').strip()
     if len(query) >= 3:
-        apps = App.objects.filter(
-            name__icontains=query
-        ).values_list('name', flat=True)[:10]
-        return JsonResponse(list(apps), safe=False)
+        # Answered from the in-memory prefix index, without a database query
+        return JsonResponse(get_search_index().suggest(query), safe=False)
     return JsonResponse([], safe=False)
 
+def _facet_sidebar(facet_counts, filters):
+    """Facet values with their counts for the results sidebar"""
+    sidebar = []
+    for field, label in FACETS:
+        selected = filters.get(field, [])
+        values = [
+            {'value': value, 'count': count, 'selected': value in selected}
+            for value, count in facet_counts.get(field, [])
+        ]
+        # A selected value that matches nothing must still be shown so it can be cleared
+        shown = {entry['value'] for entry in values}
+        values += [{'value': value, 'count': 0, 'selected': True} for value in selected if value not in shown]
+        if values:
+            sidebar.append({'field': field, 'label': label, 'values': values})
+    return sidebar
+
+def _rank(search):
+    """
+    Ranked results for a search request, from the page cache when possible
+
+    Returns:
+        tuple: (results, cached page or None, did_you_mean, facet_counts)
+    """
+    query = search['query']
+    if not (query or search['browsing']):
+        return [], None, None, {}
+
+    cached = get_cached_page(query, search['page_number'], search['options'])
+    if cached is not None:
+        return cached, cached, cached.did_you_mean, cached.facet_counts()
+
+    results, did_you_mean = ranked_results(search)
+    return results, None, did_you_mean, results.facet_counts()
+
+def _query_params(search, query):
+    """Query string of a search (without the page), for another query text"""
+    return urlencode(
+        [('q', query), ('mode', search['mode']), ('sort', search['sort'])]
+        + [(field, value) for field, values in search['filters'].items() for value in values]
+        + list(search['range_params'].items())
+    )
+
+def _search_context(search, page_obj, did_you_mean, facet_counts):
+    filters = search['filters']
+    return {
+        'page_obj': page_obj,
+        'query': search['query'],
+        'did_you_mean': did_you_mean,
+        'mode': search['mode'],
+        'semantic_enabled': search['semantic_enabled'],
+        'browsing': search['browsing'],
+        'facets': _facet_sidebar(facet_counts, filters),
+        'sort': search['sort'],
+        'range_params': search['range_params'],
+        'query_params': _query_params(search, search['query']),
+        # The correction keeps the mode, facets, ranges and sort of the search
+        'did_you_mean_params': _query_params(search, did_you_mean) if did_you_mean else '',
+    }
+
 def search_results(request):
-    query = request.GET.get('q', '').strip()
-    results = []
-    
-    if query:
-        # Simple text-based search (you can enhance this with TF-IDF)
-        results = App.objects.filter(
-            Q(name__icontains=query) | 
-            Q(category__icontains=query) |
-            Q(genres__icontains=query)
-        ).order_by('-rating')
-        
-        # Implement text similarity using TF-IDF
-        if results.exists():
-            results = enhance_search_with_similarity(query, results)
+    search = search_request(request.GET)
+    results, cached, did_you_mean, facet_counts = _rank(search)
     
     paginator = Paginator(results, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_page(search['page_number'])
+    
+    if (search['query'] or search['browsing']) and cached is None:
+        cache_page(search['query'], search['page_number'], page_obj, did_you_mean, search['options'], facet_counts)
     
-    return render(request, 'search_app/search_results.html', {
+    return render(
+        request, 'search_app/search_results.html', _search_context(search, page_obj, did_you_mean, facet_counts)
+    )
+
+def search_export(request):
+    """
+    Stream every result of a search as NDJSON or CSV (?format=ndjson|csv)
+
+    Takes the same parameters as search_results, e.g.
+    /search/export/?q=finance&format=csv or /search/export/?category=FAMILY.
+    Bytes are sent as soon as the first chunk is read, and memory stays
+    flat however many apps are exported.
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'"format" must be one of: {", ".join(EXPORT_FORMATS)}'}, status=400)
+
+    content_type, encode = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(encode(export_rows(search_request(request.GET))), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="apps.{export_format}"'
+    return response
+
+@csrf_exempt
+@require_POST
+def search_batch(request):
+    """
+    Score many queries in one request for offline jobs
+
+    Body: {"queries": ["photo editor", ...], "limit": 20, "filters": {"type": ["Free"]}}
+    Every query is scored in the same sparse matrix product
+    (SearchIndex.batch_search); the response gives the ids and scores per query.
+    """
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Request body must be JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+
+    queries = payload.get('queries')
+    if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+        return JsonResponse({'error': '"queries" must be a list of strings'}, status=400)
+    if len(queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+        return JsonResponse(
+            {'error': f'At most {settings.SEARCH_BATCH_MAX_QUERIES} queries per request'}, status=400
+        )
+
+    limit = payload.get('limit', 20)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= settings.SEARCH_BATCH_MAX_LIMIT:
+        return JsonResponse(
+            {'error': f'"limit" must be an integer from 1 to {settings.SEARCH_BATCH_MAX_LIMIT}'}, status=400
+        )
+
+    filters = payload.get('filters') or {}
+    if not isinstance(filters, dict) or not all(
+        field in FACET_FIELDS and isinstance(values, list) and all(isinstance(value, str) for value in values)
+        for field, values in filters.items()
+    ):
+        return JsonResponse(
+            {'error': f'"filters" must map facets ({", ".join(FACET_FIELDS)}) to lists of values'}, status=400
+        )
+
+    started = time.perf_counter()
+    ranked = get_search_index().batch_search(queries, limit, filters)
+    elapsed = time.perf_counter() - started
+
+    return JsonResponse({
+        'results': [
+            {
+                'query': query,
+                'ids': [app_id for app_id, _ in results],
+                'scores': [round(score, 6) for _, score in results],
+            }
+            for query, results in zip(queries, ranked)
+        ],
+        'elapsed_ms': round(elapsed * 1000, 3),
+        'queries_per_second': round(len(queries) / elapsed, 1) if elapsed else None,
+    })
+
+# Sentiment labels stored on reviews, offered as a filter on review search
+REVIEW_SENTIMENTS = ('Positive', 'Neutral', 'Negative')
+
+def review_search(request):
+    """
+    Full-text search inside review text, ranked by relevance
+
+    e.g. ?q=battery+drain&app=12&sentiment=Negative; ?source=user searches
+    approved community reviews instead of the imported analysis reviews.
+    """
+    query = request.GET.get('q', '').strip()
+    source = request.GET.get('source') if request.GET.get('source') in REVIEW_SOURCES else 'csv'
+    sentiment = request.GET.get('sentiment') if request.GET.get('sentiment') in REVIEW_SENTIMENTS else ''
+    try:
+        app_id = int(request.GET.get('app', ''))
+    except (ValueError, OverflowError):
+        app_id = None
+    # A malformed or out-of-range id means no app filter
+    app = App.objects.filter(id=app_id).first() if app_id is not None and 0 < app_id <= BIGINT_RANGE[1] else None
+
+    results = ReviewResults(
+        query, source, app.id if app else None, sentiment, status='approved' if source == 'user' else None
+    )
+    page_obj = Paginator(results, 20).get_page(request.GET.get('page'))
+    all_apps_params = urlencode([('q', query), ('source', source), ('sentiment', sentiment)])
+
+    return render(request, 'search_app/review_search.html', {
+        'query': query,
+        'source': source,
+        'sentiment': sentiment,
+        'sentiments': REVIEW_SENTIMENTS,
+        'app': app,
         'page_obj': page_obj,
-        'query': query
+        'all_apps_params': all_apps_params,
+        'query_params': f'{all_apps_params}&app={app.id}' if app else all_apps_params,
     })
 
-def enhance_search_with_similarity(query, queryset):
-    # Convert queryset to list for similarity calculation
-    apps_list = list(queryset)
-    if not apps_list:
-        return apps_list
-    
-    app_texts = [f"{app.name} {app.category} {app.genres or ''}" for app in apps_list]
-    
-    similarity_engine = TextSimilarityEngine()
+@staff_member_required
+def search_cache_stats_view(request):
+    return JsonResponse({**search_cache_stats(), 'sentiment': sentiment_cache_stats()})
 
-    similarities = similarity_engine.calculate_similarity(query, app_texts)
-    
-    # Sort apps by similarity score
-    app_similarity_pairs = list(zip(apps_list, similarities))
-    app_similarity_pairs.sort(key=lambda x: x[1], reverse=True)
-    
-    return [app for app, _ in app_similarity_pairs]
+@staff_member_required
+def search_index_status_view(request):
+    """Version and build time of the index snapshot this process serves"""
+    return JsonResponse(search_index_status())
 
-def app_detail(request, app_id):
-    app = get_object_or_404(App, id=app_id)
-    
-    # Get existing reviews from CSV data
-    csv_reviews = AppReview.objects.filter(app=app)
-    
-    # Get approved user reviews
-    user_reviews = UserReview.objects.filter(app=app, status='approved').order_by('-created_at')
-    
-    # Check if user has supervisor (for review permission)
+def _supervisor_status(user):
+    """
+    Whether a user may submit reviews, i.e. has a supervisor assigned
+
+    Returns:
+        tuple: (user_has_supervisor, user_supervisor, supervisor_display_name)
+    """
     user_has_supervisor = False
     user_supervisor = None
     supervisor_display_name = None
 
-    if request.user.is_authenticated:
+    if user.is_authenticated:
         try:
-            profile = request.user.userprofile
+            profile = user.userprofile
             user_supervisor = profile.supervisor
             user_has_supervisor = user_supervisor is not None
             if user_supervisor:
                 supervisor_display_name = user_supervisor.get_full_name() or user_supervisor.username
         except UserProfile.DoesNotExist:
             user_has_supervisor = False
+    return user_has_supervisor, user_supervisor, supervisor_display_name
+
+def app_detail(request, app_id):
+    app = get_object_or_404(App.objects.select_related('stats'), id=app_id)
+    # Review counts and sentiment totals, kept up to date in app_stats
+    stats = stats_for(app)
+    
+    # Get the first existing reviews from CSV data
+    csv_reviews = AppReview.objects.filter(app=app)[:10]
+    
+    # Get approved user reviews
+    user_reviews = UserReview.objects.filter(app=app, status='approved').order_by('-created_at')
+    
+    # Check if user has supervisor (for review permission)
+    user_has_supervisor, user_supervisor, supervisor_display_name = _supervisor_status(request.user)
 
     # Handle review submission
     if request.method == 'POST' and request.user.is_authenticated:
@@ -123,8 +295,10 @@ def app_detail(request, app_id):
             review = form.save(commit=False)
             review.app = app
             review.user = request.user
-            review.save()
-            review.analyze_combined_sentiment()
+            # Sentiment is scored by the process_sentiment_jobs worker
+            with transaction.atomic():
+                review.save()
+                enqueue_sentiment(review)
             messages.success(request, f'Your review has been submitted for approval to {supervisor_display_name}!')
             return redirect('app_detail', app_id=app.id)
     else:
@@ -132,8 +306,11 @@ def app_detail(request, app_id):
     
     return render(request, 'search_app/app_detail.html', {
         'app': app,
+        'stats': stats,
         'csv_reviews': csv_reviews,
+        'csv_review_count': stats.csv_reviews,
         'user_reviews': user_reviews,
+        'similar_apps': [row.similar for row in neighbours_of(app.id, settings.SEARCH_SIMILAR_APPS_SHOWN)],
         'form': form,
         'user_has_supervisor': user_has_supervisor,
         'user_supervisor': user_supervisor,
@@ -209,23 +386,19 @@ def approve_review(request, review_id):
     
     if request.method == 'POST':
         action = request.POST.get('action')
-        if action == 'approve':
-            review.status = 'approved'
-            review.approved_by = request.user
-            review.approved_at = timezone.now()
-            review.save()
-            sentiment_context = ""
-            if review.sentiment:
-                sentiment_context = f" (AI detected: {review.sentiment} sentiment)"
-            messages.success(request, f'Review approved successfully!{sentiment_context}')
-        elif action == 'reject':
-            review.status = 'rejected'
-            review.approved_by = request.user
-            review.approved_at = timezone.now()
-            review.save()
+        if action in ('approve', 'reject'):
+            with transaction.atomic():
+                # The sentiment worker may have scored the review since it was
+                # loaded: lock and reread it so app_stats sees the current
+                # scores, and write only the moderation fields
+                review = UserReview.objects.select_for_update().get(id=review.id)
+                review.status = 'approved' if action == 'approve' else 'rejected'
+                review.approved_by = request.user
+                review.approved_at = timezone.now()
+                review.save(update_fields=UserReview.MODERATION_FIELDS)
             sentiment_context = ""
             if review.sentiment:
                 sentiment_context = f" (AI detected: {review.sentiment} sentiment)"
-            messages.success(request, f'Review rejected successfully!{sentiment_context}')
+            messages.success(request, f'Review {review.status} successfully!{sentiment_context}')
     
     return redirect('supervisor_dashboard')
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Startup warm-up
+
+scikit-learn, TextBlob and the search index itself are loaded on first use,
+which keeps management commands, test runs and worker boots fast but makes
+the first request of each worker pay for them. SearchAppConfig.ready() runs
+the steps listed in SEARCH_WARMUP instead, e.g. in the master process of
+"gunicorn --preload", so every forked worker starts with them loaded and
+shares the index pages copy-on-write.
+"""
+import logging
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+def warm_index():
+    """Load (or build) the process-wide search index"""
+    from .search_index import get_search_index
+    get_search_index()
+
+
+def warm_semantic():
+    """Fit the LSA embeddings used by ?mode=semantic"""
+    from .search_index import get_search_index
+    index = get_search_index()
+    if index.engine.document_matrix is not None:
+        index.semantic
+
+
+def warm_sentiment():
+    """Load the SENTIMENT_BACKEND analyzer and its lexicon"""
+    from .sentiment import analyze_texts
+    analyze_texts(['warm up'])
+
+
+# SEARCH_WARMUP step -> loader, run in the order listed in the setting
+WARMUP_STEPS = {
+    'index': warm_index,
+    'semantic': warm_semantic,
+    'sentiment': warm_sentiment,
+}
+
+
+def warm_up(steps):
+    """
+    Run warm-up steps, logging how long each took
+
+    Args:
+        steps (iterable): Names from WARMUP_STEPS
+
+    Returns:
+        dict: Step name -> seconds taken
+
+    Raises:
+        ImproperlyConfigured: For a step that does not exist
+    """
+    unknown = [step for step in steps if step not in WARMUP_STEPS]
+    if unknown:
+        raise ImproperlyConfigured(
+            f"Unknown SEARCH_WARMUP step(s) {', '.join(unknown)}; expected {', '.join(WARMUP_STEPS)}"
+        )
+    timings = {}
+    for step in steps:
+        started = time.perf_counter()
+        WARMUP_STEPS[step]()
+        timings[step] = time.perf_counter() - started
+        logger.info('Warm-up step %s took %.2fs', step, timings[step])
+    return timings